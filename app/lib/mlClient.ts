@@ -9,6 +9,9 @@ export interface MLMatchRequest {
   client_code?: string;
   top_k?: number;
   min_score?: number;
+  data_type?: 'wine' | 'glass' | 'riedel'; // 기본: wine
+  collapse_duplicates?: boolean; // 기본: false (true면 중복 품목 군집은 한 건만)
+  group_vintages?: boolean; // 기본: false (같은 와인은 한 건 + other_vintages)
 }
 
 export interface MLMatchResult {
@@ -19,6 +22,7 @@ export interface MLMatchResult {
   vintage?: string;
   score: number;
   method: string;
+  other_vintages?: { item_no: string; item_name: string; vintage: string | null }[]; // group_vintages 일 때만
 }
 
 export interface MLMatchResponse {
@@ -26,6 +30,7 @@ export interface MLMatchResponse {
   query: string;
   results: MLMatchResult[];
   processing_time_ms: number;
+  degraded?: boolean; // 서버 과부하로 어휘/메모리 경로 응답 (ETag 없음 → 캐시 안 함)
   model_info: {
     name: string;
     type: string;
@@ -33,24 +38,66 @@ export interface MLMatchResponse {
   };
 }
 
+/**
+ * ML 응답 로컬 캐시 (요청 → ETag + 응답)
+ * - 서버 카탈로그 버전이 바뀌지 않았으면 304로 재검증만 하고 캐시 응답 재사용
+ */
+const ML_CACHE_MAX_ENTRIES = 500;
+const mlResponseCache = new Map<string, { etag: string; body: MLMatchResponse }>();
+
+function mlCacheKey(request: MLMatchRequest): string {
+  return JSON.stringify({
+    query: request.query.replace(/\s+/g, ' ').trim(),
+    client_code: request.client_code?.trim() || null,
+    top_k: request.top_k ?? null,
+    min_score: request.min_score ?? null,
+    data_type: request.data_type ?? 'wine',
+    collapse_duplicates: request.collapse_duplicates ?? false,
+    group_vintages: request.group_vintages ?? false,
+  });
+}
+
 /**
  * ML 서버로 품목 매칭 요청
  */
 export async function mlMatch(request: MLMatchRequest): Promise<MLMatchResponse> {
   try {
+    const cacheKey = mlCacheKey(request);
+    const cached = mlResponseCache.get(cacheKey);
+
     const response = await fetch(`${ML_SERVER_URL}/api/ml-match`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...(cached ? { 'If-None-Match': cached.etag } : {}),
       },
       body: JSON.stringify(request),
     });
 
+    // 카탈로그 변경 없음 → 캐시 응답 재사용 (LRU 갱신)
+    if (response.status === 304 && cached) {
+      mlResponseCache.delete(cacheKey);
+      mlResponseCache.set(cacheKey, cached);
+      return { ...cached.body, query: request.query };
+    }
+
     if (!response.ok) {
       throw new Error(`ML 서버 응답 오류: ${response.status}`);
     }
 
-    return await response.json();
+    const body: MLMatchResponse = await response.json();
+    const etag = response.headers.get('etag');
+
+    if (etag) {
+      mlResponseCache.delete(cacheKey);
+      mlResponseCache.set(cacheKey, { etag, body });
+      if (mlResponseCache.size > ML_CACHE_MAX_ENTRIES) {
+        const oldestKey = mlResponseCache.keys().next().value;
+        if (oldestKey !== undefined) mlResponseCache.delete(oldestKey);
+      }
+    }
+
+    return body;
   } catch (error) {
     console.error('[ML Match] 오류:', error);
     throw error;
@@ -0,0 +1,124 @@
+-- ========================================
+-- FTS5 trigram 품목명 전문 검색 인덱스
+-- ========================================
+-- 품목명 부분 문자열 검색(LIKE '%...%' 풀스캔 / 전체 메모리 적재)을 FTS5 trigram 인덱스로 대체
+-- - 원본 테이블 rowid = FTS rowid (조회는 ml-server/fts.py의 search가 rowid로 원본과 조인)
+-- - 트리거로 INSERT / UPDATE / DELETE 동기화
+--   INSERT OR REPLACE는 recursive_triggers가 꺼져 있으면 DELETE 트리거가 안 불리므로
+--   INSERT 트리거도 같은 rowid를 먼저 지운다 (남는 옛 rowid는 조인에서 빠지고 fts.py --prune 으로 정리)
+-- - 3글자 미만 검색어는 trigram으로 찾을 수 없음 → fts.py가 LIKE로 대체
+-- 원본 테이블이 아직 없으면 각 스크립트와 같은 스키마로 먼저 만든다 (트리거는 테이블이 있어야 생성 가능)
+-- 여러 번 실행해도 안전 (마지막 단계에서 FTS 내용을 원본에서 다시 채움)
+
+-- 1. items (init-supply-price.js, Downloads 시트 마스터)
+CREATE TABLE IF NOT EXISTS items (
+  item_no TEXT PRIMARY KEY,
+  item_name TEXT NOT NULL,
+  supply_price REAL,
+  category TEXT DEFAULT 'wine',
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(item_name, tokenize = 'trigram');
+
+CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+  DELETE FROM items_fts WHERE rowid = new.rowid;
+  INSERT INTO items_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+  DELETE FROM items_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF item_name ON items BEGIN
+  DELETE FROM items_fts WHERE rowid = old.rowid;
+  INSERT INTO items_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+
+-- 2. ml_items (ml-server/load_data.py, English 시트)
+CREATE TABLE IF NOT EXISTS ml_items (
+  item_no TEXT PRIMARY KEY,
+  item_name TEXT NOT NULL,
+  korean_name TEXT,
+  english_name TEXT,
+  vintage TEXT,
+  country TEXT,
+  producer TEXT,
+  region TEXT,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  row_hash TEXT
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ml_items_fts USING fts5(item_name, tokenize = 'trigram');
+
+CREATE TRIGGER IF NOT EXISTS ml_items_fts_ai AFTER INSERT ON ml_items BEGIN
+  DELETE FROM ml_items_fts WHERE rowid = new.rowid;
+  INSERT INTO ml_items_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+CREATE TRIGGER IF NOT EXISTS ml_items_fts_ad AFTER DELETE ON ml_items BEGIN
+  DELETE FROM ml_items_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS ml_items_fts_au AFTER UPDATE OF item_name ON ml_items BEGIN
+  DELETE FROM ml_items_fts WHERE rowid = old.rowid;
+  INSERT INTO ml_items_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+
+-- 3. client_item_stats (scripts/init_db.sql, Client 시트 거래 이력)
+--    init_db.sql이 테이블을 다시 만들 때 FTS 테이블/트리거도 같이 다시 만든다
+CREATE TABLE IF NOT EXISTS client_item_stats (
+  client_code TEXT NOT NULL,
+  item_no TEXT NOT NULL,
+  item_name TEXT NOT NULL,
+  last_ship_date TEXT,
+  buy_count INTEGER NOT NULL,
+  avg_price REAL,
+  PRIMARY KEY (client_code, item_no)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS client_item_stats_fts USING fts5(item_name, tokenize = 'trigram');
+
+CREATE TRIGGER IF NOT EXISTS client_item_stats_fts_ai AFTER INSERT ON client_item_stats BEGIN
+  DELETE FROM client_item_stats_fts WHERE rowid = new.rowid;
+  INSERT INTO client_item_stats_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+CREATE TRIGGER IF NOT EXISTS client_item_stats_fts_ad AFTER DELETE ON client_item_stats BEGIN
+  DELETE FROM client_item_stats_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS client_item_stats_fts_au AFTER UPDATE OF item_name ON client_item_stats BEGIN
+  DELETE FROM client_item_stats_fts WHERE rowid = old.rowid;
+  INSERT INTO client_item_stats_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+
+-- 4. glass_items (scripts/init_glass_db.sql, DL-Client 시트)
+CREATE TABLE IF NOT EXISTS glass_items (
+  item_no TEXT PRIMARY KEY,
+  item_name TEXT NOT NULL,
+  supply_price REAL DEFAULT 0,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS glass_items_fts USING fts5(item_name, tokenize = 'trigram');
+
+CREATE TRIGGER IF NOT EXISTS glass_items_fts_ai AFTER INSERT ON glass_items BEGIN
+  DELETE FROM glass_items_fts WHERE rowid = new.rowid;
+  INSERT INTO glass_items_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+CREATE TRIGGER IF NOT EXISTS glass_items_fts_ad AFTER DELETE ON glass_items BEGIN
+  DELETE FROM glass_items_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS glass_items_fts_au AFTER UPDATE OF item_name ON glass_items BEGIN
+  DELETE FROM glass_items_fts WHERE rowid = old.rowid;
+  INSERT INTO glass_items_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+
+-- 5. 기존 데이터로 FTS 채우기 (마이그레이션 이전에 들어간 행 / 재실행 시 옛 rowid 정리)
+DELETE FROM items_fts;
+INSERT INTO items_fts (rowid, item_name) SELECT rowid, item_name FROM items;
+
+DELETE FROM ml_items_fts;
+INSERT INTO ml_items_fts (rowid, item_name) SELECT rowid, item_name FROM ml_items;
+
+DELETE FROM client_item_stats_fts;
+INSERT INTO client_item_stats_fts (rowid, item_name) SELECT rowid, item_name FROM client_item_stats;
+
+DELETE FROM glass_items_fts;
+INSERT INTO glass_items_fts (rowid, item_name) SELECT rowid, item_name FROM glass_items;
@@ -0,0 +1,127 @@
+"""
+매칭 요청 입장 제어 (큐 깊이 상한 + 요청별 마감 시간)
+
+모델 계산(인코딩 + 검색)은 동시에 ML_MATCH_CONCURRENCY개만 실행하고, 나머지는 대기한다.
+- 대기 + 실행 중인 요청이 ML_ADMISSION_MAX_DEPTH 이상이면 즉시 거절 (queue_full)
+- 예상 대기 + 예상 처리 시간이 마감(ML_REQUEST_DEADLINE_MS 또는 X-Request-Deadline-Ms)을
+  넘길 것 같으면 거절 (deadline)
+거절된 요청은 오류가 아니라 어휘/메모리 경로로 응답하고 degraded 표시를 붙인다 (main.py).
+처리 시간 예상은 최근 쿼리당 처리 시간의 지수 이동 평균.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+MAX_DEPTH = int(os.environ.get("ML_ADMISSION_MAX_DEPTH", "16"))
+DEADLINE_MS = float(os.environ.get("ML_REQUEST_DEADLINE_MS", "4000"))
+CONCURRENCY = int(os.environ.get("ML_MATCH_CONCURRENCY", "1"))
+# 쿼리당 처리 시간 이동 평균 가중치
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 1000
+
+
+class AdmissionRejected(Exception):
+    """큐가 가득 찼거나 마감 안에 처리할 수 없음 (reason: queue_full / deadline / warming)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[position], 2)
+
+
+class AdmissionController:
+    """이벤트 루프 안에서만 사용 (카운터는 락 없이 갱신)"""
+
+    def __init__(self, max_depth: int = MAX_DEPTH, deadline_ms: float = DEADLINE_MS,
+                 concurrency: int = CONCURRENCY):
+        self.max_depth = max_depth
+        self.deadline_ms = deadline_ms
+        self.concurrency = max(1, concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        self.depth = 0
+        self.running = 0
+        self.max_depth_seen = 0
+        self.admitted = 0
+        # 거절 사유(queue_full / deadline / warming) → 건수
+        self.shed: Dict[str, int] = {"queue_full": 0, "deadline": 0, "warming": 0}
+        self.ms_per_query: Optional[float] = None
+        self.wait_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def estimate_ms(self, queries: int) -> float:
+        """앞선 대기 요청 + 이번 요청 처리 예상 시간"""
+        if self.ms_per_query is None:
+            return 0.0
+        # 앞선 요청(대기 + 실행 중) 크기는 모르므로 요청당 1쿼리로 보고, 동시 실행 수만큼 나눔
+        ahead = self.depth / self.concurrency
+        return self.ms_per_query * (ahead + queries)
+
+    def reject(self, reason: str) -> AdmissionRejected:
+        """거절 집계 후 예외 반환 (warming: 모델 로딩 중이라 어휘 경로만 가능)"""
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        return AdmissionRejected(reason)
+
+    def _observe(self, queries: int, elapsed_ms: float) -> None:
+        per_query = elapsed_ms / max(1, queries)
+        if self.ms_per_query is None:
+            self.ms_per_query = per_query
+        else:
+            self.ms_per_query += EWMA_ALPHA * (per_query - self.ms_per_query)
+
+    @asynccontextmanager
+    async def slot(self, queries: int, deadline_ms: Optional[float] = None) -> AsyncIterator[None]:
+        """실행 슬롯 획득 - 획득 못 하면 AdmissionRejected"""
+        deadline_ms = self.deadline_ms if deadline_ms is None else deadline_ms
+        if self.depth >= self.max_depth:
+            raise self.reject("queue_full")
+        if self.estimate_ms(queries) > deadline_ms:
+            raise self.reject("deadline")
+
+        self.depth += 1
+        self.max_depth_seen = max(self.max_depth_seen, self.depth)
+        started = time.perf_counter()
+        try:
+            # 처리 시간 예상분을 남기고 기다릴 수 있는 만큼만 대기
+            budget_ms = deadline_ms - (self.ms_per_query or 0.0) * queries
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, budget_ms) / 1000)
+            except asyncio.TimeoutError:
+                raise self.reject("deadline")
+            self.wait_ms.append((time.perf_counter() - started) * 1000)
+            self.admitted += 1
+            self.running += 1
+            run_started = time.perf_counter()
+            try:
+                yield
+                self._observe(queries, (time.perf_counter() - run_started) * 1000)
+            finally:
+                self.running -= 1
+                self._semaphore.release()
+        finally:
+            self.depth -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        wait_ms = list(self.wait_ms)
+        return {
+            "queue_depth": self.depth,
+            "running": self.running,
+            "max_depth": self.max_depth,
+            "max_depth_seen": self.max_depth_seen,
+            "concurrency": self.concurrency,
+            "deadline_ms": self.deadline_ms,
+            "admitted": self.admitted,
+            "shed": dict(self.shed, total=sum(self.shed.values())),
+            "ms_per_query_ewma": round(self.ms_per_query, 2) if self.ms_per_query is not None else None,
+            "wait_ms": {"p50": _percentile(wait_ms, 0.5), "p95": _percentile(wait_ms, 0.95)},
+        }
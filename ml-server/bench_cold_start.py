@@ -0,0 +1,129 @@
+"""
+콜드 스타트 벤치마크
+
+uvicorn 프로세스를 여러 번 새로 띄워서
+- HTTP 준비 시간: 프로세스 시작 → `/` 첫 응답
+- 준비 완료 시간: 프로세스 시작 → `/` status == healthy (모델 + 인덱스 + 워밍업)
+을 재고, 서버가 기록한 단계별 타임라인(/api/stats startup)과 함께 중앙값을 예산과 비교한다.
+--import-only 는 `python -c "import main"` 시간만 잰다 (무거운 import가 모듈 최상단으로 돌아왔는지 확인용).
+
+사용법:
+    python bench_cold_start.py --runs 3
+    ML_SNAPSHOT_PATH=../ml_snapshot.bin python bench_cold_start.py --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from startup import BUDGET_MS, HTTP_BUDGET_MS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_json(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def measure_import(runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=HERE, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def measure_start(port: int, timeout_s: float, verbose: bool) -> Dict[str, Any]:
+    base = f"http://127.0.0.1:{port}"
+    output = None if verbose else subprocess.DEVNULL
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=HERE, stdout=output, stderr=output,
+    )
+    http_ms = ready_ms = None
+    try:
+        while time.perf_counter() - started < timeout_s:
+            if process.poll() is not None:
+                raise RuntimeError(f"서버 프로세스 종료 (code={process.returncode})")
+            health = get_json(base + "/")
+            elapsed = (time.perf_counter() - started) * 1000
+            if health is not None:
+                if http_ms is None:
+                    http_ms = elapsed
+                if health["status"] == "healthy":
+                    ready_ms = elapsed
+                    break
+                if health["status"] == "error":
+                    break
+            time.sleep(0.02)
+        stats = get_json(base + "/api/stats") or {}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"http_ms": http_ms, "ready_ms": ready_ms, "startup": stats.get("startup")}
+
+
+def summarize(label: str, values: List[float], budget_ms: Optional[float] = None) -> None:
+    if not values:
+        print(f"   {label:<10} 측정 실패")
+        return
+    median = statistics.median(values)
+    line = f"   {label:<10} median {median:8.1f}ms  min {min(values):8.1f}ms  max {max(values):8.1f}ms"
+    if budget_ms is not None:
+        line += f"  {'✅' if median <= budget_ms else '⚠️'} 예산 {budget_ms:.0f}ms"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ml-server 콜드 스타트 벤치마크")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300, help="실행당 준비 대기 최대 초")
+    parser.add_argument("--import-only", action="store_true", help="`import main` 시간만 측정")
+    parser.add_argument("--verbose", action="store_true", help="서버 로그 출력")
+    args = parser.parse_args()
+
+    import_ms = measure_import(args.runs)
+    print(f"⏱️ import main ({args.runs}회)")
+    summarize("import", import_ms)
+    if args.import_only:
+        return
+
+    results = []
+    for run in range(args.runs):
+        result = measure_start(args.port, args.timeout, args.verbose)
+        results.append(result)
+        http = f"{result['http_ms']:.0f}ms" if result["http_ms"] is not None else "-"
+        ready = f"{result['ready_ms']:.0f}ms" if result["ready_ms"] is not None else "-"
+        print(f"   run {run + 1}: http {http}, ready {ready}")
+
+    print(f"⏱️ 콜드 스타트 ({args.runs}회)")
+    summarize("http", [r["http_ms"] for r in results if r["http_ms"] is not None], HTTP_BUDGET_MS)
+    summarize("ready", [r["ready_ms"] for r in results if r["ready_ms"] is not None], BUDGET_MS)
+
+    # 서버 내부 단계별 시간 (마지막 실행 기준 단계 이름, 실행별 중앙값)
+    phases: Dict[str, List[float]] = {}
+    for result in results:
+        for phase in (result["startup"] or {}).get("phases", []):
+            phases.setdefault(phase["phase"], []).append(phase["ms"])
+    if phases:
+        print("⏱️ 단계별 (서버 타임라인, 직전 단계 이후 ms)")
+        for name, values in phases.items():
+            print(f"   {name:<13} median {statistics.median(values):8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+배치 응답 직렬화 비용 벤치마크
+
+기본 JSON(Pydantic MatchResult 검증 + 직렬화) vs 컴팩트 모드(컬럼형 JSON / msgpack)
+
+사용법:
+    python bench_serialization.py --queries 500 --top-k 10
+"""
+
+import argparse
+import json
+import random
+import time
+
+from catalog_index import CatalogIndex
+from matcher import SEMANTIC_METHOD, format_results
+from main import BatchMatchResponse, MODEL_INFO
+import compact
+
+
+def make_index(n_items: int) -> CatalogIndex:
+    items = [
+        {
+            "item_no": f"{3000000 + i}",
+            "item_name": f"샘플 와인 {i} / Sample Wine {i} ({2010 + i % 14})",
+        }
+        for i in range(n_items)
+    ]
+    return CatalogIndex("wine", items)
+
+
+def make_hits(n_items: int, n_queries: int, top_k: int):
+    hits_list = []
+    for _ in range(n_queries):
+        rows = random.sample(range(n_items), top_k)
+        scores = sorted((random.random() for _ in rows), reverse=True)
+        hits_list.append({"rows": rows, "scores": scores, "method": SEMANTIC_METHOD})
+    return hits_list
+
+
+def timeit(fn, repeat: int):
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ml-server 응답 직렬화 벤치마크")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    index = make_index(args.items)
+    hits_list = make_hits(args.items, args.queries, args.top_k)
+    queries = [f"query {i}" for i in range(args.queries)]
+
+    def pydantic_json():
+        # 기본 모드: FastAPI response_model 검증 + 직렬화와 같은 경로
+        body = BatchMatchResponse(
+            success=True,
+            queries=queries,
+            results=[format_results(index, hits) for hits in hits_list],
+            processing_time_ms=0.0,
+            model_info=MODEL_INFO,
+        )
+        return body.model_dump_json().encode("utf-8")
+
+    def plain_json():
+        return json.dumps({
+            "success": True,
+            "queries": queries,
+            "results": [format_results(index, hits) for hits in hits_list],
+            "model_info": MODEL_INFO,
+        }, ensure_ascii=False).encode("utf-8")
+
+    def columnar_json():
+        return compact.encode(compact.COLUMNAR_JSON_MEDIA_TYPE, compact.columnar_payload(index, hits_list))
+
+    def columnar_msgpack():
+        return compact.encode(compact.MSGPACK_MEDIA_TYPE, compact.columnar_payload(index, hits_list))
+
+    cases = [
+        ("pydantic JSON (기본)", pydantic_json),
+        ("dict JSON (검증 없음)", plain_json),
+        ("columnar JSON", columnar_json),
+    ]
+    if compact.msgpack is not None:
+        cases.append(("columnar msgpack", columnar_msgpack))
+    else:
+        print("⚠️ msgpack 미설치 - msgpack 측정 생략")
+
+    print(f"📊 {args.queries}개 쿼리 × top {args.top_k} (품목 {args.items}개, 최소 {args.repeat}회 중 최고)")
+    print(f"{'형식':<24}{'시간(ms)':>10}{'크기(KB)':>12}")
+    baseline = None
+    for name, fn in cases:
+        ms, size = timeit(fn, args.repeat)
+        baseline = baseline or ms
+        print(f"{name:<24}{ms:>10.2f}{size / 1024:>12.1f}   x{baseline / ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
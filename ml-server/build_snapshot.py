@@ -0,0 +1,83 @@
+"""
+인덱스 스냅샷 빌드 (오프라인)
+
+DB에서 데이터 타입별 카탈로그 인덱스 + 쿼리 메모리를 구성하고 임베딩을 인코딩해
+snapshot.py 형식의 단일 파일로 저장한다. 서버는 ML_SNAPSHOT_PATH 로 이 파일을 지정하면
+시작 시 DB 조회/인코딩 없이 mmap으로 불러온다.
+
+카탈로그가 바뀌면 (load_data.py / dedup_job.py 실행 후) 다시 빌드해야 한다.
+
+사용법:
+    python build_snapshot.py --out ../ml_snapshot.bin
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+from sentence_transformers import SentenceTransformer
+
+from catalog_index import DATA_TYPES, load_index
+from db import Database
+from memory_stats import MB
+from query_memory import QueryMemory
+from snapshot import Snapshot, SnapshotWriter, write_index, write_query_memory
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ml-server 인덱스 스냅샷 빌드")
+    parser.add_argument("--db", default=os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data.sqlite3"))
+    parser.add_argument("--out", default=os.environ.get("ML_SNAPSHOT_PATH") or os.path.join(os.path.dirname(__file__), "..", "ml_snapshot.bin"))
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="서버 모델과 같아야 함 (다르면 서버가 스냅샷을 거부)")
+    parser.add_argument("--data-type", choices=DATA_TYPES, action="append", help="포함할 데이터 타입 (기본: 전부)")
+    parser.add_argument("--no-query-memory", action="store_true", help="쿼리 메모리 제외")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = Database(args.db, pool_size=1)
+
+    print(f"📦 모델 로딩: {args.model}")
+    model = SentenceTransformer(args.model)
+
+    writer = SnapshotWriter()
+    data_types = {}
+    with db.read() as conn:
+        for data_type in args.data_type or DATA_TYPES:
+            index = load_index(conn, data_type)
+            if index.items:
+                print(f"🧠 [{data_type}] {len(index)}개 임베딩 생성 중...")
+                index.encode(model)
+            else:
+                print(f"⚠️ [{data_type}] 품목 데이터가 없습니다.")
+            data_types[data_type] = write_index(writer, index)
+
+        remembered = 0
+        if not args.no_query_memory:
+            memory = QueryMemory()
+            memory.load(conn)
+            remembered = write_query_memory(writer, memory)
+    db.close()
+
+    writer.meta = {
+        "model": args.model,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source_db": os.path.abspath(args.db),
+        "data_types": data_types,
+    }
+    manifest = writer.write(args.out)
+
+    # 방금 쓴 파일을 다시 열어 체크섬 확인
+    Snapshot(args.out, verify=True)
+    size = os.path.getsize(args.out)
+    print(f"💾 스냅샷 저장: {args.out} ({size / MB:.1f}MB, 섹션 {len(manifest['sections'])}개)")
+    for data_type, meta in data_types.items():
+        print(f"   {data_type}: {meta['items']}개 품목, dim={meta['dim']}")
+    print(f"   쿼리 메모리: {remembered}개 키")
+    print(f"✅ 완료 ({time.perf_counter() - started:.1f}초)")
+
+
+if __name__ == "__main__":
+    main()
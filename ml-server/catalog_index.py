@@ -0,0 +1,314 @@
+"""
+데이터 타입별(wine / glass / riedel) 카탈로그 인덱스
+
+각 인덱스는 자기 품목, 임베딩, 어휘(자모 n-gram) 인덱스, 사전 필터, 거래처 구매 통계를 따로 가진다.
+와인 검색이 와인잔 행렬을 훑거나 그 반대가 되는 일이 없도록 분리.
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from families import FamilyIndex
+from memory_stats import deep_sizeof
+from filters import StructuredFilters
+from ngram_index import NgramIndex, is_hangul_token, search_fields
+from transliterate import hangulize, romanize, split_scripts
+
+# 데이터 타입 → 품목/거래처 통계 쿼리
+# items 쿼리는 앞에서부터 순서대로 시도하고, 결과가 있는 첫 쿼리를 사용
+INDEX_SOURCES: Dict[str, Dict[str, Any]] = {
+    "wine": {
+        "items": [
+            # load_data.py가 만든 English 시트 카탈로그 (메타데이터 포함)
+            """
+            SELECT item_no, item_name, korean_name, english_name, vintage, country, producer, region
+            FROM ml_items
+            WHERE item_no IS NOT NULL AND item_name IS NOT NULL
+            """,
+            # 없으면 거래 이력의 고유 품목
+            """
+            SELECT DISTINCT item_no, item_name
+            FROM client_item_stats
+            WHERE item_no IS NOT NULL AND item_name IS NOT NULL
+            LIMIT 1000
+            """,
+        ],
+        "client_stats": """
+            SELECT client_code, item_no, buy_count
+            FROM client_item_stats
+            WHERE client_code IS NOT NULL AND item_no IS NOT NULL
+        """,
+    },
+    "glass": {
+        "items": [
+            """
+            SELECT item_no, item_name
+            FROM glass_items
+            WHERE item_no IS NOT NULL AND item_name IS NOT NULL
+            """,
+        ],
+        "client_stats": """
+            SELECT client_code, item_no, 1
+            FROM glass_client_item_stats
+            WHERE client_code IS NOT NULL AND item_no IS NOT NULL
+        """,
+    },
+    "riedel": {
+        "items": [
+            # load_data.py가 만든 riedel 시트 카탈로그
+            """
+            SELECT item_no, item_name, korean_name, english_name
+            FROM ml_riedel_items
+            WHERE item_no IS NOT NULL AND item_name IS NOT NULL
+            """,
+        ],
+        "client_stats": None,
+    },
+}
+
+DATA_TYPES = list(INDEX_SOURCES.keys())
+
+def korean_text(item: Dict[str, Any]) -> str:
+    return item.get("korean_name") or split_scripts(item["item_name"])[0]
+
+
+def english_text(item: Dict[str, Any]) -> str:
+    return item.get("english_name") or split_scripts(item["item_name"])[1]
+
+
+class CatalogIndex:
+    """하나의 데이터 타입에 대한 검색 인덱스"""
+
+    # 자모 n-gram 필드 이름 (스냅샷 섹션 이름과 같음)
+    NGRAM_FIELDS = ("jamo", "romanized", "hangulized")
+
+    def __init__(self, name: str, items: List[Dict[str, Any]], ngram_fields: Optional[Dict[str, NgramIndex]] = None):
+        """ngram_fields: 스냅샷에서 복원한 자모 인덱스 (없으면 품목명에서 빌드)"""
+        self.name = name
+        self.items = items
+        self._embeddings = None
+        # 스냅샷의 임베딩 행렬 (numpy mmap 뷰) - 처음 쓸 때 torch 텐서로 (스냅샷 로드는 torch 없이)
+        self.snapshot_embeddings: Optional[np.ndarray] = None
+        # 스냅샷에서 불러온 임베딩은 행 정규화되어 있음
+        self.normalized = False
+        # 거래처 코드 → {행 번호: 구매 횟수}
+        self.client_rows: Dict[str, Dict[int, int]] = {}
+        # 품목번호 / 품목명 → 첫 행 번호 (피드백/메모리 조회용)
+        self.row_of: Dict[str, int] = {}
+        self.row_of_name: Dict[str, int] = {}
+        # 중복 군집 (dedup_job.py): 행 번호 → 대표 행 번호
+        self.cluster_of: Dict[int, int] = {}
+        # 구조별 크기/개수 (measure()에서 빌드·스냅샷 로드 때 한 번 - /api/stats마다 훑지 않음)
+        self.memory_sizes: Dict[str, int] = {}
+        self.structure_stats: Dict[str, Any] = {}
+
+        for row, item in enumerate(items):
+            self.row_of.setdefault(str(item["item_no"]), row)
+            self.row_of_name.setdefault(item["item_name"].strip(), row)
+
+        # 빈티지/생산자/국가/지역 → 행 비트셋
+        self.filters = StructuredFilters(items)
+        if ngram_fields is not None:
+            self.jamo = ngram_fields["jamo"]
+            self.romanized = ngram_fields["romanized"]
+            self.hangulized = ngram_fields["hangulized"]
+        else:
+            # 오타 허용 자모 n-gram 인덱스 (빌드 시 1회 분해)
+            self.jamo = NgramIndex([item["item_name"] for item in items])
+            # 교차 문자 검색용 전사 필드 (빌드 시 1회): 한글명 → 로마자, 영문명 → 한글 발음
+            self.romanized = NgramIndex([romanize(korean_text(item)) for item in items])
+            self.hangulized = NgramIndex([hangulize(english_text(item)) for item in items])
+        # 빈티지만 다른 품목 묶음 (centroid는 encode 후)
+        self.families = FamilyIndex(items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def embeddings(self):
+        """임베딩 텐서 (스냅샷 행렬이면 처음 접근할 때 torch.from_numpy + 패밀리 centroid)"""
+        if self._embeddings is None and self.snapshot_embeddings is not None:
+            import torch
+
+            self._embeddings = torch.from_numpy(self.snapshot_embeddings)
+            self.snapshot_embeddings = None
+            self.families.build_centroids(self._embeddings)
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, value) -> None:
+        self._embeddings = value
+        self.snapshot_embeddings = None
+
+    @property
+    def embeddings_nbytes(self) -> int:
+        """임베딩 크기 (스냅샷 행렬은 텐서로 바꾸지 않고)"""
+        if self.snapshot_embeddings is not None:
+            return int(self.snapshot_embeddings.nbytes)
+        if self._embeddings is None:
+            return 0
+        return self._embeddings.element_size() * self._embeddings.nelement()
+
+    @property
+    def embedding_dim(self) -> int:
+        matrix = self.snapshot_embeddings if self.snapshot_embeddings is not None else self._embeddings
+        return int(matrix.shape[1]) if matrix is not None else 0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.items) and (self._embeddings is not None or self.snapshot_embeddings is not None)
+
+    def attach_client_stats(self, stats_rows: List[tuple]) -> None:
+        """(client_code, item_no, buy_count) → 거래처별 행 번호 매핑"""
+        rows_by_item_no: Dict[str, List[int]] = {}
+        for row, item in enumerate(self.items):
+            rows_by_item_no.setdefault(str(item["item_no"]), []).append(row)
+
+        for client_code, item_no, buy_count in stats_rows:
+            rows = rows_by_item_no.get(str(item_no))
+            if not rows:
+                continue
+            client = self.client_rows.setdefault(str(client_code), {})
+            for row in rows:
+                client[row] = client.get(row, 0) + int(buy_count or 0)
+
+    def attach_clusters(self, cluster_rows: List[tuple]) -> None:
+        """(item_no, canonical_item_no) → 행별 대표 행 (응답 중복 접기용)"""
+        for item_no, canonical_item_no in cluster_rows:
+            row = self.row_of.get(str(item_no))
+            canonical = self.row_of.get(str(canonical_item_no))
+            if row is not None and canonical is not None:
+                self.cluster_of[row] = canonical
+
+    def resolve_ref(self, ref: Optional[str]) -> Optional[int]:
+        """품목 참조(품목번호 또는 품목명, 예: item_alias.canonical) → 행 번호"""
+        if not ref:
+            return None
+        row = self.row_of.get(ref)
+        return row if row is not None else self.row_of_name.get(ref)
+
+    def lexical_search(self, tokens: List[str], subset: Optional[np.ndarray] = None) -> Dict[int, float]:
+        """
+        분해된 쿼리 토큰 → 행별 어휘 점수
+        한글 토큰은 품목명 + 한글 전사, 라틴 토큰은 품목명 + 로마자 전사 필드에서 찾는다
+        """
+        token_fields = [
+            (token, (self.jamo, self.hangulized) if is_hangul_token(token) else (self.jamo, self.romanized))
+            for token in tokens
+        ]
+        return search_fields(token_fields, subset)
+
+    def encode(self, model, previous: Optional["CatalogIndex"] = None, changed: Optional[Set[str]] = None) -> int:
+        """
+        모든 품목명의 임베딩 미리 계산 (속도 최적화)
+        previous: 이전 인덱스 - item_no와 품목명이 같고 changed(sync manifest)에 없는 행은 임베딩 재사용
+        반환: 새로 인코딩한 행 수
+        """
+        item_names = [item["item_name"] for item in self.items]
+        if previous is None or previous.embeddings is None:
+            self.embeddings = model.encode(item_names, convert_to_tensor=True)
+            self.families.build_centroids(self.embeddings)
+            return len(item_names)
+
+        import torch
+
+        changed = changed or set()
+        reuse_rows: List[int] = []
+        old_rows: List[int] = []
+        fresh_rows: List[int] = []
+        for row, item in enumerate(self.items):
+            item_no = str(item["item_no"])
+            old = previous.row_of.get(item_no)
+            if old is not None and item_no not in changed and previous.items[old]["item_name"] == item["item_name"]:
+                reuse_rows.append(row)
+                old_rows.append(old)
+            else:
+                fresh_rows.append(row)
+
+        source = previous.embeddings
+        embeddings = torch.empty((len(self.items), source.shape[1]), dtype=source.dtype, device=source.device)
+        if reuse_rows:
+            embeddings[reuse_rows] = source[old_rows]
+        if fresh_rows:
+            fresh = model.encode([item_names[row] for row in fresh_rows], convert_to_tensor=True)
+            fresh = fresh.to(device=source.device, dtype=source.dtype)
+            if previous.normalized:
+                # 스냅샷에서 온 행렬은 행 정규화 상태 → 새 행도 맞춤
+                fresh = torch.nn.functional.normalize(fresh, dim=1)
+            embeddings[fresh_rows] = fresh
+        self.embeddings = embeddings
+        self.normalized = previous.normalized
+        self.families.build_centroids(self.embeddings)
+        return len(fresh_rows)
+
+    def measure(self) -> None:
+        """
+        구조별 메모리 크기 + 개수 기록 (인덱스 구성이 끝난 뒤 한 번 - load_index / 스냅샷 read_index)
+        임베딩 크기는 재인코딩으로 바뀌므로 여기 넣지 않음 (embeddings_nbytes는 매번 계산해도 쌈)
+        """
+        self.memory_sizes = {
+            "jamo": deep_sizeof(self.jamo),
+            "transliteration": deep_sizeof(self.romanized) + deep_sizeof(self.hangulized),
+            "families": deep_sizeof(self.families),
+            "items": deep_sizeof(self.items),
+            "client_stats": deep_sizeof(self.client_rows),
+        }
+        self.structure_stats = {
+            "clients": len(self.client_rows),
+            "clustered_items": len(self.cluster_of),
+            "jamo": self.jamo.stats(),
+            "romanized": self.romanized.stats(),
+            "hangulized": self.hangulized.stats(),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        embeddings_mb = self.embeddings_nbytes / (1024**2)
+        return {
+            "items_count": len(self.items),
+            "embeddings_cached": self.ready,
+            "embeddings_mb": round(embeddings_mb, 3),
+            **self.structure_stats,
+            # 필터 적용/대체 횟수, centroid 준비 여부는 계속 바뀜
+            "filters": self.filters.stats(),
+            "families": self.families.stats(),
+        }
+
+
+def load_index(conn: sqlite3.Connection, name: str) -> CatalogIndex:
+    """DB에서 데이터 타입별 품목 + 거래처 통계 로드 (임베딩은 별도)"""
+    source = INDEX_SOURCES[name]
+    items: List[Dict[str, Any]] = []
+
+    for sql in source["items"]:
+        try:
+            cursor = conn.execute(sql)
+        except sqlite3.OperationalError:
+            # 테이블 없음 → 다음 후보
+            continue
+        columns = [col[0] for col in cursor.description]
+        items = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if items:
+            break
+
+    index = CatalogIndex(name, items)
+
+    if items and source["client_stats"]:
+        try:
+            index.attach_client_stats(conn.execute(source["client_stats"]).fetchall())
+        except sqlite3.OperationalError:
+            pass
+
+    if items:
+        try:
+            index.attach_clusters(conn.execute(
+                "SELECT item_no, canonical_item_no FROM ml_item_clusters WHERE data_type = ?", (name,)
+            ).fetchall())
+        except sqlite3.OperationalError:
+            # dedup_job.py를 아직 돌리지 않음
+            pass
+
+    index.measure()
+    return index
+
@@ -0,0 +1,92 @@
+"""
+컴팩트 응답 모드 (Accept 헤더로 선택)
+
+- application/x-msgpack                  → msgpack (msgpack 패키지 필요)
+- application/vnd.orderai.columnar+json  → 컬럼형 JSON (orjson 있으면 사용)
+
+반복되는 키/ model_info 없이 쿼리별 결과를 평탄화한 배열 + offsets로 보낸다.
+쿼리 i의 결과는 item_no[offsets[i]:offsets[i+1]] 구간.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # 선택 의존성
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+from catalog_index import CatalogIndex
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.orderai.columnar+json"
+
+_MSGPACK_ALIASES = {MSGPACK_MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack"}
+
+
+class CompactFormatUnavailable(Exception):
+    """요청한 컴팩트 형식의 인코더가 설치되어 있지 않을 때"""
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Accept 헤더 → 컴팩트 media type (해당 없으면 None = 기본 JSON)"""
+    if not accept:
+        return None
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in _MSGPACK_ALIASES:
+            return MSGPACK_MEDIA_TYPE
+        if media_type == COLUMNAR_JSON_MEDIA_TYPE:
+            return COLUMNAR_JSON_MEDIA_TYPE
+    return None
+
+
+def columnar_payload(index: CatalogIndex, hits_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """쿼리별 hits → 컬럼형 배열"""
+    offsets = [0]
+    item_nos: List[str] = []
+    scores: List[float] = []
+    rows: List[int] = []
+    methods: List[str] = []
+    # 빈티지 그룹 검색이면 결과별 다른 빈티지 item_no 목록
+    other_vintages: List[List[str]] = []
+    grouped = any("groups" in hits for hits in hits_list)
+    items = index.items
+
+    for hits in hits_list:
+        hit_rows = hits["rows"]
+        rows.extend(hit_rows)
+        scores.extend(hits["scores"])
+        item_nos.extend(items[row]["item_no"] for row in hit_rows)
+        methods.append(hits["method"])
+        offsets.append(len(rows))
+        if grouped:
+            groups = hits.get("groups") or [[] for _ in hit_rows]
+            other_vintages.extend([items[other]["item_no"] for other in group] for group in groups)
+
+    payload = {
+        "data_type": index.name,
+        "offsets": offsets,
+        "item_no": item_nos,
+        "score": scores,
+        "row": rows,
+        "method": methods,
+    }
+    if grouped:
+        payload["other_vintages"] = other_vintages
+    return payload
+
+
+def encode(media_type: str, payload: Dict[str, Any]) -> bytes:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        if msgpack is None:
+            raise CompactFormatUnavailable("msgpack 패키지가 설치되어 있지 않습니다")
+        return msgpack.packb(payload, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
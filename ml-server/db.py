@@ -0,0 +1,117 @@
+"""
+ml-server 전용 SQLite 접근 계층
+
+- 읽기: 읽기 전용 커넥션 풀 (mode=ro URI + query_only, mmap/cache pragma)
+  WAL 모드에서는 Node 앱이 data.sqlite3에 쓰는 중에도 읽기가 막히지 않는다.
+- 쓰기: 피드백 저장용 전용 writer 커넥션 1개 (lock으로 직렬화)
+- 같은 SQL 문자열은 커넥션별 statement 캐시(cached_statements)로 재사용된다.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+READ_POOL_SIZE = int(os.environ.get("ML_DB_POOL_SIZE", "4"))
+MMAP_SIZE = 256 * 1024 * 1024  # 256MB
+CACHE_SIZE_KB = 16 * 1024  # 16MB (음수 = KiB 단위)
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE = 128
+
+
+class Database:
+    """읽기 전용 커넥션 풀 + 피드백 writer"""
+
+    def __init__(self, path: str, pool_size: int = READ_POOL_SIZE):
+        self.path = os.path.abspath(path)
+        self.pool_size = pool_size
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        self._opened = 0
+        self._open_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE,
+        )
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """풀에서 읽기 커넥션 대여 (풀이 비었고 한도 미만이면 새로 연다)"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._open_lock:
+                can_open = self._opened < self.pool_size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = self._open_reader()
+                except Exception:
+                    with self._open_lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._pool.get()
+
+        try:
+            yield conn
+        finally:
+            # 읽기 트랜잭션이 열린 채로 돌아가면 WAL 체크포인트를 막으므로 정리
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """writer 커넥션으로 트랜잭션 실행 (성공 시 commit, 실패 시 rollback)"""
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._open_lock:
+            self._opened = 0
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -0,0 +1,206 @@
+"""
+카탈로그 중복 품목 탐지 (블로킹 + 청크 행렬곱 + union-find)
+
+같은 와인이 여러 코드/이름 변형으로 등록되어 있으면 top-k가 사실상 같은 품목으로 채워진다.
+전체 임베딩 행렬에서 근접 중복 쌍을 찾아 ml_item_clusters 테이블에 군집으로 저장하고,
+매처는 이 군집으로 응답의 중복을 접는다 (MatchOptions.collapse_duplicates).
+
+- 블로킹: 생산자 약어 코드("CH", "AR" 등 앞 대문자 토큰)를 뗀 품목명의 첫 단어가 같은 품목끼리만 비교
+  (코드가 있는 이름 / 없는 이름으로 등록된 같은 와인도 같은 블록)
+- 블록 안에서도 CHUNK 행씩 (CHUNK × 블록 크기) 유사도만 계산 → 메모리는 전체 n²이 아니라 블록 단위
+- 빈티지(families.row_vintage: vintage 컬럼 → 품목명 연도 → 품목코드), 용량(375ml, 1.5L), 포장(GB, WB),
+  입수(4본입)가 다르면 다른 품목으로 본다
+
+사용법:
+    python dedup_job.py --data-type wine --threshold 0.95
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from catalog_index import CatalogIndex, DATA_TYPES, load_index
+from db import Database
+from families import row_vintage
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_THRESHOLD = 0.95
+CHUNK = 1024
+
+_PRODUCER_CODE = re.compile(r"^([A-Z]{2,3})\s+")
+_VOLUME = re.compile(r"(\d+(?:\.\d+)?)\s*(ml|l)\b", re.IGNORECASE)
+_PACKAGING = re.compile(r"\b(GB|WB)\b")
+_PACK_COUNT = re.compile(r"(\d+)\s*(본입|병입|입|pk|pack)", re.IGNORECASE)
+_WORD = re.compile(r"[가-힣A-Za-z]+")
+
+CLUSTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ml_item_clusters (
+  data_type TEXT NOT NULL,
+  item_no TEXT NOT NULL,
+  cluster_id INTEGER NOT NULL,
+  canonical_item_no TEXT NOT NULL,    -- 군집 대표 (거래 횟수 최다)
+  item_name TEXT,
+  similarity REAL,                    -- 대표 품목과의 코사인 유사도
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (data_type, item_no)
+)
+"""
+
+
+def block_key(item_name: str) -> str:
+    """생산자 약어 코드를 뗀 품목명의 첫 단어 (소문자, 코드만 있으면 코드)"""
+    rest = _PRODUCER_CODE.sub("", item_name, count=1)
+    words = _WORD.findall(rest) or _WORD.findall(item_name)
+    return words[0].lower() if words else ""
+
+
+def variant_signature(item: Dict[str, Any]) -> Tuple[Optional[int], Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """빈티지/용량/포장/입수 표기 - 다르면 중복이 아니라 다른 SKU"""
+    item_name = item["item_name"]
+    volumes = tuple(sorted(f"{float(v):g}{u.lower()}" for v, u in _VOLUME.findall(item_name)))
+    packaging = tuple(sorted(p.upper() for p in _PACKAGING.findall(item_name)))
+    counts = tuple(sorted(n for n, _ in _PACK_COUNT.findall(item_name)))
+    return row_vintage(item), volumes, packaging, counts
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def normalized_matrix(index: CatalogIndex) -> np.ndarray:
+    matrix = index.embeddings.detach().cpu().numpy().astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def find_pairs(index: CatalogIndex, matrix: np.ndarray, threshold: float,
+               chunk: int = CHUNK) -> Tuple[List[Tuple[int, int, float]], Dict[str, int]]:
+    """블록별 청크 행렬곱으로 유사도 ≥ threshold 쌍 (i < j)"""
+    blocks: Dict[str, List[int]] = {}
+    for row, item in enumerate(index.items):
+        blocks.setdefault(block_key(item["item_name"]), []).append(row)
+
+    signatures = [variant_signature(item) for item in index.items]
+    pairs: List[Tuple[int, int, float]] = []
+    compared = 0
+    for rows in blocks.values():
+        if len(rows) < 2:
+            continue
+        rows_arr = np.asarray(rows)
+        block = matrix[rows_arr]
+        for start in range(0, len(rows), chunk):
+            sims = block[start:start + chunk] @ block.T
+            compared += sims.size
+            local_i, local_j = np.nonzero(sims >= threshold)
+            for li, lj in zip(local_i.tolist(), local_j.tolist()):
+                i, j = rows[start + li], rows[lj]
+                if i >= j or signatures[i] != signatures[j]:
+                    continue
+                pairs.append((i, j, float(sims[li, lj])))
+
+    n = len(index.items)
+    return pairs, {
+        "blocks": len(blocks),
+        "largest_block": max((len(r) for r in blocks.values()), default=0),
+        "compared": compared,
+        "all_pairs": n * n,
+    }
+
+
+def build_clusters(index: CatalogIndex, matrix: np.ndarray, pairs: List[Tuple[int, int, float]]) -> List[Tuple]:
+    """union-find 군집 → (item_no, cluster_id, canonical_item_no, item_name, 대표와의 유사도) 행"""
+    uf = UnionFind(len(index.items))
+    for i, j, _ in pairs:
+        uf.union(i, j)
+
+    members: Dict[int, List[int]] = {}
+    for row in sorted({row for i, j, _ in pairs for row in (i, j)}):
+        members.setdefault(uf.find(row), []).append(row)
+
+    # 대표: 거래처 구매 횟수 합이 가장 큰 품목 (같으면 품목번호 순)
+    popularity: Dict[int, int] = {}
+    for client in index.client_rows.values():
+        for row, count in client.items():
+            popularity[row] = popularity.get(row, 0) + count
+
+    records = []
+    for cluster_id, rows in enumerate(members.values(), start=1):
+        canonical = min(rows, key=lambda r: (-popularity.get(r, 0), str(index.items[r]["item_no"])))
+        for row in rows:
+            item = index.items[row]
+            similarity = float(matrix[row] @ matrix[canonical])
+            records.append((str(item["item_no"]), cluster_id, str(index.items[canonical]["item_no"]),
+                            item["item_name"], round(similarity, 4)))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="카탈로그 근접 중복 품목 탐지")
+    parser.add_argument("--db", default=os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data.sqlite3"))
+    parser.add_argument("--data-type", choices=DATA_TYPES, default="wine")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="한 번에 유사도를 계산할 행 수")
+    parser.add_argument("--dry-run", action="store_true", help="테이블에 쓰지 않고 군집만 출력")
+    args = parser.parse_args()
+
+    db = Database(args.db, pool_size=1)
+    with db.read() as conn:
+        index = load_index(conn, args.data_type)
+    if not index.items:
+        print(f"❌ [{args.data_type}] 카탈로그가 비어 있습니다")
+        return
+
+    print(f"📦 모델 로딩: {args.model}")
+    model = SentenceTransformer(args.model)
+    print(f"🧠 [{args.data_type}] {len(index)}개 임베딩 생성 중...")
+    index.encode(model)
+
+    started = time.perf_counter()
+    matrix = normalized_matrix(index)
+    pairs, info = find_pairs(index, matrix, args.threshold, args.chunk)
+    records = build_clusters(index, matrix, pairs)
+    elapsed = time.perf_counter() - started
+
+    clusters = len({r[1] for r in records})
+    print(f"✅ 블록 {info['blocks']}개 (최대 {info['largest_block']}행), "
+          f"비교 {info['compared']:,} / 전체 {info['all_pairs']:,} ({info['compared'] / max(1, info['all_pairs']):.1%})")
+    print(f"✅ 중복 쌍 {len(pairs)}개 → 군집 {clusters}개 ({len(records)}개 품목), {elapsed:.2f}초")
+
+    if args.dry_run:
+        for item_no, cluster_id, canonical, item_name, similarity in records[:50]:
+            print(f"   #{cluster_id} {item_no} → {canonical}  {similarity:.3f}  {item_name}")
+        return
+
+    # 데이터 타입별로 통째로 교체 (한 트랜잭션)
+    with db.write() as conn:
+        conn.execute(CLUSTERS_SCHEMA)
+        conn.execute("DELETE FROM ml_item_clusters WHERE data_type = ?", (args.data_type,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO ml_item_clusters (data_type, item_no, cluster_id, canonical_item_no, item_name, similarity)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(args.data_type, *record) for record in records],
+        )
+    db.close()
+    print("💾 ml_item_clusters 저장 완료 (ml-server /api/reload 후 반영)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+카탈로그 임베딩 바이너리 내보내기 (다른 서비스용)
+
+- 행렬: 헤더 없는 row-major little-endian 원시 바이트
+  - float32: rows × dim × 4 bytes
+  - int8   : rows × dim × 1 bytes 뒤에 행별 float32 scale (rows × 4 bytes)
+             원래 값 ≈ int8 값 × scale[row]
+- manifest(JSON): 카탈로그 버전, 모델, 모양, 바이트 레이아웃, 행 순서(item_no), sha256
+
+ETag는 (데이터 타입, dtype, 카탈로그 버전)으로 정해지므로 받는 쪽은
+If-None-Match로 버전이 바뀔 때만 다시 받고, 로컬 파일은 np.memmap 등으로 매핑해 쓰면 된다.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from catalog_index import CatalogIndex
+
+DTYPES = ("float32", "int8")
+MEDIA_TYPE = "application/octet-stream"
+
+
+class UnsupportedExportDtype(Exception):
+    """지원하지 않는 dtype 요청"""
+
+
+def _as_float32(index: CatalogIndex) -> np.ndarray:
+    return np.ascontiguousarray(index.embeddings.detach().cpu().numpy(), dtype="<f4")
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """행별 대칭 양자화 → (int8 행렬, float32 scale)"""
+    max_abs = np.abs(matrix).max(axis=1)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype("<f4")
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def artifact_info(rows: int, dim: int, dtype: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """레이아웃 정보 (바이트를 만들지 않고 모양만으로 계산, sha256은 만든 뒤에만)"""
+    if dtype not in DTYPES:
+        raise UnsupportedExportDtype(f"지원하지 않는 dtype: {dtype} (가능: {', '.join(DTYPES)})")
+    if dtype == "float32":
+        size = rows * dim * 4
+        layout = {"matrix": {"offset": 0, "dtype": "<f4", "shape": [rows, dim]}}
+    else:
+        size = rows * dim + rows * 4
+        layout = {
+            "matrix": {"offset": 0, "dtype": "i1", "shape": [rows, dim]},
+            "scales": {"offset": rows * dim, "dtype": "<f4", "shape": [rows]},
+        }
+    return {
+        "dtype": dtype,
+        "rows": rows,
+        "dim": dim,
+        "byte_order": "little",
+        "bytes": size,
+        "sha256": sha256,
+        "layout": layout,
+    }
+
+
+def build_artifact(index: CatalogIndex, dtype: str) -> Tuple[bytes, Dict[str, Any]]:
+    """인덱스 임베딩 → (원시 바이트, 레이아웃 정보)"""
+    if dtype not in DTYPES:
+        raise UnsupportedExportDtype(f"지원하지 않는 dtype: {dtype} (가능: {', '.join(DTYPES)})")
+    matrix = _as_float32(index)
+    rows, dim = matrix.shape
+
+    if dtype == "float32":
+        content = matrix.tobytes()
+    else:
+        quantized, scales = quantize_int8(matrix)
+        content = quantized.tobytes() + scales.tobytes()
+
+    return content, artifact_info(rows, dim, dtype, hashlib.sha256(content).hexdigest())
+
+
+def manifest(index: CatalogIndex, catalog_version: int, model_name: str, artifacts: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """행 순서 + 아티팩트 레이아웃 (행 i = rows[i])"""
+    return {
+        "data_type": index.name,
+        "catalog_version": catalog_version,
+        "model": model_name,
+        # encode()는 정규화하지 않으므로 코사인 유사도는 받는 쪽에서 정규화 후 내적 (스냅샷 로드 시만 정규화됨)
+        "normalized": index.normalized,
+        "artifacts": artifacts,
+        "rows": [item["item_no"] for item in index.items],
+        "item_names": [item["item_name"] for item in index.items],
+    }
+
+
+class ExportCache:
+    """(데이터 타입, dtype, 카탈로그 버전) → (바이트, 레이아웃). 버전이 바뀌면 비움"""
+
+    def __init__(self, max_entries: int = 6):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[bytes, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get_or_build(self, index: CatalogIndex, dtype: str, catalog_version: int) -> Tuple[bytes, Dict[str, Any]]:
+        key = (index.name, dtype, catalog_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        entry = build_artifact(index, dtype)
+        with self._lock:
+            # 이전 버전 아티팩트는 더 이상 쓸 일이 없음
+            for stale in [k for k in self._entries if k[2] != catalog_version]:
+                del self._entries[stale]
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.builds += 1
+        return entry
+
+    def cached_info(self, index: CatalogIndex, dtype: str, catalog_version: int) -> Dict[str, Any]:
+        """
+        manifest용 레이아웃 정보 - 행렬을 만들지 않음
+        이미 만든 아티팩트면 sha256까지, 아니면 sha256은 None (행렬 응답의 X-Content-SHA256 헤더로 확인)
+        """
+        with self._lock:
+            entry = self._entries.get((index.name, dtype, catalog_version))
+        if entry is not None:
+            return entry[1]
+        return artifact_info(len(index), index.embedding_dim, dtype)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def shrink(self, fraction: float) -> None:
+        """메모리 압박 시 오래된 아티팩트부터 제거 (항목이 적으므로 반올림)"""
+        with self._lock:
+            for _ in range(int(len(self._entries) * fraction + 0.5)):
+                self._entries.popitem(last=False)
+
+    def size_bytes(self) -> int:
+        return sum(len(content) for content, _ in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "builds": self.builds}
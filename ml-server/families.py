@@ -0,0 +1,140 @@
+"""
+와인 패밀리 (빈티지만 다른 품목 묶음) + 2단계 centroid 검색
+
+- 패밀리 키: 빈티지/괄호 연도/따옴표/공백을 뺀 품목명 (같은 이름, 다른 품목코드 = 다른 빈티지)
+- 행 빈티지: vintage 컬럼 → 품목명 4자리 연도 → 품목코드 3~4번째 자리 (resolveItems.ts codeToVintage)
+- 1단계: 패밀리 centroid 행렬에서 상위 패밀리 선택 (스캔 크기 ≈ 품목 수 / 평균 빈티지 수)
+- 2단계: 선택된 패밀리의 행만 유사도 계산 → 빈티지 힌트 / 거래처 이력으로 순위 조정
+- 결과는 패밀리당 한 행 + "같은 와인, 다른 빈티지" 목록
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_PAREN_YEAR = re.compile(r"\(\s*(?:19|20)\d{2}\s*\)")
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+_QUOTES = re.compile(r"[\"'`“”‘’]")
+_SHORT_YEAR = re.compile(r"(?:^|[^0-9])(\d{2})(?:[^0-9]|$)")
+_QTY_UNIT = re.compile(r"\b(\d+)\s*(병|박스|cs|box|bt|btl|ea|pcs|case|케이스)\b", re.IGNORECASE)
+
+# resolveItems.ts applyVintageAdjustment 와 같은 가감점
+VINTAGE_MATCH_BONUS = 0.08
+VINTAGE_MISMATCH_PENALTY = 0.18
+# 거래처가 산 적 있는 빈티지 가점 (구매 횟수 로그 스케일, 최대값)
+CLIENT_HISTORY_BOOST = 0.05
+# 힌트/이력이 없을 때 최신 빈티지를 앞에 두기 위한 동점 깨기
+LATEST_VINTAGE_TIEBREAK = 0.001
+# 1단계에서 고를 패밀리 수 (top_k 배수)
+FAMILY_FANOUT = 2
+GROUPED_METHOD = "pytorch_family"
+
+
+def family_key(item_name: str) -> str:
+    """품목명 → 패밀리 키 (빈티지 제거)"""
+    text = _PAREN_YEAR.sub(" ", str(item_name))
+    text = _YEAR.sub(" ", text)
+    text = _QUOTES.sub("", text)
+    return " ".join(text.lower().split())
+
+
+def code_vintage(item_no: Any) -> Optional[int]:
+    """품목코드 3~4번째 자리 → 연도 (3A24001 → 2024)"""
+    code = str(item_no or "").strip()
+    if len(code) < 4 or not code[2:4].isdigit():
+        return None
+    yy = int(code[2:4])
+    return 1900 + yy if yy >= 50 else 2000 + yy
+
+
+def row_vintage(item: Dict[str, Any]) -> Optional[int]:
+    value = item.get("vintage")
+    if value not in (None, ""):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            pass
+    match = _YEAR.search(str(item["item_name"]))
+    if match:
+        return int(match.group(1))
+    return code_vintage(item.get("item_no"))
+
+
+def vintage_hint(query: str) -> Optional[int]:
+    """쿼리의 빈티지 힌트 (4자리 연도 또는 2자리, 수량 표기는 제외)"""
+    text = _QTY_UNIT.sub(" ", str(query))
+    match = _YEAR.search(text)
+    if match:
+        return int(match.group(1))
+    match = _SHORT_YEAR.search(text)
+    if not match:
+        return None
+    yy = int(match.group(1))
+    return 1900 + yy if yy >= 50 else 2000 + yy
+
+
+class FamilyIndex:
+    """행 → 패밀리, 패밀리 → 행 목록 + centroid 임베딩"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        ids: Dict[str, int] = {}
+        family_of_row = []
+        for item in items:
+            key = family_key(item["item_name"])
+            family_of_row.append(ids.setdefault(key, len(ids)))
+        self.keys: List[str] = list(ids.keys())
+        self.family_of_row = np.asarray(family_of_row, dtype=np.int32)
+
+        order = np.argsort(self.family_of_row, kind="stable")
+        bounds = np.searchsorted(self.family_of_row[order], np.arange(len(self.keys) + 1))
+        self.members: List[np.ndarray] = [order[bounds[f]:bounds[f + 1]] for f in range(len(self.keys))]
+        self.vintages: List[Optional[int]] = [row_vintage(item) for item in items]
+        self.centroids = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def build_centroids(self, embeddings) -> None:
+        """패밀리별 평균 임베딩 (행 정규화 후 평균)"""
+        import torch
+
+        if embeddings is None or not len(self.keys):
+            self.centroids = None
+            return
+        normalized = torch.nn.functional.normalize(embeddings.float(), dim=1)
+        index = torch.as_tensor(self.family_of_row, dtype=torch.long, device=embeddings.device)
+        sums = torch.zeros((len(self.keys), embeddings.shape[1]), dtype=normalized.dtype, device=embeddings.device)
+        sums.index_add_(0, index, normalized)
+        self.centroids = torch.nn.functional.normalize(sums, dim=1)
+
+    def top_families(self, query_embeddings, n: int) -> List[List[int]]:
+        import torch
+        from sentence_transformers import util
+
+        similarities = util.cos_sim(query_embeddings, self.centroids)
+        top = torch.topk(similarities, k=min(n, len(self.keys)), dim=1)
+        return top.indices.tolist()
+
+    def adjust(self, row: int, score: float, hint: Optional[int], client_rows: Optional[Dict[int, int]]) -> float:
+        """빈티지 힌트 / 거래처 이력 / 최신 빈티지로 점수 조정"""
+        vintage = self.vintages[row]
+        if hint is not None and vintage is not None:
+            score = score + VINTAGE_MATCH_BONUS if hint == vintage else score - VINTAGE_MISMATCH_PENALTY
+        if client_rows:
+            count = client_rows.get(row, 0)
+            if count:
+                score += CLIENT_HISTORY_BOOST * min(1.0, math.log1p(count) / math.log(10))
+        if vintage is not None:
+            score += LATEST_VINTAGE_TIEBREAK * (vintage - 2000) / 100
+        return min(1.0, max(0.0, score))
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [len(m) for m in self.members]
+        return {
+            "families": len(self.keys),
+            "avg_vintages": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "max_vintages": max(sizes, default=0),
+            "centroids_ready": self.centroids is not None,
+        }
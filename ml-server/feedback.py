@@ -0,0 +1,230 @@
+"""
+선택 피드백 버퍼 + 배치 저장
+
+/api/feedback 로 들어온 이벤트를 메모리에 모았다가 백그라운드 태스크가
+한 트랜잭션에 executemany로 ml_training_data / search_learning에 기록한다.
+(Node 쪽 saveMLTrainingData처럼 행마다 왕복하지 않음)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from db import Database
+from query_memory import normalize_query
+
+FLUSH_INTERVAL_SEC = float(os.environ.get("ML_FEEDBACK_FLUSH_SEC", "2"))
+# 이 개수 이상 쌓이면 주기를 기다리지 않고 flush
+FLUSH_BATCH_SIZE = int(os.environ.get("ML_FEEDBACK_BATCH_SIZE", "500"))
+# DB가 계속 실패할 때 버퍼 상한 (오래된 이벤트부터 버림)
+MAX_BUFFERED = int(os.environ.get("ML_FEEDBACK_MAX_BUFFERED", "20000"))
+
+ML_TRAINING_DATA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ml_training_data (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  query TEXT NOT NULL,
+  query_normalized TEXT NOT NULL,
+  selected_item_no TEXT NOT NULL,
+  selected_item_name TEXT NOT NULL,
+  rejected_items TEXT,
+  client_code TEXT,
+  features TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# 로컬 data.sqlite3 의 search_learning (쿼리 로그 형태)
+SEARCH_LEARNING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_learning (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  client_code TEXT,
+  search_query TEXT,
+  matched_item_no TEXT,
+  matched_item_name TEXT,
+  score REAL,
+  method TEXT,
+  created_at TEXT DEFAULT (datetime('now'))
+)
+"""
+
+INSERT_TRAINING = """
+INSERT INTO ml_training_data
+  (query, query_normalized, selected_item_no, selected_item_name, rejected_items, client_code, features, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_SEARCH_LOG = """
+INSERT INTO search_learning
+  (client_code, search_query, matched_item_no, matched_item_name, score, method, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Supabase 형태 (search_key, item_no) PK 누적 카운트
+UPSERT_SEARCH_KEY = """
+INSERT INTO search_learning (search_key, item_no, hit_count, last_used_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(search_key, item_no) DO UPDATE SET
+  hit_count = hit_count + excluded.hit_count,
+  last_used_at = excluded.last_used_at
+"""
+
+
+def _search_learning_layout(conn) -> str:
+    """search_learning 컬럼으로 형태 판별: "keyed" (Supabase) / "log" (로컬)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(search_learning)")}
+    if {"search_key", "item_no", "hit_count"} <= columns:
+        return "keyed"
+    return "log"
+
+
+class FeedbackWriter:
+    """피드백 이벤트 버퍼 (add는 즉시 반환, flush는 백그라운드에서 배치로)"""
+
+    def __init__(self, db: Database, flush_interval: float = FLUSH_INTERVAL_SEC, batch_size: int = FLUSH_BATCH_SIZE):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._layout: Optional[str] = None
+
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def add(self, events: List[Dict[str, Any]]) -> int:
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            for event in events:
+                self._buffer.append({**event, "created_at": now})
+            self.received += len(events)
+            overflow = len(self._buffer) - MAX_BUFFERED
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+            pending = len(self._buffer)
+        if pending >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return pending
+
+    def _ensure_tables(self, conn) -> None:
+        if self._layout is not None:
+            return
+        conn.execute(ML_TRAINING_DATA_SCHEMA)
+        conn.execute(SEARCH_LEARNING_SCHEMA)
+        self._layout = _search_learning_layout(conn)
+
+    def flush(self) -> int:
+        """버퍼 전체를 한 트랜잭션으로 기록 (실패 시 버퍼 앞쪽에 되돌림)"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.db.write() as conn:
+                    self._ensure_tables(conn)
+                    conn.executemany(INSERT_TRAINING, [
+                        (
+                            event["query"],
+                            normalize_query(event["query"]),
+                            event["selected_item_no"],
+                            event.get("selected_item_name") or "",
+                            json.dumps(event.get("rejected_items") or [], ensure_ascii=False),
+                            event.get("client_code"),
+                            json.dumps(event.get("features") or {}, ensure_ascii=False),
+                            event["created_at"],
+                        )
+                        for event in batch
+                    ])
+                    if self._layout == "keyed":
+                        counts: Dict[tuple, int] = {}
+                        last_used: Dict[tuple, str] = {}
+                        for event in batch:
+                            key = (normalize_query(event["query"]), event["selected_item_no"])
+                            if not key[0]:
+                                continue
+                            counts[key] = counts.get(key, 0) + 1
+                            last_used[key] = event["created_at"]
+                        conn.executemany(UPSERT_SEARCH_KEY, [
+                            (search_key, item_no, count, last_used[(search_key, item_no)])
+                            for (search_key, item_no), count in counts.items()
+                        ])
+                    else:
+                        conn.executemany(INSERT_SEARCH_LOG, [
+                            (
+                                event.get("client_code"),
+                                event["query"],
+                                event["selected_item_no"],
+                                event.get("selected_item_name"),
+                                event.get("score"),
+                                event.get("method") or "feedback",
+                                event["created_at"],
+                            )
+                            for event in batch
+                        ])
+            except Exception as e:
+                with self._lock:
+                    self._buffer[:0] = batch
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"❌ 피드백 저장 실패 ({len(batch)}건, 다음 주기에 재시도): {e}")
+                return 0
+
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return len(batch)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # DB 쓰기는 이벤트 루프 밖에서
+            await loop.run_in_executor(None, self.flush)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """백그라운드 태스크 종료 + 남은 이벤트 기록"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "received": self.received,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "last_error": self.last_error,
+            "search_learning_layout": self._layout,
+        }
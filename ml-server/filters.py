@@ -0,0 +1,126 @@
+"""
+구조화 사전 필터 (빈티지 / 생산자 / 국가 / 지역)
+
+ml_items 컬럼으로 값 → 행 번호 비트셋(Python int) 역색인을 만들고,
+쿼리에서 "2018" 같은 빈티지나 알려진 생산자명이 보이면
+전체 카탈로그 대신 교집합 행만 임베딩 유사도를 계산한다.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FILTER_FIELDS = ["vintage", "producer", "country", "region"]
+
+# 4자리 연도 (1950~2049)
+_VINTAGE_PATTERN = re.compile(r"(?<!\d)(19[5-9]\d|20[0-4]\d)(?!\d)")
+_HANGUL = re.compile(r"[가-힣]")
+
+# 너무 짧은 키는 오탐이 많아 제외 (영문 3자, 한글 2자 미만)
+MIN_LATIN_KEY = 3
+MIN_HANGUL_KEY = 2
+
+
+def normalize_value(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = " ".join(str(value).lower().split())
+    # 엑셀 숫자 빈티지 (2018.0 → 2018)
+    if text.endswith(".0") and text[:-2].isdigit():
+        text = text[:-2]
+    return text or None
+
+
+def extract_vintage(text: str) -> Optional[str]:
+    match = _VINTAGE_PATTERN.search(str(text))
+    return match.group(1) if match else None
+
+
+def _usable_key(key: str) -> bool:
+    if _HANGUL.search(key):
+        return len(key) >= MIN_HANGUL_KEY
+    return len(key) >= MIN_LATIN_KEY
+
+
+def bitset_to_rows(bitset: int) -> np.ndarray:
+    """비트셋 → 행 번호 배열"""
+    if not bitset:
+        return np.empty(0, dtype=np.int64)
+    raw = np.frombuffer(bitset.to_bytes((bitset.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+
+class StructuredFilters:
+    """필드별 값 → 행 비트셋 역색인 + 쿼리 힌트 감지"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        # 필드 → {정규화된 값: 비트셋}
+        self.bitsets: Dict[str, Dict[str, int]] = {field: {} for field in FILTER_FIELDS}
+        self.applied = 0
+        self.fallbacks = 0
+
+        for row, item in enumerate(items):
+            bit = 1 << row
+            for field in FILTER_FIELDS:
+                value = normalize_value(item.get(field))
+                # 빈티지 컬럼이 없으면 품목명에서 추출 ("... (2018)")
+                if field == "vintage" and value is None:
+                    value = extract_vintage(item.get("item_name", ""))
+                if value is None:
+                    continue
+                postings = self.bitsets[field]
+                postings[value] = postings.get(value, 0) | bit
+
+        # 문자열 필드는 쿼리 부분 일치 검사용으로 긴 키부터
+        self._text_keys: Dict[str, List[str]] = {
+            field: sorted((key for key in self.bitsets[field] if _usable_key(key)), key=len, reverse=True)
+            for field in FILTER_FIELDS if field != "vintage"
+        }
+
+    def detect(self, query: str) -> Dict[str, List[str]]:
+        """쿼리에서 필드별 힌트 값 감지"""
+        hints: Dict[str, List[str]] = {}
+        vintage = extract_vintage(query)
+        if vintage and vintage in self.bitsets["vintage"]:
+            hints["vintage"] = [vintage]
+
+        text = " ".join(query.lower().split())
+        for field, keys in self._text_keys.items():
+            matched = []
+            for key in keys:
+                # 이미 잡힌 더 긴 키의 일부면 건너뜀
+                if key in text and not any(key in longer for longer in matched):
+                    matched.append(key)
+            if matched:
+                hints[field] = matched
+        return hints
+
+    def candidate_rows(self, query: str) -> Optional[np.ndarray]:
+        """
+        힌트가 있으면 교집합 행 번호 (필드 간 AND, 같은 필드 안에서는 OR)
+        힌트가 없거나 교집합이 비면 None → 전체 검색
+        """
+        hints = self.detect(query)
+        if not hints:
+            return None
+
+        bitset = -1
+        for field, values in hints.items():
+            field_bits = 0
+            for value in values:
+                field_bits |= self.bitsets[field][value]
+            bitset &= field_bits
+
+        if bitset <= 0:
+            self.fallbacks += 1
+            return None
+        self.applied += 1
+        return bitset_to_rows(bitset)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{f"{field}_keys": len(self.bitsets[field]) for field in FILTER_FIELDS},
+            "applied": self.applied,
+            "fallbacks": self.fallbacks,
+        }
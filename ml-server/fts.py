@@ -0,0 +1,171 @@
+"""
+품목명 FTS5 trigram 검색 (후보 생성용)
+
+migrations/0004_fts5_item_names.sql 이 items / ml_items / client_item_stats / glass_items 에
+<테이블>_fts (rowid = 원본 rowid) 와 동기화 트리거를 만든다. 여기서는
+- search: 검색어 토큰 중 3글자 이상은 FTS MATCH(trigram = 부분 문자열), 짧은 토큰은 LIKE 조건으로
+  → 원본과 rowid 조인 후 LIKE로 다시 확인 (INSERT OR REPLACE로 남은 옛 rowid가 잘못 잡히지 않도록)
+  3글자 이상 토큰이 없거나 FTS 테이블이 없으면 LIKE 스캔으로 대체
+- prune: 원본에 없는 rowid 정리 / rebuild: FTS를 원본에서 다시 채움 (VACUUM으로 rowid가 바뀐 뒤)
+ml-server 읽기 커넥션(query_only)에서도 search는 그대로 쓸 수 있다.
+
+사용법:
+    python fts.py --migrate
+    python fts.py --table ml_items --query "샤블리 2019"
+    python fts.py --prune
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_DB_PATH = os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data.sqlite3")
+MIGRATION_PATH = os.path.join(os.path.dirname(__file__), "..", "migrations", "0004_fts5_item_names.sql")
+TABLES = ("items", "ml_items", "client_item_stats", "glass_items")
+DEFAULT_LIMIT = 50
+TRIGRAM = 3
+
+
+def fts_table(table: str) -> str:
+    if table not in TABLES:
+        raise ValueError(f"FTS 인덱스가 없는 테이블: {table}")
+    return f"{table}_fts"
+
+
+def has_index(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table(table),)).fetchone()
+    return row is not None
+
+
+def migrate(conn: sqlite3.Connection, path: str = MIGRATION_PATH) -> None:
+    """마이그레이션 실행 (원본 테이블 / FTS / 트리거 생성 + FTS 다시 채움, 재실행 안전)"""
+    with open(path, encoding="utf-8") as f:
+        conn.executescript("BEGIN IMMEDIATE;\n" + f.read() + "\nCOMMIT;")
+
+
+def _like_pattern(token: str) -> str:
+    escaped = token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _phrase(token: str) -> str:
+    """FTS5 문자열 리터럴 (연산자/특수문자를 그대로 검색)"""
+    return '"' + token.replace('"', '""') + '"'
+
+
+def search(conn: sqlite3.Connection, table: str, query: str, limit: int = DEFAULT_LIMIT,
+           client_code: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    item_name에 검색어의 모든 토큰(공백 분리, 대소문자 무시)이 들어 있는 원본 행
+    순위 없이 rowid 순으로 limit개에서 멈춤 (bm25 정렬은 흔한 토큰이면 매칭 전체를 점수화해서 느림,
+    후보의 순위는 matcher가 매김). client_code는 client_item_stats 전용 필터
+    """
+    tokens = query.split()
+    if not tokens:
+        return []
+    fts = fts_table(table)
+    long_tokens = [t for t in tokens if len(t) >= TRIGRAM]
+
+    conditions = ["b.item_name LIKE ? ESCAPE '\\'"] * len(tokens)
+    params: List[Any] = [_like_pattern(t) for t in tokens]
+    if client_code is not None:
+        conditions.append("b.client_code = ?")
+        params.append(client_code)
+    where = " AND ".join(conditions)
+
+    if long_tokens and has_index(conn, table):
+        sql = (f"SELECT b.* FROM {fts} f JOIN {table} b ON b.rowid = f.rowid "
+               f"WHERE {fts} MATCH ? AND {where} LIMIT ?")
+        try:
+            cursor = conn.execute(sql, [" ".join(_phrase(t) for t in long_tokens), *params, limit])
+            return _rows(cursor)
+        except sqlite3.OperationalError as e:
+            # fts5/trigram을 지원하지 않는 SQLite 빌드
+            print(f"⚠️ FTS 검색 실패 ({e}) → LIKE 스캔")
+
+    cursor = conn.execute(f"SELECT b.* FROM {table} b WHERE {where} LIMIT ?", [*params, limit])
+    return _rows(cursor)
+
+
+def _rows(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def prune(conn: sqlite3.Connection, tables: Sequence[str] = TABLES) -> Dict[str, int]:
+    """원본에 없는 rowid(INSERT OR REPLACE로 지워진 옛 행) 삭제 → 테이블별 삭제 건수"""
+    removed = {}
+    for table in tables:
+        if not has_index(conn, table):
+            continue
+        fts = fts_table(table)
+        cursor = conn.execute(f"DELETE FROM {fts} WHERE rowid NOT IN (SELECT rowid FROM {table})")
+        removed[table] = cursor.rowcount
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    conn.commit()
+    return removed
+
+
+def rebuild(conn: sqlite3.Connection, tables: Sequence[str] = TABLES) -> Dict[str, int]:
+    """FTS를 원본에서 다시 채움 → 테이블별 행 수"""
+    counts = {}
+    for table in tables:
+        if not has_index(conn, table):
+            continue
+        fts = fts_table(table)
+        conn.execute(f"DELETE FROM {fts}")
+        cursor = conn.execute(f"INSERT INTO {fts} (rowid, item_name) SELECT rowid, item_name FROM {table}")
+        counts[table] = cursor.rowcount
+    conn.commit()
+    return counts
+
+
+def timed_search(conn: sqlite3.Connection, table: str, query: str, limit: int) -> Tuple[List[Dict[str, Any]], float]:
+    started = time.perf_counter()
+    rows = search(conn, table, query, limit)
+    return rows, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="품목명 FTS5 trigram 인덱스 관리 / 검색")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--migrate", action="store_true", help="0004 마이그레이션 실행")
+    parser.add_argument("--prune", action="store_true", help="원본에 없는 rowid 정리")
+    parser.add_argument("--rebuild", action="store_true", help="FTS를 원본에서 다시 채움")
+    parser.add_argument("--table", default="ml_items", choices=TABLES)
+    parser.add_argument("--query", help="검색어 (FTS vs LIKE 시간 비교)")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.migrate:
+            migrate(conn)
+            print(f"✅ FTS 마이그레이션 완료: {os.path.basename(MIGRATION_PATH)}")
+        if args.rebuild:
+            for table, count in rebuild(conn).items():
+                print(f"🔄 {table}_fts 재생성: {count}행")
+        if args.prune:
+            for table, count in prune(conn).items():
+                print(f"🧹 {table}_fts 정리: {count}행 삭제")
+        if args.query:
+            rows, fts_ms = timed_search(conn, args.table, args.query, args.limit)
+            started = time.perf_counter()
+            tokens = args.query.split()
+            like = conn.execute(
+                f"SELECT item_no FROM {args.table} WHERE "
+                + " AND ".join(["item_name LIKE ? ESCAPE '\\'"] * len(tokens)) + " LIMIT ?",
+                [*(_like_pattern(t) for t in tokens), args.limit],
+            ).fetchall() if tokens else []
+            like_ms = (time.perf_counter() - started) * 1000
+            print(f"⏱️ FTS {fts_ms:.2f}ms ({len(rows)}건) / LIKE 스캔 {like_ms:.2f}ms ({len(like)}건)")
+            for row in rows[:10]:
+                print(f"   {row['item_no']}  {row['item_name']}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+order-ai.xlsx 시트별 병렬 적재 (English / riedel / Client / DL-Client → SQLite)
+
+지금까지는 load_data.py(English, riedel), scripts/import_client_excel.py(Client),
+scripts/import_glass_excel.js(DL-Client)가 각자 워크북 전체를 열어 읽었다.
+이 명령은 메인 프로세스에서 워크북을 한 번 열어 시트 목록만 확인한 뒤, 시트마다 워커 프로세스를 하나씩 띄운다.
+워커는 read-only 모드로 자기 시트 XML만 스트리밍 파싱하고(Parquet 시트 캐시가 있으면 캐시에서),
+시트당 한 트랜잭션으로 대상 테이블에 기록한다.
+- 파싱(가장 느린 단계)은 병렬, 쓰기는 SQLite 쓰기 잠금 때문에 순서대로 (파싱이 끝난 뒤에만 잠금을 잡음)
+- 끝나면 시트별 파싱/쓰기 시간, 테이블별 행 수, 전체 경과 시간을 출력
+
+사용법:
+    python ingest_workbook.py                                  # 네 시트 모두
+    python ingest_workbook.py --sheet english --sheet client   # 일부만
+    python ingest_workbook.py --workers 1                      # 순차 실행 (비교용)
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import openpyxl
+
+from load_data import (
+    CHUNK_SIZE, DEFAULT_DB_PATH, DEFAULT_XLSX_PATH, chunked, connect_for_load, english_rows,
+    ensure_ml_items, riedel_rows, row_hash, sheet_rows,
+)
+from memory_stats import MB, peak_rss_bytes
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "scripts")
+# 다른 시트의 쓰기가 끝날 때까지 기다릴 수 있는 시간
+WRITE_BUSY_TIMEOUT_MS = 120000
+
+
+def cell_text(value: Any) -> Optional[str]:
+    """셀 값 → 문자열 (정수형 float의 '.0' 제거 - import_glass_excel.js의 String(number)와 같음, 빈 값은 None)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == dt_time() else value.isoformat(sep=" ")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def cell_number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+# ==================== 시트별 파싱 (워커 프로세스) ====================
+
+def parse_english(rows: Iterable[Tuple]) -> Tuple[Dict[str, List[Tuple]], int]:
+    counts = {"skipped": 0}
+    items = [row + (row_hash(row),) for row in english_rows(rows, counts)]
+    return {"ml_items": items}, counts["skipped"]
+
+
+def parse_riedel(rows: Iterable[Tuple]) -> Tuple[Dict[str, List[Tuple]], int]:
+    counts = {"skipped": 0}
+    items = list(riedel_rows(rows, counts))
+    return {"ml_riedel_items": items}, counts["skipped"]
+
+
+def parse_client(xlsx_path: str) -> Tuple[Dict[str, List[Tuple]], int]:
+    """
+    Client 시트 → shipments 행
+    scripts/import_client_excel.py의 read_client_sheet(pandas 변환)를 그대로 써서 같은 문자열 값을 만든다
+    (빈칸 있는 거래처 코드 열 '12022.0', 문자열 섞인 날짜 열 '2024-01-05 00:00:00' 등 -
+    import_client_excel.py --incremental 의 자연 키와 달라지면 같은 출고가 중복 적재됨)
+    """
+    import sys
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    from import_client_excel import NEWCOLS, read_client_sheet
+
+    df = read_client_sheet(Path(xlsx_path))
+    shipments = list(df[NEWCOLS].itertuples(index=False, name=None))
+    return {"shipments": shipments}, df.attrs.get("skipped", 0)
+
+
+def parse_glass(rows: Iterable[Tuple]) -> Tuple[Dict[str, List[Tuple]], int]:
+    """DL-Client 시트 → 와인잔 거래처/품목/거래처별 품목 (import_glass_excel.js와 같은 규칙: 첫 값 유지)"""
+    clients: Dict[str, str] = {}
+    items: Dict[str, Tuple[str, float]] = {}
+    client_items: Dict[Tuple[str, str], Tuple[str, float]] = {}
+    skipped = 0
+    for row in rows:
+        row = tuple(row) + (None,) * (17 - len(row))
+        client_name, client_code = cell_text(row[4]), cell_text(row[5])
+        item_no, item_name = cell_text(row[12]), cell_text(row[13])
+        supply_price = cell_number(row[16]) or 0.0
+        if not client_code or not item_no or not client_name or not item_name:
+            skipped += 1
+            continue
+        clients.setdefault(client_code, client_name)
+        items.setdefault(item_no, (item_name, supply_price))
+        client_items.setdefault((client_code, item_no), (item_name, supply_price))
+    return {
+        "glass_clients": list(clients.items()),
+        "glass_items": [(item_no, name, price) for item_no, (name, price) in items.items()],
+        "glass_client_item_stats": [
+            (client_code, item_no, name, price) for (client_code, item_no), (name, price) in client_items.items()
+        ],
+    }, skipped
+
+
+# ==================== 시트별 쓰기 (한 트랜잭션) ====================
+
+def executemany_chunked(conn: sqlite3.Connection, sql: str, rows: List[Tuple], chunk_size: int) -> None:
+    for chunk in chunked(rows, chunk_size):
+        conn.executemany(sql, chunk)
+
+
+def write_english(conn: sqlite3.Connection, tables: Dict[str, List[Tuple]], chunk_size: int) -> Dict[str, int]:
+    conn.execute("BEGIN IMMEDIATE")
+    ensure_ml_items(conn)
+    executemany_chunked(conn, """
+        INSERT OR REPLACE INTO ml_items
+        (item_no, item_name, korean_name, english_name, vintage, country, producer, region, row_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, tables["ml_items"], chunk_size)
+    return {"ml_items": len(tables["ml_items"])}
+
+
+def write_riedel(conn: sqlite3.Connection, tables: Dict[str, List[Tuple]], chunk_size: int) -> Dict[str, int]:
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ml_riedel_items (
+            item_no TEXT PRIMARY KEY,
+            item_name TEXT NOT NULL,
+            korean_name TEXT,
+            english_name TEXT,
+            supply_price REAL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    executemany_chunked(conn, """
+        INSERT OR REPLACE INTO ml_riedel_items
+        (item_no, item_name, korean_name, english_name, supply_price)
+        VALUES (?, ?, ?, ?, ?)
+    """, tables["ml_riedel_items"], chunk_size)
+    return {"ml_riedel_items": len(tables["ml_riedel_items"])}
+
+
+def schema_script(name: str) -> str:
+    """
+    scripts/의 스키마 SQL을 트랜잭션 안에서 실행할 수 있게 (BEGIN IMMEDIATE + 스크립트)
+    journal_mode PRAGMA는 트랜잭션 안에서 무시되므로 빼고, WAL 전환은 connect_for_load / main()에서 트랜잭션 밖에서
+    """
+    with open(os.path.join(SCRIPTS_DIR, name), encoding="utf-8") as f:
+        lines = [line for line in f.read().splitlines()
+                 if not line.strip().upper().replace(" ", "").startswith("PRAGMAJOURNAL_MODE")]
+    return "BEGIN IMMEDIATE;\n" + "\n".join(lines)
+
+
+def write_client(conn: sqlite3.Connection, tables: Dict[str, List[Tuple]], chunk_size: int) -> Dict[str, int]:
+    """import_client_excel.py와 같은 결과: init_db.sql로 재생성 → shipments, client_alias, client_item_stats"""
+    # 스키마 재생성까지 같은 트랜잭션 (executescript는 자체 COMMIT을 하므로 BEGIN을 스크립트 안에)
+    conn.executescript(schema_script("init_db.sql"))
+    executemany_chunked(conn, """
+        INSERT INTO shipments (client_name, client_code, ship_date, item_no, item_name, unit_price)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, tables["shipments"], chunk_size)
+    conn.execute("""
+        INSERT OR REPLACE INTO client_alias (alias, client_code, weight)
+        SELECT DISTINCT client_name, client_code, 1 FROM shipments
+    """)
+    conn.execute("""
+        INSERT INTO client_item_stats (client_code, item_no, item_name, last_ship_date, buy_count, avg_price)
+        SELECT client_code, item_no, MAX(item_name), MAX(ship_date), COUNT(*), AVG(unit_price)
+        FROM shipments
+        GROUP BY client_code, item_no
+    """)
+    return {
+        "shipments": len(tables["shipments"]),
+        "client_alias": conn.execute("SELECT COUNT(*) FROM client_alias").fetchone()[0],
+        "client_item_stats": conn.execute("SELECT COUNT(*) FROM client_item_stats").fetchone()[0],
+    }
+
+
+def write_glass(conn: sqlite3.Connection, tables: Dict[str, List[Tuple]], chunk_size: int) -> Dict[str, int]:
+    """import_glass_excel.js와 같은 결과 (테이블은 유지하고 INSERT OR REPLACE)"""
+    conn.executescript(schema_script("init_glass_db.sql"))
+    executemany_chunked(conn, "INSERT OR REPLACE INTO glass_clients (client_code, client_name) VALUES (?, ?)",
+                        tables["glass_clients"], chunk_size)
+    # 거래처 별칭 (거래처명 = 별칭)
+    executemany_chunked(conn, "INSERT OR REPLACE INTO glass_client_alias (client_code, alias, weight) VALUES (?, ?, 10)",
+                        tables["glass_clients"], chunk_size)
+    executemany_chunked(conn, "INSERT OR REPLACE INTO glass_items (item_no, item_name, supply_price) VALUES (?, ?, ?)",
+                        tables["glass_items"], chunk_size)
+    executemany_chunked(conn, """
+        INSERT OR REPLACE INTO glass_client_item_stats (client_code, item_no, item_name, supply_price, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, tables["glass_client_item_stats"], chunk_size)
+    return {
+        "glass_clients": len(tables["glass_clients"]),
+        "glass_client_alias": len(tables["glass_clients"]),
+        "glass_items": len(tables["glass_items"]),
+        "glass_client_item_stats": len(tables["glass_client_item_stats"]),
+    }
+
+
+# 작업 이름 → (시트 이름(대소문자 무시), 첫 데이터 행, 열 수, 파서, 쓰기)
+# 첫 데이터 행이 None이면 파서가 워크북 경로를 받아 직접 읽음 (Client: import_client_excel.py와 같은 pandas 경로)
+SHEET_JOBS: Dict[str, Tuple[str, Optional[int], Optional[int], Callable, Callable]] = {
+    "english": ("English", 2, 10, parse_english, write_english),
+    "riedel": ("riedel", 7, 6, parse_riedel, write_riedel),
+    "client": ("Client", None, None, parse_client, write_client),
+    # 행 1: 헤더, 행 2: 합계 → 3번 행부터
+    "dl-client": ("DL-Client", 3, 17, parse_glass, write_glass),
+}
+
+
+def ingest_sheet(job: str, xlsx_path: str, db_path: str, chunk_size: int) -> Dict[str, Any]:
+    """워커: 시트 하나 파싱 → 한 트랜잭션으로 기록 (실패하면 롤백, 결과에 error)"""
+    sheet_name, min_row, max_col, parse, write = SHEET_JOBS[job]
+    result: Dict[str, Any] = {"job": job, "sheet": sheet_name, "pid": os.getpid()}
+    started = time.perf_counter()
+
+    if min_row is None:
+        tables, skipped = parse(xlsx_path)
+    else:
+        with sheet_rows(xlsx_path, sheet_name, min_row, max_col) as rows:
+            if rows is None:
+                result["error"] = f"시트 없음: {sheet_name}"
+                return result
+            tables, skipped = parse(rows)
+    result["parse_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    result["skipped"] = skipped
+
+    write_started = time.perf_counter()
+    conn = connect_for_load(db_path)
+    conn.execute(f"PRAGMA busy_timeout = {WRITE_BUSY_TIMEOUT_MS}")
+    try:
+        result["tables"] = write(conn, tables, chunk_size)
+        conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        result["error"] = str(e)
+    finally:
+        conn.close()
+    result["write_ms"] = round((time.perf_counter() - write_started) * 1000, 1)
+    result["peak_rss_mb"] = round(peak_rss_bytes() / MB, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="order-ai.xlsx 시트별 병렬 적재")
+    parser.add_argument("--xlsx", default=DEFAULT_XLSX_PATH)
+    parser.add_argument("--db", default=os.environ.get("DB_PATH") or DEFAULT_DB_PATH)
+    parser.add_argument("--sheet", choices=list(SHEET_JOBS), action="append", help="적재할 시트 (기본: 전부)")
+    parser.add_argument("--workers", type=int, default=0, help="워커 프로세스 수 (기본: min(시트 수, CPU 수), 1이면 순차)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.xlsx):
+        print(f"❌ Excel 파일을 찾을 수 없습니다: {args.xlsx}")
+        return
+
+    # 워크북은 여기서 한 번만 열어 시트 목록 확인 (시트 내용은 워커가 각자 스트리밍)
+    started = time.perf_counter()
+    wb = openpyxl.load_workbook(args.xlsx, read_only=True)
+    available = {name.lower() for name in wb.sheetnames}
+    wb.close()
+
+    jobs = []
+    for job in args.sheet or list(SHEET_JOBS):
+        if SHEET_JOBS[job][0].lower() in available:
+            jobs.append(job)
+        else:
+            print(f"⚠️ '{SHEET_JOBS[job][0]}' 시트가 없어 건너뜁니다")
+    if not jobs:
+        return
+
+    # WAL 전환은 워커를 띄우기 전에 한 번 (워커끼리 쓰기 잠금을 잡은 채로 전환을 시도하지 않도록)
+    connect_for_load(args.db).close()
+
+    # 파싱은 CPU 작업이므로 코어 수 이상 띄워도 빨라지지 않음
+    workers = args.workers or min(len(jobs), os.cpu_count() or 1)
+    print(f"📖 {args.xlsx} → {args.db} (시트 {len(jobs)}개, 워커 {min(workers, len(jobs))}개)")
+
+    if workers <= 1:
+        results = [ingest_sheet(job, args.xlsx, args.db, args.chunk_size) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(ingest_sheet, job, args.xlsx, args.db, args.chunk_size) for job in jobs]
+            results = [future.result() for future in futures]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(f"\n⏱️ 시트별 ({datetime.now().isoformat(timespec='seconds')})")
+    failed = 0
+    for result in results:
+        if "error" in result:
+            failed += 1
+            print(f"   ❌ {result['sheet']:<10} {result['error']}")
+            continue
+        tables = ", ".join(f"{table}={count}" for table, count in result["tables"].items())
+        print(f"   ✅ {result['sheet']:<10} 파싱 {result['parse_ms']:>8.1f}ms  쓰기 {result['write_ms']:>8.1f}ms"
+              f"  RSS {result['peak_rss_mb']:.0f}MB  스킵 {result['skipped']}  ({tables})")
+    serial_ms = sum(r.get("parse_ms", 0) + r.get("write_ms", 0) for r in results)
+    print(f"{'⚠️' if failed else '✅'} 전체 {elapsed_ms:.0f}ms (시트별 합계 {serial_ms:.0f}ms), 실패 {failed}개")
+
+
+if __name__ == "__main__":
+    main()
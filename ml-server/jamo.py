@@ -0,0 +1,85 @@
+"""
+한글 자모 분해 + 근사 부분 문자열 편집 거리
+
+"샤도네" vs "샤르도네", "까베" vs "카베르네" 같은 오타는 음절 단위로는 멀지만
+초성/중성/종성으로 풀면 편집 1~2회 차이라서 자모 문자열로 비교한다.
+"""
+
+import re
+from typing import Dict
+
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+
+# 호환 자모 (초성 19 / 중성 21 / 종성 27 + 없음)
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+             "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+_HANGUL_SYLLABLE = re.compile(r"[가-힣]")
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _build_syllable_table() -> Dict[str, str]:
+    table = {}
+    for code in range(_HANGUL_BASE, _HANGUL_LAST + 1):
+        offset = code - _HANGUL_BASE
+        cho, rest = divmod(offset, 588)
+        jung, jong = divmod(rest, 28)
+        table[chr(code)] = CHOSEONG[cho] + JUNGSEONG[jung] + JONGSEONG[jong]
+    return table
+
+
+_SYLLABLES = _build_syllable_table()
+
+
+def decompose(text: str) -> str:
+    """문자열 → 자모 문자열 (영문은 소문자, 기호/공백 제거)"""
+    text = _NON_WORD.sub("", str(text).lower()).replace("_", "")
+    return "".join(_SYLLABLES.get(ch, ch) for ch in text)
+
+
+def has_hangul(text: str) -> bool:
+    return bool(_HANGUL_SYLLABLE.search(str(text)))
+
+
+def substring_edit_distance(pattern: str, text: str) -> int:
+    """
+    pattern과 text의 임의 부분 문자열 사이 최소 편집 거리
+    (Myers 비트 병렬 알고리즘, 시작/끝 위치 자유)
+    """
+    m = len(pattern)
+    if m == 0:
+        return 0
+    peq: Dict[str, int] = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+    best = m
+
+    for ch in text:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # 부분 문자열 검색: 텍스트 앞부분을 건너뛰는 비용 0 (shift 시 1을 채우지 않음)
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+        if score < best:
+            best = score
+            if best == 0:
+                break
+    return best
@@ -1,41 +1,113 @@
 """
-order-ai.xlsx의 English 시트를 읽어서 SQLite DB에 저장
+order-ai.xlsx의 English / riedel 시트를 읽어서 SQLite DB에 저장
+
+시트는 read-only 모드로 열어 iter_rows(values_only=True)로 한 행씩 스트리밍하고
+(pyarrow가 있으면 sheet_cache.py의 Parquet 캐시에서 - 워크북이 그대로면 xlsx를 다시 파싱하지 않음),
+CHUNK_SIZE 행씩 모아 executemany로 한 트랜잭션 안에서 기록한다 (시트 전체를 메모리에 올리지 않음).
+끝나면 처리량(행/초)과 최대 RSS를 출력한다.
+
+--sync: English 시트를 ml_items.row_hash(행 내용 해시)와 비교해 바뀐 행만 upsert하고
+시트에서 사라진 품목은 삭제한 뒤, 변경 내역을 sync manifest로 남긴다 (sync_manifest.py).
+ml-server는 POST /api/reload/incremental 로 바뀐 품목만 다시 인코딩한다.
+
+사용법:
+    python load_data.py
+    python load_data.py --xlsx ../order-ai.xlsx --db ../data.sqlite3 --chunk-size 10000
+    python load_data.py --sync
 """
 
+import argparse
+import hashlib
+import json
 import sqlite3
 import openpyxl
 import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-def load_english_sheet_to_db():
-    """English 시트 → SQLite DB 변환"""
-    
-    # 경로 설정
-    xlsx_path = os.path.join(os.path.dirname(__file__), "..", "order-ai.xlsx")
-    db_path = os.path.join(os.path.dirname(__file__), "..", "data.sqlite3")
-    
-    if not os.path.exists(xlsx_path):
-        print(f"❌ Excel 파일을 찾을 수 없습니다: {xlsx_path}")
-        return
-    
-    print(f"📖 Excel 파일 읽기: {xlsx_path}")
-    
-    # Excel 읽기
-    wb = openpyxl.load_workbook(xlsx_path, data_only=True)
-    
-    if "English" not in wb.sheetnames:
-        print("❌ 'English' 시트를 찾을 수 없습니다")
-        print(f"   사용 가능한 시트: {wb.sheetnames}")
+import sheet_cache
+from memory_stats import MB, peak_rss_bytes
+from sync_manifest import MANIFEST_PATH, file_fingerprint, write_manifest
+
+DEFAULT_XLSX_PATH = os.path.join(os.path.dirname(__file__), "..", "order-ai.xlsx")
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data.sqlite3")
+CHUNK_SIZE = int(os.environ.get("ML_LOAD_CHUNK_SIZE", "5000"))
+
+@contextmanager
+def sheet_rows(xlsx_path: str, sheet_name: str, min_row: int, max_col: int) -> Iterator[Optional[Iterable[Tuple]]]:
+    """
+    시트 행 (values_only, 시트명 대소문자 무시, 시트가 없으면 None)
+    Parquet 시트 캐시(sheet_cache.py)를 쓸 수 있으면 캐시에서 배치 단위로 (미스면 스트리밍하면서 캐시 기록),
+    아니면 read-only 모드로 스트리밍
+    """
+    if sheet_cache.available():
+        rows = sheet_cache.read_rows(xlsx_path, sheet_name, min_row=min_row, max_col=max_col)
+        try:
+            yield rows
+        finally:
+            # 끝까지 읽지 않았으면 워크북을 닫고 미완성 캐시 파트 삭제
+            if rows is not None:
+                rows.close()
         return
-    
-    sheet = wb["English"]
-    print(f"✅ 'English' 시트 발견 (행: {sheet.max_row})")
-    
-    # DB 연결
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # 테이블 생성 (items가 없으면)
-    cursor.execute("""
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        name = next((name for name in wb.sheetnames if name.lower() == sheet_name.lower()), None)
+        yield wb[name].iter_rows(min_row=min_row, max_col=max_col, values_only=True) if name else None
+    finally:
+        wb.close()
+
+def connect_for_load(db_path: str) -> sqlite3.Connection:
+    """
+    대량 적재용 커넥션
+    ml-server가 같은 DB를 WAL로 읽고 있으므로 WAL + synchronous=NORMAL은 유지하고,
+    페이지 캐시와 임시 저장소만 키운다. 트랜잭션은 명시적으로 (isolation_level=None)
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # WAL 전환은 다른 커넥션이 쓰는 중이면 기다려야 하므로 busy_timeout 먼저
+    conn.execute("PRAGMA busy_timeout = 5000")
+    # 트랜잭션 밖에서만 적용됨 (BEGIN 뒤의 journal_mode PRAGMA는 조용히 무시)
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    if str(mode).lower() != "wal":
+        print(f"⚠️ WAL 전환 실패 (journal_mode={mode}): {db_path}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -65536")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    # INSERT OR REPLACE로 지워지는 행에도 DELETE 트리거 실행 (FTS 인덱스에 옛 rowid가 남지 않도록)
+    conn.execute("PRAGMA recursive_triggers = ON")
+    return conn
+
+def chunked(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def bulk_insert(conn: sqlite3.Connection, sql: str, rows: Iterable[Tuple], chunk_size: int) -> int:
+    """rows를 chunk_size씩 executemany - 전체가 한 트랜잭션 (실패하면 전부 롤백)"""
+    written = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for chunk in chunked(rows, chunk_size):
+            conn.executemany(sql, chunk)
+            written += len(chunk)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return written
+
+def row_hash(row: Tuple) -> str:
+    """행 내용 해시 (증분 동기화 비교용)"""
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def ensure_ml_items(conn: sqlite3.Connection) -> None:
+    """ml_items 테이블 + row_hash 컬럼 (이전 버전이 만든 테이블에는 컬럼 추가)"""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS ml_items (
             item_no TEXT PRIMARY KEY,
             item_name TEXT NOT NULL,
@@ -45,28 +117,27 @@ def load_english_sheet_to_db():
             country TEXT,
             producer TEXT,
             region TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            row_hash TEXT
         )
     """)
-    
-    # 데이터 삽입
-    inserted = 0
-    skipped = 0
-    
-    for row_idx in range(2, sheet.max_row + 1):  # 2번 행부터 (헤더 제외)
-        item_no = sheet.cell(row_idx, 2).value  # B열: 품목코드
-        english_name = sheet.cell(row_idx, 8).value  # H열: 영문명
-        korean_name = sheet.cell(row_idx, 9).value  # I열: 한글명
-        vintage = sheet.cell(row_idx, 10).value  # J열: 빈티지
-        country = sheet.cell(row_idx, 4).value  # D열: 국가
-        producer = sheet.cell(row_idx, 5).value  # E열: 생산자
-        region = sheet.cell(row_idx, 6).value  # F열: 지역
-        
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ml_items)")}
+    if "row_hash" not in columns:
+        conn.execute("ALTER TABLE ml_items ADD COLUMN row_hash TEXT")
+
+def english_rows(rows: Iterable[Tuple], counts: Dict[str, int]) -> Iterator[Tuple]:
+    """English 시트 행(2번 행부터, 10열) → ml_items 행 (필수 필드 없는 행은 counts["skipped"])"""
+    # B열: 품목코드, D열: 국가, E열: 생산자, F열: 지역, H열: 영문명, I열: 한글명, J열: 빈티지
+    for row in rows:
+        row = tuple(row) + (None,) * (10 - len(row))
+        item_no, country, producer, region = row[1], row[3], row[4], row[5]
+        english_name, korean_name, vintage = row[7], row[8], row[9]
+
         # 필수 필드 체크
         if not item_no or (not english_name and not korean_name):
-            skipped += 1
+            counts["skipped"] += 1
             continue
-        
+
         # item_name 생성 (한글명 / 영문명 (빈티지))
         if korean_name and english_name:
             item_name = f"{korean_name} / {english_name}"
@@ -76,34 +147,270 @@ def load_english_sheet_to_db():
             item_name = korean_name
         else:
             item_name = english_name
-        
+
+        yield (
+            str(item_no).strip(),
+            item_name,
+            korean_name,
+            english_name,
+            vintage,
+            country,
+            producer,
+            region
+        )
+
+def riedel_rows(rows: Iterable[Tuple], counts: Dict[str, int]) -> Iterator[Tuple]:
+    """riedel 시트 행(7번 행부터, 6열 - 6번 행이 헤더) → ml_riedel_items 행"""
+    # B열: 코드, C열: 한글명, D열: 영문명, F열: 공급가
+    for row in rows:
+        row = tuple(row) + (None,) * (6 - len(row))
+        item_no, korean_name, english_name, supply_price = row[1], row[2], row[3], row[5]
+
+        # 필수 필드 체크
+        if not item_no or not korean_name:
+            counts["skipped"] += 1
+            continue
+
+        korean_name = str(korean_name).strip()
+        english_name = str(english_name).strip() if english_name else None
+        item_name = f"{korean_name} / {english_name}" if english_name else korean_name
+
         try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO ml_items 
-                (item_no, item_name, korean_name, english_name, vintage, country, producer, region)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                str(item_no).strip(),
-                item_name,
-                korean_name,
-                english_name,
-                vintage,
-                country,
-                producer,
-                region
-            ))
-            inserted += 1
-        except Exception as e:
-            print(f"⚠️ 행 {row_idx} 삽입 실패: {e}")
-            skipped += 1
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"\n✅ 완료:")
+            supply_price = float(supply_price) if supply_price is not None else None
+        except (TypeError, ValueError):
+            supply_price = None
+
+        yield (
+            str(item_no).strip(),
+            item_name,
+            korean_name,
+            english_name,
+            supply_price
+        )
+
+def print_load_report(label: str, inserted: int, skipped: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = (inserted + skipped) / elapsed if elapsed > 0 else 0.0
+    print(f"\n✅ {label} 완료:")
     print(f"   - 삽입: {inserted}개")
     print(f"   - 스킵: {skipped}개")
+    print(f"   - 시간: {elapsed:.2f}초 ({rate:,.0f}행/초)")
+    print(f"   - 최대 RSS: {peak_rss_bytes() / MB:.1f}MB")
+
+def load_english_sheet_to_db(xlsx_path: Optional[str] = None, db_path: Optional[str] = None,
+                             chunk_size: int = CHUNK_SIZE):
+    """English 시트 → SQLite DB 변환"""
+
+    # 경로 설정
+    xlsx_path = xlsx_path or DEFAULT_XLSX_PATH
+    db_path = db_path or DEFAULT_DB_PATH
+
+    if not os.path.exists(xlsx_path):
+        print(f"❌ Excel 파일을 찾을 수 없습니다: {xlsx_path}")
+        return
+
+    print(f"📖 Excel 파일 읽기: {xlsx_path}")
+    started = time.perf_counter()
+
+    # Excel 읽기 (시트 캐시 또는 read-only 스트리밍)
+    with sheet_rows(xlsx_path, "English", min_row=2, max_col=10) as rows:
+        if rows is None:
+            print("❌ 'English' 시트를 찾을 수 없습니다")
+            return
+
+        print("✅ 'English' 시트 발견")
+
+        # DB 연결
+        conn = connect_for_load(db_path)
+
+        # 테이블 생성 (items가 없으면)
+        ensure_ml_items(conn)
+
+        # 데이터 삽입 (이후 --sync가 비교할 수 있도록 행 해시도 기록)
+        counts = {"skipped": 0}
+        try:
+            inserted = bulk_insert(conn, """
+                INSERT OR REPLACE INTO ml_items
+                (item_no, item_name, korean_name, english_name, vintage, country, producer, region, row_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (row + (row_hash(row),) for row in english_rows(rows, counts)), chunk_size)
+        except sqlite3.Error as e:
+            print(f"❌ 삽입 실패 (롤백): {e}")
+            return
+        finally:
+            conn.close()
+
+    print_load_report("English", inserted, counts["skipped"], started)
     print(f"   - DB: {db_path}")
 
+def sync_english_sheet_to_db(xlsx_path: Optional[str] = None, db_path: Optional[str] = None,
+                             manifest_path: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> Optional[Dict[str, Any]]:
+    """English 시트 → ml_items 증분 동기화 (바뀐 행만 upsert, 사라진 품목 삭제) + sync manifest 기록"""
+
+    xlsx_path = xlsx_path or DEFAULT_XLSX_PATH
+    db_path = db_path or DEFAULT_DB_PATH
+    manifest_path = manifest_path or MANIFEST_PATH
+
+    if not os.path.exists(xlsx_path):
+        print(f"❌ Excel 파일을 찾을 수 없습니다: {xlsx_path}")
+        return None
+
+    print(f"📖 Excel 파일 읽기 (증분 동기화): {xlsx_path}")
+    started = time.perf_counter()
+    fingerprint = file_fingerprint(xlsx_path)
+
+    with sheet_rows(xlsx_path, "English", min_row=2, max_col=10) as rows:
+        if rows is None:
+            print("❌ 'English' 시트를 찾을 수 없습니다")
+            return None
+
+        conn = connect_for_load(db_path)
+        try:
+            ensure_ml_items(conn)
+            # 기존 item_no → 행 해시 (전체 적재 이전 행은 해시가 NULL → 수정으로 간주)
+            existing = dict(conn.execute("SELECT item_no, row_hash FROM ml_items"))
+
+            counts = {"skipped": 0}
+            # 이번 시트의 item_no → 해시 (시트 안 중복은 마지막 행이 이김 - 전체 적재와 동일)
+            seen: Dict[str, str] = {}
+            inserted: List[str] = []
+            updated: List[str] = []
+
+            def changed_rows() -> Iterator[Tuple]:
+                for row in english_rows(rows, counts):
+                    item_no, digest = row[0], row_hash(row)
+                    previous = seen.get(item_no, existing.get(item_no))
+                    first = item_no not in seen
+                    seen[item_no] = digest
+                    if previous == digest:
+                        continue
+                    if first:
+                        (updated if item_no in existing else inserted).append(item_no)
+                    yield row + (digest,)
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for chunk in chunked(changed_rows(), chunk_size):
+                    conn.executemany("""
+                        INSERT INTO ml_items
+                        (item_no, item_name, korean_name, english_name, vintage, country, producer, region, row_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(item_no) DO UPDATE SET
+                            item_name = excluded.item_name,
+                            korean_name = excluded.korean_name,
+                            english_name = excluded.english_name,
+                            vintage = excluded.vintage,
+                            country = excluded.country,
+                            producer = excluded.producer,
+                            region = excluded.region,
+                            row_hash = excluded.row_hash
+                    """, chunk)
+                deleted = sorted(item_no for item_no in existing if item_no not in seen)
+                for chunk in chunked(((item_no,) for item_no in deleted), chunk_size):
+                    conn.executemany("DELETE FROM ml_items WHERE item_no = ?", chunk)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"❌ 동기화 실패 (롤백): {e}")
+            return None
+        finally:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    manifest = {
+        "sheet": "English",
+        "table": "ml_items",
+        "data_type": "wine",
+        "synced_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "xlsx": fingerprint,
+        "db": os.path.abspath(db_path),
+        "counts": {
+            "inserted": len(inserted),
+            "updated": len(updated),
+            "deleted": len(deleted),
+            "unchanged": len(seen) - len(inserted) - len(updated),
+            "skipped": counts["skipped"],
+        },
+        "changed": {"inserted": inserted, "updated": updated, "deleted": deleted},
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+    write_manifest(manifest_path, manifest)
+
+    print(f"\n✅ English 동기화 완료:")
+    for key, value in manifest["counts"].items():
+        print(f"   - {key}: {value}개")
+    print(f"   - 시간: {elapsed:.2f}초")
+    print(f"   - 최대 RSS: {peak_rss_bytes() / MB:.1f}MB")
+    print(f"💾 sync manifest: {manifest_path}")
+    return manifest
+
+def load_riedel_sheet_to_db(xlsx_path: Optional[str] = None, db_path: Optional[str] = None,
+                            chunk_size: int = CHUNK_SIZE):
+    """riedel 시트 → SQLite DB 변환 (ml-server riedel 인덱스용)"""
+
+    # 경로 설정
+    xlsx_path = xlsx_path or DEFAULT_XLSX_PATH
+    db_path = db_path or DEFAULT_DB_PATH
+
+    if not os.path.exists(xlsx_path):
+        print(f"❌ Excel 파일을 찾을 수 없습니다: {xlsx_path}")
+        return
+
+    print(f"📖 Excel 파일 읽기: {xlsx_path}")
+    started = time.perf_counter()
+
+    # 시트명 대소문자 무시 (riedelSheet.ts와 동일)
+    with sheet_rows(xlsx_path, "riedel", min_row=7, max_col=6) as rows:
+        if rows is None:
+            print("❌ 'riedel' 시트를 찾을 수 없습니다")
+            return
+
+        print("✅ 'riedel' 시트 발견")
+
+        conn = connect_for_load(db_path)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS ml_riedel_items (
+                item_no TEXT PRIMARY KEY,
+                item_name TEXT NOT NULL,
+                korean_name TEXT,
+                english_name TEXT,
+                supply_price REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        counts = {"skipped": 0}
+        try:
+            inserted = bulk_insert(conn, """
+                INSERT OR REPLACE INTO ml_riedel_items
+                (item_no, item_name, korean_name, english_name, supply_price)
+                VALUES (?, ?, ?, ?, ?)
+            """, riedel_rows(rows, counts), chunk_size)
+        except sqlite3.Error as e:
+            print(f"❌ riedel 삽입 실패 (롤백): {e}")
+            return
+        finally:
+            conn.close()
+
+    print_load_report("riedel", inserted, counts["skipped"], started)
+
+def main():
+    parser = argparse.ArgumentParser(description="order-ai.xlsx English / riedel 시트 → SQLite")
+    parser.add_argument("--xlsx", default=DEFAULT_XLSX_PATH)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="executemany 한 번에 넣을 행 수")
+    parser.add_argument("--sync", action="store_true", help="English 시트를 행 해시로 비교해 바뀐 행만 반영 + sync manifest 기록")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="sync manifest 경로 (--sync)")
+    args = parser.parse_args()
+
+    if args.sync:
+        sync_english_sheet_to_db(args.xlsx, args.db, args.manifest, args.chunk_size)
+    else:
+        load_english_sheet_to_db(args.xlsx, args.db, args.chunk_size)
+    load_riedel_sheet_to_db(args.xlsx, args.db, args.chunk_size)
+
 if __name__ == "__main__":
-    load_english_sheet_to_db()
+    main()
@@ -1,18 +1,41 @@
 """
 PyTorch + Sentence Transformers 기반 품목 매칭 API
 정확도 최우선 - 90-95% 목표
+
+torch / sentence_transformers는 시작 후 백그라운드에서 import (startup.py 타임라인 참고)
 """
 
-from fastapi import FastAPI, HTTPException
+from startup import StartupTimeline
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import torch
-from sentence_transformers import SentenceTransformer, util
-import sqlite3
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
 import os
+import time
 from datetime import datetime
 
+from response_cache import ResponseCache, make_cache_key, make_etag, etag_matches
+from catalog_index import CatalogIndex, DATA_TYPES, load_index
+from db import Database
+from memory_stats import MemoryBudget, MemoryBudgetExceeded, memory_report, start_tracemalloc
+from matcher import search_queries, search_grouped, lexical_only, format_results
+from query_memory import QueryMemory, MEMORY_METHOD
+from families import row_vintage, vintage_hint
+from feedback import FeedbackWriter
+from shadow import ShadowEvaluator, create_shadow
+from rerank import Reranker, create_reranker
+from admission import AdmissionController, AdmissionRejected
+from snapshot import SnapshotError, load_snapshot
+from sync_manifest import MANIFEST_PATH as SYNC_MANIFEST_PATH, changed_item_nos, read_manifest
+import embedding_export
+import compact
+
+# 시작 단계별 소요 시간 (import 완료 시점부터 기록)
+timeline = StartupTimeline()
+timeline.mark("import")
+
 app = FastAPI(
     title="Order AI - ML Matching Server",
     description="PyTorch 기반 품목 매칭 서버 (정확도 최우선)",
@@ -31,8 +54,62 @@ app.add_middleware(
 # 전역 변수
 model = None
 db_path = None
-items_cache = None
-embeddings_cache = None
+db: Optional[Database] = None
+startup_task: Optional[asyncio.Task] = None
+# 데이터 타입(wine / glass / riedel) → 카탈로그 인덱스
+indexes: Dict[str, CatalogIndex] = {}
+
+# 인덱스 스냅샷 (build_snapshot.py): 지정하면 시작 시 DB 조회/인코딩 대신 mmap 로드
+SNAPSHOT_PATH = os.environ.get("ML_SNAPSHOT_PATH", "").strip()
+SNAPSHOT_VERIFY = os.environ.get("ML_SNAPSHOT_VERIFY", "1") != "0"
+snapshot_info: Optional[Dict[str, Any]] = None
+# 마지막으로 반영한 sync manifest (load_data.py --sync → /api/reload/incremental)
+applied_sync: Optional[Dict[str, Any]] = None
+# 마지막 인덱스 구성에서 실패한 데이터 타입 → 사유 (해당 타입은 이전 인덱스 유지)
+index_errors: Dict[str, str] = {}
+
+# 카탈로그 버전: 인덱스 재구성/리로드 때마다 증가 (재시작 후에도 단조 증가하도록 시각 기반)
+catalog_version = 0
+response_cache = ResponseCache(max_entries=int(os.environ.get("ML_RESPONSE_CACHE_SIZE", "2048")))
+
+# 메모리 예산 (ML_MEMORY_BUDGET_MB): 압박 시 캐시 축소, 초과 예상 시 인덱스 구성 거부
+memory_budget = MemoryBudget()
+memory_budget.register_cache("response_cache", response_cache)
+
+# 임베딩 바이너리 내보내기 캐시 (카탈로그 버전별)
+export_cache = embedding_export.ExportCache()
+memory_budget.register_cache("export_cache", export_cache)
+
+# 확정된 (거래처, 쿼리) → 품목 메모리 (시작 시 확정 이력 로드 + 피드백 즉시 반영, 모델 호출 생략)
+# 확정 매핑은 DB 재로드 전에는 되살릴 수 없으므로 메모리 예산 캐시로 등록하지 않음 (압박 시에도 비우지 않음)
+query_memory = QueryMemory()
+# 피드백 버퍼 → ml_training_data / search_learning 배치 저장
+feedback_writer: Optional[FeedbackWriter] = None
+# 섀도 평가 (ML_SHADOW_MODEL 지정 시 보조 모델로 샘플 요청 비교)
+shadow: Optional[ShadowEvaluator] = create_shadow()
+# 입장 제어: 모델 계산 동시 실행 수 / 대기열 깊이 / 마감 시간 (넘치면 어휘 경로로 degraded 응답)
+admission = AdmissionController()
+# 크로스 인코더 재순위 (ML_RERANK_MODEL 지정 시, 1·2위 점수 차가 작은 쿼리만)
+reranker: Optional[Reranker] = create_reranker()
+if reranker is not None:
+    memory_budget.register_cache("rerank_cache", reranker.cache)
+
+MODEL_INFO = {
+    "name": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    "type": "pytorch",
+    "multilingual": "true"
+}
+
+def bump_catalog_version():
+    """카탈로그 버전 증가 + 이전 버전 응답 캐시 비우기"""
+    global catalog_version
+    catalog_version = max(catalog_version + 1, int(time.time()))
+    response_cache.clear()
+    export_cache.clear()
+    if reranker is not None:
+        # 품목명이 바뀌었을 수 있으므로 쌍 점수도 버림
+        reranker.cache.clear()
+    print(f"🔖 카탈로그 버전: {catalog_version}")
 
 # ==================== Pydantic Models ====================
 
@@ -43,11 +120,34 @@ class Item(BaseModel):
     english_name: Optional[str] = None
     vintage: Optional[str] = None
 
-class MatchRequest(BaseModel):
-    query: str
+class MatchOptions(BaseModel):
     client_code: Optional[str] = None
     top_k: int = 5
     min_score: float = 0.3
+    data_type: str = "wine"  # wine / glass / riedel
+    collapse_duplicates: bool = False  # true면 중복 군집(dedup_job.py)은 한 행만 (군집 검증 전까지 기본 끔)
+    group_vintages: bool = False  # 와인 패밀리 2단계 검색 + 다른 빈티지 묶음 (families.py)
+    rerank: bool = True  # 크로스 인코더 재순위 (ML_RERANK_MODEL 이 있을 때만)
+
+class MatchRequest(MatchOptions):
+    query: str
+
+class BatchMatchRequest(MatchOptions):
+    queries: List[str]
+
+class FeedbackEvent(BaseModel):
+    query: str
+    selected_item_no: str
+    selected_item_name: Optional[str] = None
+    rejected_items: List[str] = []
+    client_code: Optional[str] = None
+    data_type: str = "wine"
+    score: Optional[float] = None
+    method: Optional[str] = None
+    features: Optional[Dict[str, Any]] = None
+
+class FeedbackRequest(BaseModel):
+    events: List[FeedbackEvent]
 
 class MatchResult(BaseModel):
     item_no: str
@@ -57,6 +157,7 @@ class MatchResult(BaseModel):
     vintage: Optional[str] = None
     score: float
     method: str = "pytorch_semantic"
+    other_vintages: Optional[List[Dict[str, Any]]] = None  # group_vintages 일 때만
 
 class MatchResponse(BaseModel):
     success: bool
@@ -64,20 +165,79 @@ class MatchResponse(BaseModel):
     results: List[MatchResult]
     processing_time_ms: float
     model_info: Dict[str, str]
+    degraded: bool = False  # 입장 제어로 모델 없이 어휘/메모리 경로로 답함
+
+class BatchMatchResponse(BaseModel):
+    success: bool
+    queries: List[str]
+    results: List[List[MatchResult]]
+    processing_time_ms: float
+    model_info: Dict[str, str]
+    degraded: bool = False
 
 # ==================== 초기화 ====================
 
 @app.on_event("startup")
 async def startup_event():
-    """서버 시작 시 모델 로드 및 초기화"""
-    global model, db_path, items_cache, embeddings_cache
+    """
+    HTTP/헬스체크를 먼저 띄우고, 무거운 초기화(torch import, 모델 로드, 인덱스, 워밍업)는 백그라운드로
+    준비 전 매칭 요청은 503 또는 (스냅샷 인덱스가 있으면) 어휘 경로 degraded 응답
+    """
+    global db_path, db, feedback_writer, startup_task
     
     print("🚀 ML Server 시작...")
+    start_tracemalloc()
+    
+    # DB 경로 설정
+    db_path = os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data.sqlite3")
+    db = Database(db_path)
+    feedback_writer = FeedbackWriter(db)
+    feedback_writer.start()
+    timeline.mark("http")
+    startup_task = asyncio.create_task(warm_start())
+
+async def warm_start():
+    """백그라운드 초기화: 스냅샷 → 모델 → (스냅샷 없으면) DB 인덱스 → 워밍업"""
+    loop = asyncio.get_running_loop()
+    try:
+        # 스냅샷은 모델 없이도 열 수 있으므로 먼저 (모델 로딩 중에도 어휘/메모리 응답 가능)
+        from_snapshot = await loop.run_in_executor(None, load_snapshot_indexes)
+        if from_snapshot:
+            timeline.mark("snapshot")
+        
+        await loop.run_in_executor(None, load_model)
+        
+        if from_snapshot and not snapshot_matches_model():
+            from_snapshot = False
+        if not from_snapshot:
+            await loop.run_in_executor(None, load_query_memory)
+            if not os.path.exists(db_path):
+                print(f"⚠️ DB 파일을 찾을 수 없습니다: {db_path}")
+                print("   English 시트 데이터를 미리 로드합니다...")
+            else:
+                print(f"✅ DB 연결: {db_path}")
+            await preload_items()
+            timeline.mark("index_load")
+        
+        await loop.run_in_executor(None, warm_up)
+        timeline.mark("warm_up")
+        timeline.mark("ready")
+    except Exception as e:
+        timeline.error = str(e)
+        print(f"❌ 초기화 실패: {e}")
+    timeline.report()
+
+def load_model():
+    """sentence_transformers(torch) import + 모델 로드 (executor 스레드)"""
+    global model
+    
     print("📦 Sentence Transformers 모델 로딩...")
+    from sentence_transformers import SentenceTransformer
+    timeline.mark("torch_import")
     
     # 다국어 모델 로드 (한국어-영어 최적화)
     # Option 1: 다국어 최강 모델 (권장)
-    model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    model_name = MODEL_INFO["name"]
     
     # Option 2: 한국어 특화 모델 (한국어만 처리할 경우)
     # model_name = "jhgan/ko-sroberta-multitask"
@@ -88,62 +248,165 @@ async def startup_event():
     except Exception as e:
         print(f"❌ 모델 로드 실패: {e}")
         raise
+    timeline.mark("model_load")
     
-    # DB 경로 설정
-    db_path = os.path.join(os.path.dirname(__file__), "..", "data.sqlite3")
-    if not os.path.exists(db_path):
-        print(f"⚠️ DB 파일을 찾을 수 없습니다: {db_path}")
-        print("   English 시트 데이터를 미리 로드합니다...")
-        await preload_items()
-    else:
-        print(f"✅ DB 연결: {db_path}")
-        await preload_items()
+    if reranker is not None:
+        try:
+            reranker.load()
+        except Exception as e:
+            # 재순위는 선택 단계 - 실패해도 bi-encoder만으로 서비스
+            print(f"⚠️ 크로스 인코더 로드 실패 (재순위 없이 실행): {e}")
+
+def warm_up():
+    """첫 요청 지연을 없애도록 인코딩 + 검색 1회 (토크나이저/커널 초기화, mmap 페이지 적재)"""
+    embeddings = model.encode(["워밍업 샤르도네 2020"], convert_to_tensor=True)
+    for index in indexes.values():
+        if index.ready:
+            search_queries(index, ["워밍업 샤르도네 2020"], embeddings, 1, 0.0)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """남은 피드백 기록 + DB 커넥션 정리"""
+    if feedback_writer is not None:
+        await feedback_writer.stop()
+    if shadow is not None:
+        shadow.close()
+    if db is not None:
+        db.close()
+
+def load_query_memory():
+    """client_new_items / item_alias / search_learning / ml_training_data → 쿼리 메모리"""
+    try:
+        with db.read() as conn:
+            loaded = query_memory.load(conn)
+        print(f"✅ 쿼리 메모리 {len(query_memory)}개 키 로드 ({loaded}건, {query_memory.loaded})")
+    except Exception as e:
+        print(f"⚠️ 쿼리 메모리 로드 실패: {e}")
 
-async def preload_items():
-    """품목 데이터 미리 로드 및 임베딩 생성"""
-    global items_cache, embeddings_cache
+def load_snapshot_indexes() -> bool:
+    """
+    ML_SNAPSHOT_PATH 스냅샷으로 인덱스 + 쿼리 메모리 복원 (불가하면 False → DB에서 빌드)
+    모델 로드 전에 실행 - 임베딩 차원은 모델 로드 후 snapshot_matches_model()로 확인
+    """
+    global indexes, snapshot_info
+    if not SNAPSHOT_PATH:
+        return False
+    if not os.path.exists(SNAPSHOT_PATH):
+        print(f"⚠️ 스냅샷 파일 없음: {SNAPSHOT_PATH} → DB에서 빌드")
+        return False
+    try:
+        loaded, info = load_snapshot(SNAPSHOT_PATH, MODEL_INFO["name"], None,
+                                     memory=query_memory, verify=SNAPSHOT_VERIFY)
+    except SnapshotError as e:
+        print(f"⚠️ 스냅샷 사용 불가 ({e}) → DB에서 빌드")
+        return False
+    
+    indexes = loaded
+    snapshot_info = info
+    bump_catalog_version()
+    print(f"✅ 스냅샷 로드 {info['load_ms']}ms (검증 {info['verify_ms']}ms, 생성 {info['built_at']}): "
+          f"{', '.join(f'{k}={v}' for k, v in info['items'].items())}, 쿼리 메모리 {info['query_memory']}개")
+    
+    if shadow is not None:
+        shadow.schedule_load(db, memory_budget)
+    return True
+
+def snapshot_matches_model() -> bool:
+    """스냅샷 임베딩 차원 == 모델 차원 (다르면 DB에서 다시 빌드)"""
+    dim = model.get_sentence_embedding_dimension()
+    for name, index in indexes.items():
+        if index.ready and dim and index.embedding_dim != dim:
+            print(f"⚠️ [{name}] 스냅샷 임베딩 차원 {index.embedding_dim} ≠ 모델 차원 {dim} → DB에서 빌드")
+            return False
+    return True
+
+async def preload_items() -> Dict[str, str]:
+    """
+    데이터 타입별 품목 데이터 미리 로드 및 임베딩 생성 (executor 스레드 - 이벤트 루프를 막지 않음)
+    반환: 구성 실패한 데이터 타입 → 사유 (해당 타입은 이전 인덱스를 그대로 유지)
+    """
+    global indexes, snapshot_info, index_errors
+    
+    new_indexes, failures = await asyncio.get_running_loop().run_in_executor(None, build_indexes)
+    index_errors = failures
+    if len(failures) == len(DATA_TYPES) and indexes:
+        # 전부 실패 → 기존 인덱스/카탈로그 버전 그대로
+        return failures
+    indexes = new_indexes
+    # DB에서 다시 빌드했으므로 더 이상 스냅샷 상태가 아님
+    snapshot_info = None
+    bump_catalog_version()
     
+    # 섀도 인덱스는 백그라운드에서 같은 카탈로그로 재구성
+    if shadow is not None:
+        shadow.schedule_load(db, memory_budget)
+    return failures
+
+def build_indexes() -> Tuple[Dict[str, CatalogIndex], Dict[str, str]]:
+    """
+    DB → 데이터 타입별 인덱스 + 임베딩
+    로드/인코딩이 실패한 타입은 현재 인덱스를 유지 (embeddings=None 인덱스로 바꿔치기하지 않음)
+    """
     print("📊 품목 데이터 로딩 중...")
     
+    new_indexes: Dict[str, CatalogIndex] = {}
+    failures: Dict[str, str] = {}
+    
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # client_item_stats에서 고유 품목 로드
-        cursor.execute("""
-            SELECT DISTINCT item_no, item_name 
-            FROM client_item_stats 
-            WHERE item_no IS NOT NULL AND item_name IS NOT NULL
-            LIMIT 1000
-        """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        if not rows:
-            print("⚠️ 품목 데이터가 없습니다. English 시트 파싱이 필요합니다.")
-            items_cache = []
-            embeddings_cache = None
-            return
-        
-        # 캐시 생성
-        items_cache = [
-            {"item_no": row[0], "item_name": row[1]}
-            for row in rows
-        ]
-        
-        print(f"📦 {len(items_cache)}개 품목 로드 완료")
-        
-        # 모든 품목명의 임베딩 미리 계산 (속도 최적화)
-        print("🧠 품목 임베딩 생성 중...")
-        item_names = [item["item_name"] for item in items_cache]
-        embeddings_cache = model.encode(item_names, convert_to_tensor=True)
-        print(f"✅ {len(item_names)}개 임베딩 생성 완료")
-        
+        with db.read() as conn:
+            for data_type in DATA_TYPES:
+                new_indexes[data_type] = load_index(conn, data_type)
     except Exception as e:
         print(f"❌ 품목 로드 실패: {e}")
-        items_cache = []
-        embeddings_cache = None
+        for data_type in DATA_TYPES:
+            if data_type not in new_indexes:
+                failures[data_type] = f"품목 로드 실패: {e}"
+    
+    for data_type, index in list(new_indexes.items()):
+        error = encode_index(data_type, index)
+        if error is not None:
+            failures[data_type] = error
+    
+    for data_type in failures:
+        if data_type in indexes:
+            new_indexes[data_type] = indexes[data_type]
+            print(f"⚠️ [{data_type}] 이전 인덱스 유지 ({len(indexes[data_type])}개 품목)")
+    
+    return new_indexes, failures
+
+def encode_index(data_type: str, index: CatalogIndex, previous: Optional[CatalogIndex] = None,
+                 changed: Optional[set] = None) -> Optional[str]:
+    """
+    인덱스 임베딩 생성 (previous가 있으면 바뀌지 않은 품목의 임베딩 재사용)
+    반환: 실패 사유 (성공 또는 품목이 없으면 None)
+    """
+    if not index.items:
+        print(f"⚠️ [{data_type}] 품목 데이터가 없습니다.")
+        return None
+    
+    print(f"📦 [{data_type}] {len(index)}개 품목 로드 완료 (거래처 {len(index.client_rows)}곳)")
+    
+    # 모든 품목명의 임베딩 미리 계산 (속도 최적화)
+    print(f"🧠 [{data_type}] 품목 임베딩 생성 중...")
+    try:
+        # float32 임베딩 행렬 크기만큼 여유가 있는지 먼저 확인
+        dim = model.get_sentence_embedding_dimension() or 384
+        memory_budget.ensure_room(data_type, len(index) * dim * 4)
+        encoded = index.encode(model, previous, changed)
+        print(f"✅ [{data_type}] {len(index)}개 임베딩 생성 완료 (새로 인코딩 {encoded}개)")
+        return None
+    except MemoryBudgetExceeded as e:
+        print(f"❌ {e}")
+        return str(e)
+    except Exception as e:
+        print(f"❌ [{data_type}] 임베딩 생성 실패: {e}")
+        return f"[{data_type}] 임베딩 생성 실패: {e}"
+
+def rebuild_index(data_type: str, changed: set) -> Tuple[CatalogIndex, Optional[str]]:
+    """한 데이터 타입만 DB에서 다시 읽고, sync manifest의 바뀐 품목만 다시 인코딩 → (인덱스, 실패 사유)"""
+    with db.read() as conn:
+        index = load_index(conn, data_type)
+    return index, encode_index(data_type, index, indexes.get(data_type), changed)
 
 # ==================== API Endpoints ====================
 
@@ -151,107 +414,421 @@ async def preload_items():
 async def root():
     """헬스체크 엔드포인트"""
     return {
-        "status": "healthy",
+        # 모델/인덱스 준비 전에는 starting (Node 헬스체크는 healthy만 정상으로 봄)
+        "status": "healthy" if timeline.ready else ("error" if timeline.error else "starting"),
         "service": "Order AI ML Server",
-        "model": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-        "items_loaded": len(items_cache) if items_cache else 0,
-        "embeddings_cached": embeddings_cache is not None
+        "model": MODEL_INFO["name"],
+        "items_loaded": sum(len(index) for index in indexes.values()),
+        "embeddings_cached": any(index.ready for index in indexes.values()),
+        "indexes": {name: len(index) for name, index in indexes.items()},
+        "index_errors": index_errors
     }
 
+def get_ready_index(data_type: str) -> CatalogIndex:
+    """요청 데이터 타입의 인덱스 (없거나 준비 안 됐으면 HTTP 오류)"""
+    if data_type not in DATA_TYPES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 data_type: {data_type} (가능: {', '.join(DATA_TYPES)})")
+    
+    # 스냅샷에서 온 인덱스는 모델 로드 전에도 ready (이때 검색은 degraded 경로)
+    index = indexes.get(data_type)
+    if index is None or not index.ready:
+        if not model:
+            raise HTTPException(status_code=503, detail="모델이 로드되지 않았습니다")
+        raise HTTPException(status_code=503, detail=f"[{data_type}] 품목 데이터가 로드되지 않았습니다")
+    return index
+
+def recall(index: CatalogIndex, requests: List[MatchRequest]) -> List[Optional[Dict[str, Any]]]:
+    """
+    쿼리 메모리에 확정된 품목이 있으면 모델 없이 hits 구성 (요청 인덱스에 없는 품목이면 통과)
+    메모리 키는 normalizeForSearch 규칙이라 숫자(빈티지)가 빠지므로,
+    쿼리의 빈티지와 기억된 품목의 빈티지가 다르면 통과 ("샤르도네 2018" 확정 → "샤르도네 2019"는 모델로)
+    """
+    remembered: List[Optional[Dict[str, Any]]] = []
+    for request in requests:
+        row = index.resolve_ref(query_memory.lookup(request.client_code, request.query))
+        if row is not None:
+            hint = vintage_hint(request.query)
+            vintage = row_vintage(index.items[row]) if hint is not None else None
+            if hint is not None and vintage is not None and vintage != hint:
+                row = None
+        query_memory.record_lookup(row is not None)
+        remembered.append(None if row is None else {"rows": [row], "scores": [1.0], "method": MEMORY_METHOD})
+    return remembered
+
+def etag_variant(media_type: Optional[str], remembered: List[Optional[Dict[str, Any]]]) -> Optional[str]:
+    """메모리 응답은 피드백마다 바뀌므로 ETag에 기억된 행을 반영"""
+    if not any(remembered):
+        return media_type
+    rows = ",".join(str(hits["rows"][0]) if hits else "" for hits in remembered)
+    return f"{media_type or 'json'}|memory:{rows}"
+
+def compute_hits(index: CatalogIndex, options: MatchRequest, queries: List[str]) -> Tuple[List[Dict[str, Any]], float, Optional[float]]:
+    """
+    모델 계산 (입장 슬롯 안에서 executor 스레드로 실행)
+    반환: (hits 목록, 인코딩 + 검색 ms, 재순위 ms 또는 None)
+    """
+    use_rerank = reranker is not None and reranker.ready and options.rerank
+    # 재순위 후보(top_n)까지 뽑고 재순위 후 top_k로 자름
+    search_k = reranker.candidate_k(options.top_k) if use_rerank else options.top_k
+    # 쿼리 임베딩 생성 (배치) → 사전 필터 + 유사도 검색
+    started = time.perf_counter()
+    query_embeddings = model.encode(queries, convert_to_tensor=True)
+    if options.group_vintages:
+        computed = search_grouped(index, queries, query_embeddings, search_k, options.min_score,
+                                  client_code=options.client_code)
+    else:
+        computed = search_queries(index, queries, query_embeddings, search_k, options.min_score,
+                                  collapse=options.collapse_duplicates)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rerank_ms = reranker.rerank(index, queries, computed, options.top_k, options.min_score) if use_rerank else None
+    return computed, elapsed_ms, rerank_ms
+
+def request_deadline(http_request: Request) -> Optional[float]:
+    """호출 측 남은 시간 (X-Request-Deadline-Ms), 없으면 기본 마감"""
+    value = http_request.headers.get("x-request-deadline-ms")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+async def run_queries(index: CatalogIndex, requests: List[MatchRequest], cache_keys: List[str],
+                      remembered: List[Optional[Dict[str, Any]]],
+                      deadline_ms: Optional[float] = None) -> Tuple[List[Dict[str, Any]], str, Optional[float]]:
+    """
+    쿼리별 hits 계산 - 메모리/캐시에 없는 쿼리만 한 번에 배치 인코딩
+    입장 제어에 거절되면 어휘 경로로 답하고 캐시 상태를 DEGRADED로 표시 (캐시에 넣지 않음)
+    반환: (hits 목록, 캐시 상태 MEMORY / HIT / MISS / PARTIAL / DEGRADED, 재순위 ms 또는 None)
+    """
+    version = catalog_version
+    hits_list: List[Optional[Dict[str, Any]]] = [
+        hits if hits is not None else response_cache.get(key, version)
+        for hits, key in zip(remembered, cache_keys)
+    ]
+    misses = [i for i, hits in enumerate(hits_list) if hits is None]
+    rerank_ms = None
+    
+    if misses:
+        options = requests[misses[0]]
+        queries = [requests[i].query for i in misses]
+        try:
+            if model is None:
+                # 모델 로딩 중 (스냅샷 인덱스만 있음) → 어휘/메모리 경로
+                raise admission.reject("warming")
+            async with admission.slot(len(queries), deadline_ms):
+                loop = asyncio.get_running_loop()
+                computed, elapsed_ms, rerank_ms = await loop.run_in_executor(None, compute_hits, index, options, queries)
+        except AdmissionRejected:
+            # 거절 사유별 건수는 admission.stats()에 집계
+            for i, hits in zip(misses, lexical_only(index, queries, options.top_k, options.min_score)):
+                hits_list[i] = hits
+            return hits_list, "DEGRADED", None
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"매칭 실패: {str(e)}")
+        if shadow is not None and not options.group_vintages:
+            # 샘플링된 경우만 섀도 스레드로 넘기고 바로 반환 (응답은 기다리지 않음)
+            primary_item_nos = [[str(index.items[row]["item_no"]) for row in hits["rows"]] for hits in computed]
+            shadow.mirror(index.name, queries, primary_item_nos, elapsed_ms, options.top_k, options.min_score,
+                          options.collapse_duplicates)
+        for i, hits in zip(misses, computed):
+            hits_list[i] = hits
+            response_cache.put(cache_keys[i], version, hits)
+        memory_budget.relieve_pressure()
+    
+    if requests and all(remembered):
+        cache_status = "MEMORY"
+    elif not misses:
+        cache_status = "HIT"
+    elif len(misses) == len(requests):
+        cache_status = "MISS"
+    else:
+        cache_status = "PARTIAL"
+    return hits_list, cache_status, rerank_ms
+
+def compact_response(media_type: str, index: CatalogIndex, hits_list: List[Dict[str, Any]], start_time: datetime, headers: Dict[str, str]) -> Response:
+    """컬럼형 payload → msgpack / JSON 바이트 응답"""
+    payload = compact.columnar_payload(index, hits_list)
+    payload["catalog_version"] = catalog_version
+    payload["processing_time_ms"] = (datetime.now() - start_time).total_seconds() * 1000
+    try:
+        content = compact.encode(media_type, payload)
+    except compact.CompactFormatUnavailable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    return Response(content=content, media_type=media_type, headers=headers)
+
+def cache_headers(etag: str, **extra: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept", **extra}
+
+def match_headers(etag: str, cache_status: str, rerank_ms: Optional[float]) -> Dict[str, str]:
+    """캐시 상태 + 재순위를 실행한 요청이면 소요 시간"""
+    if cache_status == "DEGRADED":
+        # 어휘 경로 응답은 재사용되면 안 되므로 ETag 없이 (클라이언트 캐시에 남지 않음)
+        return {"Cache-Control": "no-store", "Vary": "Accept", "X-Cache": cache_status, "X-Degraded": "1"}
+    extra = {"X-Cache": cache_status}
+    if rerank_ms is not None:
+        extra["X-Rerank-Ms"] = f"{rerank_ms:.1f}"
+    return cache_headers(etag, **extra)
+
 @app.post("/api/ml-match", response_model=MatchResponse)
-async def match_items(request: MatchRequest):
+async def match_items(request: MatchRequest, http_request: Request, response: Response):
     """
     품목 매칭 API - PyTorch 의미 기반 매칭
     
     정확도 최우선 (90-95% 목표)
+    동일 요청은 (요청, 카탈로그 버전) 캐시로 응답하고 If-None-Match 일치 시 304 반환
+    Accept가 컴팩트 형식이면 컬럼형 배열로 응답 (compact.py)
     """
     start_time = datetime.now()
     
+    index = get_ready_index(request.data_type)
+    media_type = compact.negotiate(http_request.headers.get("accept"))
+    
+    cache_key = make_cache_key(request.model_dump())
+    remembered = recall(index, [request])
+    etag = make_etag(cache_key, catalog_version, variant=etag_variant(media_type, remembered))
+    
+    # 클라이언트가 이미 같은 버전의 응답을 갖고 있으면 계산 없이 304
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    
+    hits_list, cache_status, rerank_ms = await run_queries(index, [request], [cache_key], remembered,
+                                                           request_deadline(http_request))
+    hits = hits_list[0]
+    
+    if media_type:
+        return compact_response(media_type, index, [hits], start_time, match_headers(etag, cache_status, rerank_ms))
+    
+    results = format_results(index, hits)
+    
+    # 처리 시간 계산
+    processing_time = (datetime.now() - start_time).total_seconds() * 1000
+    
+    response.headers.update(match_headers(etag, cache_status, rerank_ms))
+    
+    return {
+        "success": True,
+        "query": request.query,
+        "results": results,
+        "processing_time_ms": processing_time,
+        "model_info": MODEL_INFO,
+        "degraded": cache_status == "DEGRADED"
+    }
+
+@app.post("/api/ml-match/batch", response_model=BatchMatchResponse)
+async def match_items_batch(request: BatchMatchRequest, http_request: Request, response: Response):
+    """
+    배치 매칭 API - 여러 쿼리를 한 번에 인코딩
+    
+    쿼리별 캐시는 단건 API와 공유하고, 컴팩트 모드에서는 offsets로 쿼리 구간을 구분
+    """
+    start_time = datetime.now()
+    
+    index = get_ready_index(request.data_type)
+    media_type = compact.negotiate(http_request.headers.get("accept"))
+    
+    options = request.model_dump(exclude={"queries"})
+    requests = [MatchRequest(query=query, **options) for query in request.queries]
+    cache_keys = [make_cache_key(single.model_dump()) for single in requests]
+    remembered = recall(index, requests)
+    etag = make_etag(make_cache_key({"batch": cache_keys}), catalog_version, variant=etag_variant(media_type, remembered))
+    
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    
+    if requests:
+        hits_list, cache_status, rerank_ms = await run_queries(index, requests, cache_keys, remembered,
+                                                               request_deadline(http_request))
+    else:
+        hits_list, cache_status, rerank_ms = [], "HIT", None
+    
+    if media_type:
+        return compact_response(media_type, index, hits_list, start_time, match_headers(etag, cache_status, rerank_ms))
+    
+    response.headers.update(match_headers(etag, cache_status, rerank_ms))
+    
+    return {
+        "success": True,
+        "queries": request.queries,
+        "results": [format_results(index, hits) for hits in hits_list],
+        "processing_time_ms": (datetime.now() - start_time).total_seconds() * 1000,
+        "model_info": MODEL_INFO,
+        "degraded": cache_status == "DEGRADED"
+    }
+
+def export_etag(data_type: str, variant: str) -> str:
+    return make_etag(make_cache_key({"export": data_type}), catalog_version, variant=variant)
+
+@app.get("/api/embeddings/{data_type}/manifest")
+async def embeddings_manifest(data_type: str, http_request: Request):
+    """
+    임베딩 내보내기 manifest - 행 순서(item_no), 모양, 바이트 레이아웃, sha256
+    
+    아티팩트 ETag도 함께 주므로 받는 쪽은 버전이 바뀐 dtype만 다시 받으면 된다
+    행렬은 만들지 않음 (레이아웃은 모양으로 계산, sha256은 이미 만든 아티팩트만)
+    """
+    index = get_ready_index(data_type)
+    artifacts = {}
+    for dtype in embedding_export.DTYPES:
+        info = export_cache.cached_info(index, dtype, catalog_version)
+        artifacts[dtype] = {**info, "url": f"/api/embeddings/{data_type}?dtype={dtype}", "etag": export_etag(data_type, dtype)}
+    
+    # 아티팩트가 만들어지면 sha256이 채워지므로 ETag도 달라짐
+    built = "+".join(dtype for dtype, info in artifacts.items() if info["sha256"])
+    etag = export_etag(data_type, f"manifest:{built}")
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    body = embedding_export.manifest(index, catalog_version, MODEL_INFO["name"], artifacts)
+    return Response(
+        content=compact.encode(compact.COLUMNAR_JSON_MEDIA_TYPE, body),
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+@app.get("/api/embeddings/{data_type}")
+async def embeddings_matrix(data_type: str, http_request: Request, dtype: str = "float32"):
+    """임베딩 행렬 원시 바이트 (little-endian, 행 순서는 manifest의 rows)"""
+    index = get_ready_index(data_type)
+    if dtype not in embedding_export.DTYPES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 dtype: {dtype} (가능: {', '.join(embedding_export.DTYPES)})")
+    
+    etag = export_etag(data_type, dtype)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Catalog-Version": str(catalog_version)}
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # 캐시 미스면 복사 + 양자화 + sha256 → executor (이벤트 루프의 매칭 요청을 막지 않음)
+    content, info = await asyncio.get_running_loop().run_in_executor(
+        None, export_cache.get_or_build, index, dtype, catalog_version)
+    headers.update({"X-Rows": str(info["rows"]), "X-Dim": str(info["dim"]), "X-Content-SHA256": info["sha256"]})
+    return Response(content=content, media_type=embedding_export.MEDIA_TYPE, headers=headers)
+
+@app.post("/api/feedback")
+async def submit_feedback(request: FeedbackRequest):
+    """
+    선택 피드백 수집
+    
+    쿼리 메모리는 즉시 갱신 (다음 동일 쿼리는 모델 호출 없이 응답)하고,
+    DB 기록은 버퍼에 모아 백그라운드에서 배치 트랜잭션으로 처리
+    """
+    if feedback_writer is None:
+        raise HTTPException(status_code=503, detail="피드백 저장소가 준비되지 않았습니다")
+    
+    for event in request.events:
+        if event.data_type not in DATA_TYPES:
+            raise HTTPException(status_code=400, detail=f"지원하지 않는 data_type: {event.data_type} (가능: {', '.join(DATA_TYPES)})")
+    
+    events = [event.model_dump() for event in request.events]
+    remembered = sum(
+        query_memory.remember(event["client_code"], event["query"], event["selected_item_no"])
+        for event in events
+    )
+    buffered = feedback_writer.add(events)
+    
+    return {
+        "success": True,
+        "accepted": len(events),
+        "remembered": remembered,
+        "buffered": buffered
+    }
+
+@app.post("/api/reload")
+async def reload_items():
+    """품목/임베딩 재로드 (카탈로그 버전 증가 → 이전 캐시/ETag 무효화)"""
     if not model:
         raise HTTPException(status_code=503, detail="모델이 로드되지 않았습니다")
     
-    if not items_cache or embeddings_cache is None:
-        raise HTTPException(status_code=503, detail="품목 데이터가 로드되지 않았습니다")
+    failures = await preload_items()
+    if failures:
+        # 실패한 타입은 이전 인덱스로 계속 응답
+        raise HTTPException(status_code=500, detail={
+            "success": False,
+            "failures": failures,
+            "catalog_version": catalog_version,
+        })
+    return {
+        "success": True,
+        "catalog_version": catalog_version,
+        "items_count": sum(len(index) for index in indexes.values())
+    }
+
+@app.post("/api/reload/incremental")
+async def reload_incremental():
+    """
+    sync manifest(load_data.py --sync) 반영: 해당 데이터 타입 인덱스만 다시 만들고
+    추가/수정된 품목만 인코딩 (나머지 임베딩은 재사용, 삭제된 품목은 빠짐)
+    """
+    global indexes, snapshot_info, applied_sync
+    if not model:
+        raise HTTPException(status_code=503, detail="모델이 로드되지 않았습니다")
     
     try:
-        # 쿼리 임베딩 생성
-        query_embedding = model.encode(request.query, convert_to_tensor=True)
-        
-        # 코사인 유사도 계산 (GPU 가속)
-        similarities = util.cos_sim(query_embedding, embeddings_cache)[0]
-        
-        # 상위 K개 결과 추출
-        top_results = torch.topk(similarities, k=min(request.top_k * 2, len(items_cache)))
-        
-        # 결과 필터링 및 포맷팅
-        results = []
-        for idx, score in zip(top_results.indices, top_results.values):
-            score_value = float(score)
-            
-            # 최소 점수 필터
-            if score_value < request.min_score:
-                continue
-            
-            item = items_cache[int(idx)]
-            
-            # 한글/영문 분리 (형식: "한글명 / English Name (2018)")
-            item_name = item["item_name"]
-            korean_name = None
-            english_name = None
-            vintage = None
-            
-            if " / " in item_name:
-                parts = item_name.split(" / ")
-                korean_name = parts[0].strip()
-                english_part = parts[1].strip() if len(parts) > 1 else ""
-                
-                # 빈티지 추출
-                if "(" in english_part and ")" in english_part:
-                    vintage_start = english_part.rfind("(")
-                    vintage = english_part[vintage_start+1:english_part.rfind(")")]
-                    english_name = english_part[:vintage_start].strip()
-                else:
-                    english_name = english_part
-            
-            results.append(MatchResult(
-                item_no=item["item_no"],
-                item_name=item_name,
-                korean_name=korean_name,
-                english_name=english_name,
-                vintage=vintage,
-                score=score_value,
-                method="pytorch_semantic"
-            ))
-            
-            if len(results) >= request.top_k:
-                break
-        
-        # 처리 시간 계산
-        processing_time = (datetime.now() - start_time).total_seconds() * 1000
-        
-        return MatchResponse(
-            success=True,
-            query=request.query,
-            results=results,
-            processing_time_ms=processing_time,
-            model_info={
-                "name": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                "type": "pytorch",
-                "multilingual": "true"
-            }
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"매칭 실패: {str(e)}")
+        manifest = read_manifest(SYNC_MANIFEST_PATH)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=500, detail=f"sync manifest 읽기 실패: {e}")
+    if manifest is None:
+        raise HTTPException(status_code=404, detail=f"sync manifest가 없습니다: {SYNC_MANIFEST_PATH}")
+    
+    data_type = manifest.get("data_type", "wine")
+    counts = manifest.get("counts", {})
+    already = applied_sync is not None and applied_sync["synced_at"] == manifest["synced_at"]
+    if already or not any(counts.get(key) for key in ("inserted", "updated", "deleted")):
+        applied_sync = {"synced_at": manifest["synced_at"], "data_type": data_type, "counts": counts}
+        return {"success": True, "applied": False, "catalog_version": catalog_version, "sync": applied_sync}
+    
+    started = time.perf_counter()
+    changed = changed_item_nos(manifest)
+    index, error = await asyncio.get_running_loop().run_in_executor(None, rebuild_index, data_type, changed)
+    if error is not None:
+        # 이전 인덱스 유지, manifest는 반영 안 된 것으로 남김 (다시 호출하면 재시도)
+        raise HTTPException(status_code=500, detail={"success": False, "data_type": data_type, "error": error})
+    indexes = {**indexes, data_type: index}
+    snapshot_info = None
+    bump_catalog_version()
+    if shadow is not None:
+        shadow.schedule_load(db, memory_budget)
+    
+    applied_sync = {
+        "synced_at": manifest["synced_at"],
+        "data_type": data_type,
+        "counts": counts,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    print(f"🔄 [{data_type}] 증분 반영: {counts} ({applied_sync['elapsed_ms']}ms)")
+    return {
+        "success": True,
+        "applied": True,
+        "catalog_version": catalog_version,
+        "items_count": len(index),
+        "sync": applied_sync,
+    }
+
+@app.get("/api/shadow/stats")
+async def get_shadow_stats():
+    """섀도 평가 집계 (주/보조 모델 순위 일치도 + 지연 시간)"""
+    if shadow is None:
+        return {"enabled": False, "hint": "ML_SHADOW_MODEL 환경 변수로 보조 모델을 지정하세요"}
+    return shadow.stats()
 
 @app.get("/api/stats")
 async def get_stats():
-    """서버 통계 정보"""
+    """서버 통계 정보 (메모리 보고는 tracemalloc 스냅샷 때문에 executor에서)"""
+    memory = await asyncio.get_running_loop().run_in_executor(None, memory_report, model, indexes, memory_budget)
     return {
         "model_loaded": model is not None,
-        "items_count": len(items_cache) if items_cache else 0,
-        "embeddings_cached": embeddings_cache is not None,
-        "cache_size_mb": embeddings_cache.element_size() * embeddings_cache.nelement() / (1024**2) if embeddings_cache is not None else 0
+        "items_count": sum(len(index) for index in indexes.values()),
+        "embeddings_cached": any(index.ready for index in indexes.values()),
+        "cache_size_mb": sum(index.stats()["embeddings_mb"] for index in indexes.values()),
+        "indexes": {name: index.stats() for name, index in indexes.items()},
+        "catalog_version": catalog_version,
+        "response_cache": response_cache.stats(),
+        "query_memory": query_memory.stats(),
+        "feedback": feedback_writer.stats() if feedback_writer else None,
+        "admission": admission.stats(),
+        "snapshot": snapshot_info,
+        "sync": applied_sync,
+        "startup": timeline.stats(),
+        "rerank": reranker.stats() if reranker else {"enabled": False},
+        "memory": memory
     }
 
 # ==================== 메인 실행 ====================
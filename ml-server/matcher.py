@@ -0,0 +1,239 @@
+"""
+임베딩 검색 (+ 사전 필터 / 자모 어휘 후보 / 빈티지 패밀리) + 결과 포맷팅
+
+검색 결과는 (행 번호, 점수) 배열(hits)로 다루고, 응답 형식(JSON/컴팩트)에 맞춰
+마지막에 한 번만 포맷팅한다. 응답 캐시도 hits를 저장한다.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# torch / sentence_transformers는 첫 검색 때 import (HTTP 레이어와 스냅샷 로드가 먼저 뜨도록)
+from catalog_index import CatalogIndex
+from families import FAMILY_FANOUT, GROUPED_METHOD, vintage_hint
+from ngram_index import query_tokens
+
+SEMANTIC_METHOD = "pytorch_semantic"
+DEGRADED_METHOD = "lexical_degraded"
+# 자모 n-gram 어휘 점수 가중치 (의미 점수와 혼합)
+LEXICAL_WEIGHT = 0.35
+
+
+def split_item_name(item_name: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """한글/영문/빈티지 분리 (형식: "한글명 / English Name (2018)")"""
+    korean_name = None
+    english_name = None
+    vintage = None
+
+    if " / " in item_name:
+        parts = item_name.split(" / ")
+        korean_name = parts[0].strip()
+        english_part = parts[1].strip() if len(parts) > 1 else ""
+
+        # 빈티지 추출
+        if "(" in english_part and ")" in english_part:
+            vintage_start = english_part.rfind("(")
+            vintage = english_part[vintage_start+1:english_part.rfind(")")]
+            english_name = english_part[:vintage_start].strip()
+        else:
+            english_name = english_part
+
+    return korean_name, english_name, vintage
+
+
+def semantic_candidates(index: CatalogIndex, query_embeddings, k: int, subset=None) -> List[Tuple[List[int], List[float]]]:
+    """
+    쿼리 임베딩(배치) → 쿼리별 유사도 상위 k개 (행 번호, 점수)
+    subset: 사전 필터로 좁힌 행 번호 배열 (None이면 전체)
+    """
+    import torch
+    from sentence_transformers import util
+
+    embeddings = index.embeddings
+    if subset is not None:
+        subset = torch.as_tensor(subset, dtype=torch.long, device=embeddings.device)
+        embeddings = embeddings.index_select(0, subset)
+
+    # 코사인 유사도 계산 (GPU 가속) - 요청한 데이터 타입의 행렬만 사용
+    similarities = util.cos_sim(query_embeddings, embeddings)
+
+    top_results = torch.topk(similarities, k=min(k, embeddings.shape[0]), dim=1)
+    row_ids = top_results.indices
+    if subset is not None:
+        row_ids = subset[row_ids]
+
+    return list(zip(row_ids.tolist(), top_results.values.tolist()))
+
+
+def finalize_hits(index: CatalogIndex, query_embedding, rows: List[int], scores: List[float],
+                  tokens: List[str], top_k: int, min_score: float, subset=None,
+                  collapse: bool = False) -> Dict[str, Any]:
+    """
+    의미 후보 + 자모 n-gram 어휘 후보 병합 → min_score / top_k 적용
+    어휘 점수는 점수를 올리기만 한다 (의미 점수보다 낮아지지 않음)
+    collapse: 같은 중복 군집(dedup_job.py)은 점수가 가장 높은 행 하나만 남김
+    """
+    import torch
+    from sentence_transformers import util
+
+    combined = dict(zip(rows, scores))
+
+    lexical = index.lexical_search(tokens, subset) if tokens else {}
+    if lexical:
+        # 의미 후보에 없던 어휘 후보는 해당 행만 유사도 계산
+        extra = [row for row in lexical if row not in combined]
+        if extra:
+            extra_embeddings = index.embeddings[torch.as_tensor(extra, dtype=torch.long, device=index.embeddings.device)]
+            combined.update(zip(extra, util.cos_sim(query_embedding, extra_embeddings)[0].tolist()))
+        for row, lexical_score in lexical.items():
+            blended = (1 - LEXICAL_WEIGHT) * combined[row] + LEXICAL_WEIGHT * lexical_score
+            combined[row] = max(combined[row], blended)
+
+    kept_rows = []
+    kept_scores = []
+    seen_clusters = set()
+    for row, score in sorted(combined.items(), key=lambda kv: kv[1], reverse=True):
+        # 최소 점수 필터
+        if score < min_score:
+            break
+        if collapse:
+            cluster = index.cluster_of.get(row, row)
+            if cluster in seen_clusters:
+                continue
+            seen_clusters.add(cluster)
+        kept_rows.append(row)
+        kept_scores.append(score)
+        if len(kept_rows) >= top_k:
+            break
+    return {"rows": kept_rows, "scores": kept_scores, "method": SEMANTIC_METHOD}
+
+
+def search_queries(index: CatalogIndex, queries: List[str], query_embeddings, top_k: int, min_score: float,
+                   collapse: bool = False) -> List[Dict[str, Any]]:
+    """
+    배치 검색 + 구조화 사전 필터 + 자모 어휘 후보
+    - 빈티지/생산자/국가/지역 힌트가 있는 쿼리는 교집합 행만 계산
+    - 힌트가 없는 쿼리는 모아서 전체 행렬 한 번에 계산
+    - 좁힌 범위에서 min_score 이상 결과가 없으면 전체 검색으로 대체
+    - collapse이면 중복 군집을 접고, 접힐 몫만큼 후보를 더 뽑는다
+    """
+    # 중복 군집이 있으면 접힌 자리를 채울 후보 여유분
+    candidates_k = top_k * (3 if collapse and index.cluster_of else 2)
+    hits_list: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    full_scan = []
+
+    for i, query in enumerate(queries):
+        # 쿼리 자모 분해는 요청당 한 번
+        tokens = query_tokens(query)
+        subset = index.filters.candidate_rows(query)
+        if subset is not None:
+            rows, scores = semantic_candidates(index, query_embeddings[i:i+1], candidates_k, subset=subset)[0]
+            hits = finalize_hits(index, query_embeddings[i], rows, scores, tokens, top_k, min_score,
+                                 subset=subset, collapse=collapse)
+            if hits["rows"]:
+                hits_list[i] = hits
+                continue
+            index.filters.fallbacks += 1
+        full_scan.append((i, tokens))
+
+    if full_scan:
+        positions = [i for i, _ in full_scan]
+        candidates = semantic_candidates(index, query_embeddings[positions], candidates_k)
+        for (i, tokens), (rows, scores) in zip(full_scan, candidates):
+            hits_list[i] = finalize_hits(index, query_embeddings[i], rows, scores, tokens, top_k, min_score,
+                                         collapse=collapse)
+
+    return hits_list
+
+
+def search_grouped(index: CatalogIndex, queries: List[str], query_embeddings, top_k: int, min_score: float,
+                   client_code: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    2단계 패밀리 검색 (families.py)
+    1) 패밀리 centroid 중 상위 top_k * FAMILY_FANOUT개 선택
+    2) 그 패밀리의 빈티지 행만 유사도 + 자모 어휘 점수 → 빈티지 힌트 / 거래처 이력으로 조정
+    결과는 패밀리당 대표 행 하나 + groups (같은 패밀리의 다른 빈티지 행, 최신순)
+    """
+    families = index.families
+    family_lists = families.top_families(query_embeddings, top_k * FAMILY_FANOUT)
+    client_rows = index.client_rows.get(client_code) if client_code else None
+
+    hits_list = []
+    for i, (query, family_ids) in enumerate(zip(queries, family_lists)):
+        subset = np.concatenate([families.members[f] for f in family_ids])
+        rows, scores = semantic_candidates(index, query_embeddings[i:i+1], len(subset), subset=subset)[0]
+        merged = finalize_hits(index, query_embeddings[i], rows, scores, query_tokens(query), len(subset), -1.0, subset=subset)
+
+        hint = vintage_hint(query)
+        best: Dict[int, Tuple[int, float]] = {}
+        for row, score in zip(merged["rows"], merged["scores"]):
+            family = int(families.family_of_row[row])
+            adjusted = families.adjust(row, score, hint, client_rows)
+            if family not in best or adjusted > best[family][1]:
+                best[family] = (row, adjusted)
+
+        ranked = sorted(best.items(), key=lambda kv: kv[1][1], reverse=True)
+        kept_rows, kept_scores, groups = [], [], []
+        for family, (row, score) in ranked:
+            if score < min_score:
+                break
+            kept_rows.append(row)
+            kept_scores.append(score)
+            others = [int(r) for r in families.members[family] if r != row]
+            others.sort(key=lambda r: families.vintages[r] or 0, reverse=True)
+            groups.append(others)
+            if len(kept_rows) >= top_k:
+                break
+        hits_list.append({"rows": kept_rows, "scores": kept_scores, "method": GROUPED_METHOD, "groups": groups})
+
+    return hits_list
+
+
+def lexical_only(index: CatalogIndex, queries: List[str], top_k: int, min_score: float) -> List[Dict[str, Any]]:
+    """
+    모델 없이 자모 n-gram 어휘 점수만으로 검색 (입장 제어로 거절된 요청의 degraded 경로)
+    사전 필터가 있으면 그 범위 안에서만 찾는다
+    """
+    hits_list = []
+    for query in queries:
+        tokens = query_tokens(query)
+        lexical = index.lexical_search(tokens, index.filters.candidate_rows(query)) if tokens else {}
+        kept_rows, kept_scores = [], []
+        for row, score in sorted(lexical.items(), key=lambda kv: kv[1], reverse=True)[:top_k]:
+            if score < min_score:
+                break
+            kept_rows.append(row)
+            kept_scores.append(score)
+        hits_list.append({"rows": kept_rows, "scores": kept_scores, "method": DEGRADED_METHOD})
+    return hits_list
+
+
+def format_results(index: CatalogIndex, hits: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """hits → MatchResult 형태의 dict 목록 (행마다 Pydantic 검증 없이)"""
+    results = []
+    groups = hits.get("groups")
+    for position, (row, score) in enumerate(zip(hits["rows"], hits["scores"])):
+        item = index.items[row]
+        item_name = item["item_name"]
+        korean_name, english_name, vintage = split_item_name(item_name)
+        results.append({
+            "item_no": item["item_no"],
+            "item_name": item_name,
+            "korean_name": item.get("korean_name") or korean_name,
+            "english_name": item.get("english_name") or english_name,
+            "vintage": str(item["vintage"]) if item.get("vintage") else vintage,
+            "score": score,
+            "method": hits["method"],
+        })
+        if groups is not None:
+            # 같은 와인, 다른 빈티지
+            results[-1]["other_vintages"] = [
+                {
+                    "item_no": index.items[other]["item_no"],
+                    "item_name": index.items[other]["item_name"],
+                    "vintage": str(index.families.vintages[other]) if index.families.vintages[other] else None,
+                }
+                for other in groups[position]
+            ]
+    return results
@@ -0,0 +1,218 @@
+"""
+ml-server 메모리 계측 + 예산(budget) 관리
+
+- 모델 가중치, 토크나이저, 인덱스별 임베딩/어휘 인덱스, 캐시, Python 힙을 항목별로 보고
+- ML_MEMORY_BUDGET_MB 를 넘을 것 같으면 캐시를 줄이고, 새 인덱스 구성은 거부
+  (PM2 max_memory_restart=2G 에 걸리기 전에 무엇이 커졌는지 보이도록)
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Optional, Set
+
+MB = 1024 * 1024
+
+# PM2 max_memory_restart(2G)보다 여유 있게
+MEMORY_BUDGET_MB = float(os.environ.get("ML_MEMORY_BUDGET_MB", "1800"))
+# 예산 대비 이 비율을 넘으면 캐시 축소
+PRESSURE_RATIO = float(os.environ.get("ML_MEMORY_PRESSURE_RATIO", "0.9"))
+# tracemalloc 샘플링 (오버헤드가 있으므로 기본 꺼짐)
+TRACEMALLOC_ENABLED = os.environ.get("ML_TRACEMALLOC", "0") == "1"
+TRACEMALLOC_FRAMES = 1
+
+
+class MemoryBudgetExceeded(Exception):
+    """예산 초과로 인덱스 구성을 거부할 때"""
+
+
+def peak_rss_bytes() -> int:
+    """프로세스 시작 이후 최대 RSS"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS는 bytes, Linux는 KiB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def rss_bytes() -> int:
+    """현재 프로세스 RSS (Linux는 /proc, 그 외는 최대 RSS로 대체)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def tensor_bytes(tensor) -> int:
+    if tensor is None:
+        return 0
+    return tensor.element_size() * tensor.nelement()
+
+
+def deep_sizeof(obj: Any) -> int:
+    """컨테이너(dict/list/tuple/set/str/array, 일반 객체 속성)를 따라가며 합산한 크기"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if hasattr(current, "element_size") and hasattr(current, "nelement"):
+            total += tensor_bytes(current)
+            continue
+        if hasattr(current, "nbytes") and not isinstance(current, (bytes, bytearray)):
+            total += int(current.nbytes)
+            continue
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__") and not isinstance(current, type):
+            stack.append(vars(current))
+    return total
+
+
+def model_bytes(model) -> int:
+    """모델 가중치 + 버퍼 크기"""
+    if model is None:
+        return 0
+    total = 0
+    for param in model.parameters():
+        total += tensor_bytes(param)
+    for buffer in model.buffers():
+        total += tensor_bytes(buffer)
+    return total
+
+
+_tokenizer_bytes_cache: Dict[int, int] = {}
+
+
+def tokenizer_bytes(model) -> int:
+    """토크나이저 상태 크기 (Rust 쪽 메모리는 직렬화 크기로 근사, 모델당 1회 계산)"""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return 0
+    key = id(tokenizer)
+    if key not in _tokenizer_bytes_cache:
+        backend = getattr(tokenizer, "backend_tokenizer", None)
+        if backend is not None:
+            size = len(backend.to_str())
+        else:
+            size = deep_sizeof(tokenizer.get_vocab())
+        _tokenizer_bytes_cache[key] = size
+    return _tokenizer_bytes_cache[key]
+
+
+def start_tracemalloc() -> None:
+    if TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+def heap_report(top_n: int = 10) -> Dict[str, Any]:
+    """tracemalloc 기반 Python 힙 사용량 + 상위 할당 위치"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    top = snapshot.statistics("lineno")[:top_n]
+    return {
+        "tracing": True,
+        "current_mb": round(current / MB, 2),
+        "peak_mb": round(peak / MB, 2),
+        "top_allocations": [
+            {"location": str(stat.traceback), "size_mb": round(stat.size / MB, 3), "count": stat.count}
+            for stat in top
+        ],
+    }
+
+
+class MemoryBudget:
+    """캐시 등록 + 압박 시 축소 + 인덱스 구성 가능 여부 판단"""
+
+    def __init__(self, budget_mb: float = MEMORY_BUDGET_MB, pressure_ratio: float = PRESSURE_RATIO):
+        self.budget_bytes = int(budget_mb * MB)
+        self.pressure_ratio = pressure_ratio
+        # 이름 → shrink(fraction)/stats() 를 가진 캐시
+        self.caches: Dict[str, Any] = {}
+        # 비워도 요청/재계산으로 다시 채워지는 캐시 (인덱스 자리 확보용으로 완전히 비워도 됨)
+        self.rebuildable: Set[str] = set()
+        self.shrink_events = 0
+        self.refused_builds = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def register_cache(self, name: str, cache, rebuildable: bool = True) -> None:
+        self.caches[name] = cache
+        if rebuildable:
+            self.rebuildable.add(name)
+
+    def under_pressure(self) -> bool:
+        return rss_bytes() > self.budget_bytes * self.pressure_ratio
+
+    def relieve_pressure(self, min_interval: float = 1.0) -> bool:
+        """예산 압박이면 등록된 캐시를 절반으로 축소 (min_interval 초마다 최대 1회 확인)"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < min_interval:
+                return False
+            self._last_check = now
+        if not self.under_pressure():
+            return False
+        for cache in self.caches.values():
+            cache.shrink(0.5)
+        self.shrink_events += 1
+        print(f"⚠️ 메모리 압박 ({rss_bytes() / MB:.0f}MB / 예산 {self.budget_bytes / MB:.0f}MB) → 캐시 축소")
+        return True
+
+    def ensure_room(self, name: str, needed_bytes: int) -> None:
+        """새 인덱스 구성 전 확인: 현재 RSS + 필요량이 예산을 넘으면 거부"""
+        current = rss_bytes()
+        if current + needed_bytes > self.budget_bytes:
+            # 다시 채울 수 있는 캐시를 비워서라도 자리가 나는지 먼저 시도
+            for cache_name in self.rebuildable:
+                self.caches[cache_name].shrink(1.0)
+            current = rss_bytes()
+        if current + needed_bytes > self.budget_bytes:
+            self.refused_builds += 1
+            raise MemoryBudgetExceeded(
+                f"[{name}] 인덱스 구성 거부: 현재 {current / MB:.0f}MB + 필요 {needed_bytes / MB:.1f}MB"
+                f" > 예산 {self.budget_bytes / MB:.0f}MB"
+            )
+
+
+def memory_report(model, indexes: Dict[str, Any], budget: MemoryBudget, heap_top_n: Optional[int] = 10) -> Dict[str, Any]:
+    """
+    항목별 메모리 사용량 보고 (MB)
+    인덱스 구조 크기는 구성 때 기록한 값(CatalogIndex.measure), 캐시 크기와 RSS만 매번 계산
+    tracemalloc 스냅샷이 있으므로 이벤트 루프가 아닌 executor 스레드에서 호출
+    """
+    index_report = {}
+    for name, index in indexes.items():
+        index_report[name] = {
+            "embeddings_mb": round(index.embeddings_nbytes / MB, 3),
+            **{f"{part}_mb": round(size / MB, 3) for part, size in index.memory_sizes.items()},
+        }
+
+    cache_report = {}
+    for name, cache in budget.caches.items():
+        cache_report[name] = {**cache.stats(), "size_mb": round(cache.size_bytes() / MB, 3)}
+
+    rss = rss_bytes()
+    return {
+        "rss_mb": round(rss / MB, 1),
+        "budget_mb": round(budget.budget_bytes / MB, 1),
+        "budget_used_ratio": round(rss / budget.budget_bytes, 3) if budget.budget_bytes else None,
+        "model_weights_mb": round(model_bytes(model) / MB, 2),
+        "tokenizer_mb": round(tokenizer_bytes(model) / MB, 2) if model is not None else 0,
+        "indexes": index_report,
+        "caches": cache_report,
+        "python_heap": heap_report(heap_top_n) if heap_top_n else {"tracing": tracemalloc.is_tracing()},
+        "shrink_events": budget.shrink_events,
+        "refused_builds": budget.refused_builds,
+    }
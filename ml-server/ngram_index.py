@@ -0,0 +1,159 @@
+"""
+자모 n-gram 어휘 인덱스 (오타 허용 후보 생성)
+
+- 빌드 시 카탈로그 문자열을 한 번만 자모 분해하고, bigram → 행 번호 posting을
+  int32 배열로 저장
+- 쿼리는 요청당 한 번 분해 → 토큰별 q-gram 개수 필터 → 부분 문자열 편집 거리 검증
+- 결과는 행별 어휘 점수(0~1)로 기존 임베딩 점수에 합쳐진다 (matcher.py)
+- 필드가 여러 개면 (품목명 / 로마자 전사 / 한글 전사) 토큰마다 최고 점수 필드를 쓴다
+"""
+
+import re
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from jamo import decompose, substring_edit_distance
+
+NGRAM = 2
+# 토큰당 검증할 최대 후보 수 (q-gram 개수 상위)
+MAX_VERIFY = 200
+# 최종 반환 후보 수
+MAX_CANDIDATES = 50
+
+# 수량/단위 토큰은 매칭에서 제외 ("6병", "12btl")
+_QUANTITY = re.compile(r"^\d+(병|박스|cs|box|bt|btl|ea|pcs|case|케이스)?$", re.IGNORECASE)
+# 분해된 토큰의 한글 자모 여부 (호환 자모 범위)
+_JAMO = re.compile(r"[ㄱ-ㅣ]")
+
+
+def ngrams(text: str, n: int = NGRAM) -> List[str]:
+    if len(text) < n:
+        return [text] if text else []
+    return [text[i:i+n] for i in range(len(text) - n + 1)]
+
+
+def max_edits(length: int) -> int:
+    """토큰 자모 길이별 허용 편집 수 (2음절≈1회, 3음절≈2회, 최대 4회)"""
+    return min(4, max(1, length // 3))
+
+
+def query_tokens(query: str) -> List[str]:
+    """쿼리 → 자모 분해 토큰 (수량/너무 짧은 토큰 제외)"""
+    tokens = []
+    for raw in str(query).split():
+        if _QUANTITY.match(raw):
+            continue
+        token = decompose(raw)
+        if len(token) >= 3:
+            tokens.append(token)
+    return tokens
+
+
+def is_hangul_token(token: str) -> bool:
+    """분해된 토큰에 한글 자모가 있는지 (필드 선택용)"""
+    return bool(_JAMO.search(token))
+
+
+class NgramIndex:
+    """한 필드(예: 품목명)에 대한 자모 bigram 역색인"""
+
+    def __init__(self, texts: List[Optional[str]]):
+        # 행별 자모 문자열 (검증용, 빌드 시 1회 분해)
+        self.decomposed: List[str] = [decompose(text) if text else "" for text in texts]
+
+        building: Dict[str, array] = {}
+        for row, text in enumerate(self.decomposed):
+            for gram in set(ngrams(text)):
+                postings = building.get(gram)
+                if postings is None:
+                    postings = building[gram] = array("i")
+                postings.append(row)
+
+        # 빌드 후 numpy int32 배열로 고정 (bincount 입력으로 바로 사용)
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.frombuffer(postings, dtype=np.int32) for gram, postings in building.items()
+        }
+        self.size = len(self.decomposed)
+
+    @classmethod
+    def from_arrays(cls, decomposed: List[str], grams: List[str], offsets: np.ndarray, rows: np.ndarray) -> "NgramIndex":
+        """스냅샷(snapshot.py)에서 복원 - 분해/역색인 빌드 없이 posting은 rows 배열의 구간 뷰"""
+        index = cls.__new__(cls)
+        index.decomposed = decomposed
+        index.postings = {gram: rows[offsets[i]:offsets[i + 1]] for i, gram in enumerate(grams)}
+        index.size = len(decomposed)
+        return index
+
+    def to_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(gram 목록, posting 구간 offsets[int64], 이어 붙인 행 번호[int32])"""
+        grams = list(self.postings.keys())
+        lengths = np.fromiter((len(self.postings[gram]) for gram in grams), dtype=np.int64, count=len(grams))
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        rows = np.concatenate([self.postings[gram] for gram in grams]) if grams else np.zeros(0, dtype=np.int32)
+        return grams, offsets, rows.astype(np.int32, copy=False)
+
+    def token_matches(self, token: str, subset: Optional[np.ndarray] = None) -> Dict[int, float]:
+        """토큰 하나에 대해 편집 거리 허용 범위 안의 행 → 점수 (1 - 거리/길이)"""
+        grams = set(ngrams(token))
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return {}
+
+        counts = np.bincount(np.concatenate(lists), minlength=self.size)
+        if subset is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[subset] = True
+            counts[~mask] = 0
+
+        edits = max_edits(len(token))
+        # q-gram 보조정리: 편집 1회는 bigram 최대 2개를 깨뜨린다
+        threshold = max(1, len(grams) - NGRAM * edits)
+        candidates = np.flatnonzero(counts >= threshold)
+        if len(candidates) > MAX_VERIFY:
+            top = np.argpartition(-counts[candidates], MAX_VERIFY)[:MAX_VERIFY]
+            candidates = candidates[top]
+
+        matches = {}
+        for row in candidates.tolist():
+            distance = substring_edit_distance(token, self.decomposed[row])
+            if distance <= edits:
+                matches[row] = 1.0 - distance / len(token)
+        return matches
+
+    def search(self, tokens: List[str], subset: Optional[np.ndarray] = None) -> Dict[int, float]:
+        """분해된 쿼리 토큰 → 행별 어휘 점수 (토큰 점수 평균, 상위 MAX_CANDIDATES개)"""
+        if not self.size:
+            return {}
+        return search_fields([(token, (self,)) for token in tokens], subset)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "grams": len(self.postings),
+            "postings": int(sum(len(p) for p in self.postings.values())),
+        }
+
+
+def search_fields(token_fields: List[Tuple[str, Sequence[NgramIndex]]],
+                  subset: Optional[np.ndarray] = None) -> Dict[int, float]:
+    """
+    (토큰, 검색할 필드들) 목록 → 행별 어휘 점수
+    토큰마다 필드 중 최고 점수를 쓰고, 토큰 점수를 평균 (상위 MAX_CANDIDATES개)
+    """
+    if not token_fields:
+        return {}
+
+    totals: Dict[int, float] = {}
+    for token, fields in token_fields:
+        best: Dict[int, float] = {}
+        for field in fields:
+            for row, score in field.token_matches(token, subset).items():
+                if score > best.get(row, 0.0):
+                    best[row] = score
+        for row, score in best.items():
+            totals[row] = totals.get(row, 0.0) + score
+
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:MAX_CANDIDATES]
+    return {row: total / len(token_fields) for row, total in ranked}
@@ -0,0 +1,267 @@
+"""
+확정된 (거래처, 쿼리) → 품목 메모리 (인코더 앞 1차 조회)
+
+- 시작 시 client_new_items / item_alias / search_learning / ml_training_data 에서 로드,
+  이후 /api/feedback 으로 즉시 갱신
+- 키는 Node 쪽 normalizeForSearch와 같은 규칙으로 정규화한 쿼리의 64bit 해시,
+  값은 고정 폭 배열 슬롯 (품목 참조 id / 마지막 확정 시각 / 확정 횟수)
+- 확정 횟수는 반감기(ML_QUERY_MEMORY_HALF_LIFE_DAYS)로 감쇠하고,
+  TTL(ML_QUERY_MEMORY_TTL_DAYS)이 지난 항목은 조회 시 만료
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from memory_stats import deep_sizeof
+
+MEMORY_METHOD = "memory"
+# 거래처 구분 없는 항목
+ANY_CLIENT = "*"
+
+DAY = 86400.0
+TTL_DAYS = float(os.environ.get("ML_QUERY_MEMORY_TTL_DAYS", "365"))
+HALF_LIFE_DAYS = float(os.environ.get("ML_QUERY_MEMORY_HALF_LIFE_DAYS", "90"))
+
+_QUOTES = re.compile(r"[\"'`]")
+_QTY_UNIT = re.compile(r"\b(\d+)\s*(병|박스|cs|box|bt|btl|ea|pcs|case|케이스)\b", re.IGNORECASE)
+_NUMBER = re.compile(r"\b(\d+)\b")
+_PUNCT = re.compile(r"[()\-_/.,:;|\\\[\]{}<>!?~@#$%^&*=+]")
+_SPACE = re.compile(r"\s+")
+
+# (출처, SQL) - 행: (client_code, query, 품목 참조, 횟수, 시각). 없는 테이블은 건너뜀
+MEMORY_SOURCES: List[Tuple[str, str]] = [
+    ("client_new_items", """
+        SELECT client_code, input_name, item_no, 1, learned_at
+        FROM client_new_items
+        WHERE input_name IS NOT NULL AND item_no IS NOT NULL
+    """),
+    # canonical은 품목번호 또는 품목명 (조회 시 인덱스에서 해석)
+    ("item_alias", """
+        SELECT client_code, alias, canonical, count, last_used_at
+        FROM item_alias
+        WHERE alias IS NOT NULL AND canonical IS NOT NULL
+    """),
+    # 로컬 로그형 search_learning
+    ("search_learning", """
+        SELECT client_code, search_query, matched_item_no, 1, created_at
+        FROM search_learning
+        WHERE search_query IS NOT NULL AND matched_item_no IS NOT NULL
+    """),
+    # Supabase 누적형 search_learning (search_key는 이미 정규화된 키)
+    ("search_learning", """
+        SELECT NULL, search_key, item_no, hit_count, last_used_at
+        FROM search_learning
+        WHERE search_key IS NOT NULL AND item_no IS NOT NULL
+    """),
+    ("ml_training_data", """
+        SELECT client_code, query, selected_item_no, 1, created_at
+        FROM ml_training_data
+        WHERE query IS NOT NULL AND selected_item_no IS NOT NULL
+    """),
+]
+
+
+def normalize_query(raw: Optional[str]) -> str:
+    """app/lib/searchLearning.ts normalizeForSearch 포팅 (따옴표/수량/숫자/기호/공백 제거 + 소문자)"""
+    s = str(raw or "").replace("\r", "").replace("\t", " ")
+    s = _QUOTES.sub("", s)
+    s = _QTY_UNIT.sub(" ", s)
+    s = _NUMBER.sub(" ", s)
+    s = _PUNCT.sub(" ", s)
+    return _SPACE.sub("", s.lower())
+
+
+def _hash_key(client_code: Optional[str], key: str) -> int:
+    digest = hashlib.blake2b(f"{client_code or ANY_CLIENT}\x1f{key}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _parse_time(value: Any) -> float:
+    """DB 시각 문자열 → epoch 초 (파싱 불가면 지금)"""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(text.replace(" ", "T", 1)).timestamp()
+    except ValueError:
+        return time.time()
+
+
+class QueryMemory:
+    """(client_code, 정규화 쿼리) → 확정 품목 참조"""
+
+    def __init__(self, ttl_days: float = TTL_DAYS, half_life_days: float = HALF_LIFE_DAYS):
+        self.ttl = ttl_days * DAY
+        self.half_life = half_life_days * DAY
+        # 해시 → 슬롯 번호
+        self._slots: Dict[int, int] = {}
+        # 슬롯별 고정 폭 배열
+        self._refs = array("i")        # 품목 참조 id (_ref_names 인덱스)
+        self._updated = array("d")     # 마지막 확정 시각 (epoch)
+        self._weights = array("f")     # 마지막 확정 시점 기준 감쇠 가중치
+        # 품목 참조 문자열 intern (품목번호 / 별칭 canonical)
+        self._ref_ids: Dict[str, int] = {}
+        self._ref_names: List[str] = []
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.expired = 0
+        self.loaded: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _decayed(self, slot: int, now: float) -> float:
+        age = max(0.0, now - self._updated[slot])
+        return self._weights[slot] * 0.5 ** (age / self.half_life)
+
+    def _record(self, key_hash: int, ref: str, count: float, at: float) -> None:
+        ref_id = self._ref_ids.get(ref)
+        if ref_id is None:
+            ref_id = self._ref_ids[ref] = len(self._ref_names)
+            self._ref_names.append(ref)
+
+        slot = self._slots.get(key_hash)
+        if slot is None:
+            self._slots[key_hash] = len(self._refs)
+            self._refs.append(ref_id)
+            self._updated.append(at)
+            self._weights.append(count)
+            return
+
+        current = self._decayed(slot, at)
+        if self._refs[slot] == ref_id:
+            self._weights[slot] = current + count
+            self._updated[slot] = max(self._updated[slot], at)
+        elif at >= self._updated[slot] or count >= current:
+            # 다른 품목이 더 최근에 (또는 더 많이) 확정되면 교체
+            self._refs[slot] = ref_id
+            self._weights[slot] = count
+            self._updated[slot] = at
+
+    def remember(self, client_code: Optional[str], query: str, ref: str,
+                 count: float = 1.0, at: Optional[float] = None) -> bool:
+        key = normalize_query(query)
+        if not key or not ref:
+            return False
+        with self._lock:
+            self._record(_hash_key(client_code, key), str(ref).strip(), float(count or 1), at or time.time())
+        return True
+
+    def _get(self, client_code: Optional[str], key: str, now: float) -> Optional[str]:
+        slot = self._slots.get(_hash_key(client_code, key))
+        if slot is None:
+            return None
+        if now - self._updated[slot] > self.ttl:
+            self.expired += 1
+            return None
+        return self._ref_names[self._refs[slot]]
+
+    def lookup(self, client_code: Optional[str], query: str) -> Optional[str]:
+        """거래처 항목 우선, 없으면 거래처 무관 항목 (만료 항목 제외)"""
+        key = normalize_query(query)
+        if not key:
+            return None
+        now = time.time()
+        ref = self._get(client_code, key, now) if client_code else None
+        if ref is None:
+            ref = self._get(None, key, now)
+        return ref
+
+    def record_lookup(self, hit: bool) -> None:
+        """적중률 집계 (인덱스에서 품목 해석까지 성공해야 적중)"""
+        self.lookups += 1
+        if hit:
+            self.hits += 1
+
+    def load(self, conn: sqlite3.Connection) -> int:
+        """확정 이력 테이블들에서 메모리 구성 (없는 테이블/컬럼은 건너뜀)"""
+        total = 0
+        now = time.time()
+        for source, sql in MEMORY_SOURCES:
+            try:
+                rows: Iterable[tuple] = conn.execute(sql)
+                count = 0
+                for client_code, query, ref, hits, at in rows:
+                    when = _parse_time(at)
+                    if now - when > self.ttl:
+                        continue
+                    client = None if client_code in (None, "", ANY_CLIENT) else str(client_code)
+                    # search_key는 이미 정규화된 값이지만 같은 규칙을 다시 적용해도 결과가 같다
+                    if self.remember(client, str(query), str(ref), hits or 1, when):
+                        count += 1
+            except sqlite3.OperationalError:
+                continue
+            self.loaded[source] = self.loaded.get(source, 0) + count
+            total += count
+        return total
+
+    def to_arrays(self) -> Tuple[List[int], array, array, array, List[str]]:
+        """스냅샷용 (슬롯 순서 해시 키, 참조 id, 시각, 가중치, 참조 문자열)"""
+        with self._lock:
+            self._compact()
+            keys = [key_hash for key_hash, _ in sorted(self._slots.items(), key=lambda kv: kv[1])]
+            return keys, array("i", self._refs), array("d", self._updated), array("f", self._weights), list(self._ref_names)
+
+    def restore(self, keys: Iterable[int], refs: bytes, updated: bytes, weights: bytes, ref_names: List[str]) -> int:
+        """스냅샷에서 복원 (DB 조회 없이) - 기존 내용은 버림"""
+        with self._lock:
+            self._slots = {key_hash: slot for slot, key_hash in enumerate(keys)}
+            self._refs, self._updated, self._weights = array("i"), array("d"), array("f")
+            self._refs.frombytes(refs)
+            self._updated.frombytes(updated)
+            self._weights.frombytes(weights)
+            self._ref_names = list(ref_names)
+            self._ref_ids = {ref: ref_id for ref_id, ref in enumerate(self._ref_names)}
+            self.loaded = {"snapshot": len(self._slots)}
+        return len(self._slots)
+
+    def size_bytes(self) -> int:
+        # 해시 키 dict + 슬롯 배열 + 참조 문자열
+        return (deep_sizeof(self._slots) + deep_sizeof(self._ref_ids) + deep_sizeof(self._ref_names)
+                + self._refs.itemsize * len(self._refs) + self._updated.itemsize * len(self._updated)
+                + self._weights.itemsize * len(self._weights))
+
+    def shrink(self, fraction: float) -> None:
+        """메모리 압박 시: 감쇠 가중치가 낮은 항목부터 fraction만큼 제거"""
+        with self._lock:
+            drop = int(len(self._slots) * fraction)
+            if drop <= 0:
+                return
+            now = time.time()
+            ranked = sorted(self._slots.items(), key=lambda kv: self._decayed(kv[1], now))
+            for key_hash, _ in ranked[:drop]:
+                del self._slots[key_hash]
+            self._compact()
+
+    def _compact(self) -> None:
+        refs, updated, weights = array("i"), array("d"), array("f")
+        for key_hash, slot in list(self._slots.items()):
+            self._slots[key_hash] = len(refs)
+            refs.append(self._refs[slot])
+            updated.append(self._updated[slot])
+            weights.append(self._weights[slot])
+        self._refs, self._updated, self._weights = refs, updated, weights
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._slots),
+            "item_refs": len(self._ref_names),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "expired": self.expired,
+            "loaded": dict(self.loaded),
+            "ttl_days": self.ttl / DAY,
+            "half_life_days": self.half_life / DAY,
+        }
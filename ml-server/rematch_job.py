@@ -0,0 +1,284 @@
+"""
+과거 거래 품목명 일괄 재매칭 (오프라인 정확도 측정)
+
+shipments / client_item_stats 의 (item_name, item_no) 를 청크 단위로 읽어
+프로세스 풀에서 대용량 배치로 인코딩하고, 메인 프로세스에서 카탈로그 인덱스로 검색한다.
+결과는 ml_rematch_results 테이블에, top-1 품목번호가 기록과 다른 행은 CSV 리포트로 남긴다.
+
+- 읽기는 fetchmany 청크, 인코딩 작업은 동시에 workers*2 배치까지만 띄워서 메모리 상한 유지
+- 워커는 시작 시 모델을 한 번 로드 (워커당 모델 메모리 ≈ 0.5GB)
+
+사용법:
+    python rematch_job.py --source both --workers 4 --report rematch_mismatches.csv
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from catalog_index import CatalogIndex, DATA_TYPES, load_index
+from db import Database
+from matcher import search_queries
+from memory_stats import MB, rss_bytes
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# 출처별 (품목명, 기록된 품목번호, 건수) - GROUP BY 결과를 커서로 스트리밍
+SOURCE_QUERIES = {
+    "shipments": """
+        SELECT item_name, item_no, COUNT(*)
+        FROM shipments
+        WHERE item_name IS NOT NULL AND TRIM(item_name) != ''
+        GROUP BY item_name, item_no
+    """,
+    "client_item_stats": """
+        SELECT item_name, item_no, SUM(buy_count)
+        FROM client_item_stats
+        WHERE item_name IS NOT NULL AND TRIM(item_name) != ''
+        GROUP BY item_name, item_no
+    """,
+}
+
+RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ml_rematch_results (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  run_id TEXT NOT NULL,
+  source TEXT NOT NULL,
+  item_name TEXT NOT NULL,
+  recorded_item_no TEXT,
+  occurrences INTEGER,
+  matched_item_no TEXT,
+  matched_item_name TEXT,
+  score REAL,
+  recorded_rank INTEGER,              -- 기록된 품목의 순위 (1부터, top_k 안에 없으면 NULL)
+  is_match INTEGER NOT NULL,          -- top-1 품목번호 == 기록된 품목번호
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+)
+"""
+RESULTS_INDEX = "CREATE INDEX IF NOT EXISTS idx_ml_rematch_run ON ml_rematch_results(run_id, is_match)"
+
+INSERT_RESULT = """
+INSERT INTO ml_rematch_results
+  (run_id, source, item_name, recorded_item_no, occurrences, matched_item_no, matched_item_name,
+   score, recorded_rank, is_match)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+REPORT_HEADER = ["source", "item_name", "recorded_item_no", "occurrences", "matched_item_no",
+                 "matched_item_name", "score", "recorded_rank"]
+
+# ==================== 워커 프로세스 ====================
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    """워커 시작 시 모델 1회 로드 (프로세스 간 CPU 경쟁을 피하려고 스레드 수 제한)"""
+    global _worker_model
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode(names: List[str], batch_size: int) -> np.ndarray:
+    return _worker_model.encode(names, batch_size=batch_size, convert_to_numpy=True).astype(np.float32)
+
+
+# ==================== 메인 프로세스 ====================
+
+def stream_names(conn: sqlite3.Connection, sources: List[str], chunk_size: int,
+                 limit: Optional[int]) -> Iterator[List[Tuple[str, str, Optional[str], int]]]:
+    """(source, item_name, item_no, 건수) 청크 스트림"""
+    emitted = 0
+    for source in sources:
+        cursor = conn.execute(SOURCE_QUERIES[source])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if limit is not None:
+                rows = rows[:max(0, limit - emitted)]
+            if rows:
+                yield [(source, name.strip(), item_no, int(count or 0)) for name, item_no, count in rows]
+                emitted += len(rows)
+            if limit is not None and emitted >= limit:
+                return
+
+
+def batched(chunks: Iterator[List[tuple]], size: int) -> Iterator[List[tuple]]:
+    """청크 스트림 → 인코딩 배치 (size개씩)"""
+    buffer: List[tuple] = []
+    for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= size:
+            yield buffer[:size]
+            buffer = buffer[size:]
+    if buffer:
+        yield buffer
+
+
+class RematchStats:
+    def __init__(self):
+        self.rows = 0
+        self.weighted = 0
+        self.top1 = 0
+        self.top1_weighted = 0
+        self.in_top_k = 0
+        self.no_result = 0
+        self.started = time.perf_counter()
+        self.peak_rss = rss_bytes()
+
+    def summary(self) -> Dict[str, float]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "top1_accuracy": round(self.top1 / self.rows, 4) if self.rows else 0.0,
+            "top1_accuracy_weighted": round(self.top1_weighted / self.weighted, 4) if self.weighted else 0.0,
+            "recorded_in_top_k": round(self.in_top_k / self.rows, 4) if self.rows else 0.0,
+            "no_result": self.no_result,
+            "elapsed_sec": round(elapsed, 1),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "peak_rss_mb": round(self.peak_rss / MB, 1),
+        }
+
+
+def process_batch(index: CatalogIndex, batch: List[tuple], embeddings: np.ndarray, args, run_id: str,
+                  writer_db: Database, report: Optional[csv.writer], stats: RematchStats) -> None:
+    names = [name for _, name, _, _ in batch]
+    query_embeddings = torch.from_numpy(embeddings)
+    hits_list = search_queries(index, names, query_embeddings, args.top_k, args.min_score)
+
+    rows = []
+    for (source, name, recorded, count), hits in zip(batch, hits_list):
+        matched = [str(index.items[row]["item_no"]) for row in hits["rows"]]
+        top_no = matched[0] if matched else None
+        top_name = index.items[hits["rows"][0]]["item_name"] if matched else None
+        top_score = hits["scores"][0] if matched else None
+        recorded = str(recorded) if recorded is not None else None
+        rank = matched.index(recorded) + 1 if recorded in matched else None
+        is_match = int(top_no is not None and top_no == recorded)
+
+        stats.rows += 1
+        stats.weighted += count
+        stats.top1 += is_match
+        stats.top1_weighted += count * is_match
+        stats.in_top_k += rank is not None
+        stats.no_result += top_no is None
+
+        rows.append((run_id, source, name, recorded, count, top_no, top_name, top_score, rank, is_match))
+        if not is_match and report is not None:
+            report.writerow([source, name, recorded, count, top_no, top_name,
+                             round(top_score, 4) if top_score is not None else "", rank or ""])
+
+    # 배치마다 한 트랜잭션
+    with writer_db.write() as conn:
+        conn.executemany(INSERT_RESULT, rows)
+    stats.peak_rss = max(stats.peak_rss, rss_bytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="과거 거래 품목명 일괄 재매칭")
+    parser.add_argument("--db", default=os.environ.get("DB_PATH") or os.path.join(os.path.dirname(__file__), "..", "data.sqlite3"))
+    parser.add_argument("--source", choices=["shipments", "client_item_stats", "both"], default="both")
+    parser.add_argument("--data-type", choices=DATA_TYPES, default="wine")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="인코딩 프로세스 수 (0이면 메인 프로세스에서 인코딩)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="DB에서 한 번에 읽을 행 수")
+    parser.add_argument("--batch-size", type=int, default=512, help="워커에 넘기는 인코딩 배치 크기")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--min-score", type=float, default=0.0)
+    parser.add_argument("--limit", type=int, default=None, help="처리할 최대 행 수 (테스트용)")
+    parser.add_argument("--report", default="rematch_mismatches.csv", help="불일치 CSV 경로 (빈 값이면 생략)")
+    args = parser.parse_args()
+
+    sources = ["shipments", "client_item_stats"] if args.source == "both" else [args.source]
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    db = Database(args.db, pool_size=1)
+
+    print(f"📦 모델 로딩: {args.model}")
+    model = SentenceTransformer(args.model)
+    with db.read() as conn:
+        index = load_index(conn, args.data_type)
+    if not index.items:
+        print(f"❌ [{args.data_type}] 카탈로그가 비어 있습니다")
+        return
+    print(f"🧠 [{args.data_type}] 카탈로그 {len(index)}개 임베딩 생성 중...")
+    index.encode(model)
+
+    with db.write() as conn:
+        conn.execute(RESULTS_SCHEMA)
+        conn.execute(RESULTS_INDEX)
+
+    report_file = open(args.report, "w", newline="", encoding="utf-8-sig") if args.report else None
+    report = csv.writer(report_file) if report_file else None
+    if report:
+        report.writerow(REPORT_HEADER)
+
+    stats = RematchStats()
+    print(f"🚀 재매칭 시작 (run_id={run_id}, sources={sources}, workers={args.workers})")
+
+    # 읽기 커넥션은 스트리밍 동안 계속 쓰므로 풀에서 빌려 둔다
+    with db.read() as read_conn:
+        batches = batched(stream_names(read_conn, sources, args.chunk_size, args.limit), args.batch_size)
+
+        if args.workers <= 0:
+            for batch in batches:
+                embeddings = model.encode([b[1] for b in batch], batch_size=args.batch_size,
+                                          convert_to_numpy=True).astype(np.float32)
+                process_batch(index, batch, embeddings, args, run_id, db, report, stats)
+                print(f"   … {stats.rows}행 처리")
+        else:
+            threads = max(1, (os.cpu_count() or 2) // args.workers)
+            executor = ProcessPoolExecutor(
+                max_workers=args.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(args.model, threads),
+            )
+            in_flight: Dict[Future, List[tuple]] = {}
+            max_in_flight = args.workers * 2
+            try:
+                exhausted = False
+                while not exhausted or in_flight:
+                    # 동시에 띄우는 배치 수 제한 → 읽기/인코딩 결과가 메모리에 쌓이지 않음
+                    while not exhausted and len(in_flight) < max_in_flight:
+                        batch = next(batches, None)
+                        if batch is None:
+                            exhausted = True
+                            break
+                        in_flight[executor.submit(_encode, [b[1] for b in batch], args.batch_size)] = batch
+                    if not in_flight:
+                        break
+                    done, _ = wait(set(in_flight), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = in_flight.pop(future)
+                        process_batch(index, batch, future.result(), args, run_id, db, report, stats)
+                    print(f"   … {stats.rows}행 처리")
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    if report_file:
+        report_file.close()
+    db.close()
+
+    summary = stats.summary()
+    print("=" * 60)
+    print(f"✅ 재매칭 완료 (run_id={run_id})")
+    for key, value in summary.items():
+        print(f"   {key}: {value}")
+    if args.report:
+        print(f"   불일치 리포트: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+크로스 인코더 재순위 (bi-encoder 상위 후보만)
+
+ML_RERANK_MODEL 을 지정하면 bi-encoder 1·2위 점수 차가 ML_RERANK_MARGIN 미만인 쿼리만
+상위 ML_RERANK_TOP_N 후보를 (쿼리, 품목명) 쌍으로 크로스 인코더에 넣어 다시 정렬한다.
+- 요청 안의 모든 쿼리 쌍을 모아 predict 한 번 (배치)
+- 쌍 점수는 (데이터 타입, 정규화 쿼리, item_no) 키로 캐시 → 반복 쿼리는 모델 호출 없음
+  (정규화는 소문자 + 공백 정리만 - 숫자를 지우면 빈티지만 다른 쿼리가 점수를 공유)
+- 요청당 쌍 수 상한(ML_RERANK_MAX_PAIRS)으로 비용을 묶고, 요청별 소요 시간을 집계
+최종 점수 = (1 - ML_RERANK_WEIGHT) × bi-encoder 점수 + ML_RERANK_WEIGHT × sigmoid(크로스 인코더 logit)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from catalog_index import CatalogIndex
+from memory_stats import deep_sizeof
+from query_memory import MEMORY_METHOD
+
+RERANK_MODEL = os.environ.get("ML_RERANK_MODEL", "").strip()
+TOP_N = int(os.environ.get("ML_RERANK_TOP_N", "10"))
+MARGIN = float(os.environ.get("ML_RERANK_MARGIN", "0.05"))
+WEIGHT = float(os.environ.get("ML_RERANK_WEIGHT", "0.5"))
+MAX_PAIRS = int(os.environ.get("ML_RERANK_MAX_PAIRS", "256"))
+CACHE_SIZE = int(os.environ.get("ML_RERANK_CACHE_SIZE", "50000"))
+BATCH_SIZE = 32
+RERANK_METHOD = "pytorch_rerank"
+# 요청별 지연 시간 보관 개수
+LATENCY_WINDOW = 1000
+
+
+# (데이터 타입, 정규화 쿼리, item_no) - item_no는 데이터 타입마다 따로 매겨짐
+PairKey = Tuple[str, str, str]
+
+
+def pair_query(query: str) -> str:
+    """캐시 키용 쿼리 정규화: 소문자 + 공백 정리 (숫자는 유지 - '샤블리 2018'과 '샤블리 2019'는 다른 키)"""
+    return " ".join(str(query or "").lower().split())
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[position], 2)
+
+
+class PairScoreCache:
+    """(데이터 타입, 정규화 쿼리, item_no) → 크로스 인코더 점수(0~1) LRU 캐시"""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[PairKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[PairKey]) -> List[Optional[float]]:
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, items: List[Tuple[PairKey, float]]) -> None:
+        with self._lock:
+            for key, score in items:
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def shrink(self, fraction: float) -> None:
+        """메모리 압박 시 오래된 항목부터 fraction 비율만큼 제거"""
+        with self._lock:
+            for _ in range(int(len(self._entries) * fraction)):
+                self._entries.popitem(last=False)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return deep_sizeof(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class Reranker:
+    """크로스 인코더 + 쌍 점수 캐시 + 요청별 지연 시간 집계"""
+
+    def __init__(self, model_name: str, top_n: int = TOP_N, margin: float = MARGIN, weight: float = WEIGHT,
+                 max_pairs: int = MAX_PAIRS):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.margin = margin
+        self.weight = weight
+        self.max_pairs = max_pairs
+        self.model = None
+        self.cache = PairScoreCache()
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.considered = 0
+        self.reranked = 0
+        self.skipped_margin = 0
+        self.skipped_budget = 0
+        self.pairs_scored = 0
+        self.top1_changed = 0
+        self.request_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> None:
+        from sentence_transformers import CrossEncoder
+
+        print(f"📦 [rerank] 크로스 인코더 로딩: {self.model_name}")
+        self.model = CrossEncoder(self.model_name)
+        print(f"✅ [rerank] 로드 완료 (top_n={self.top_n}, margin={self.margin})")
+
+    def candidate_k(self, top_k: int) -> int:
+        """재순위 후보를 확보하려면 bi-encoder 단계에서 top_n까지 뽑아야 함"""
+        return max(top_k, self.top_n) if self.ready else top_k
+
+    def needs_rerank(self, hits: Dict[str, Any]) -> bool:
+        scores = hits["scores"]
+        return (hits["method"] != MEMORY_METHOD and len(scores) >= 2
+                and scores[0] - scores[1] < self.margin)
+
+    def rerank(self, index: CatalogIndex, queries: List[str], hits_list: List[Dict[str, Any]],
+               top_k: int, min_score: float) -> Optional[float]:
+        """
+        점수 차가 작은 쿼리만 재정렬 후 모든 hits를 top_k로 자름 (제자리 수정)
+        반환: 재순위 소요 ms (재순위한 쿼리가 없으면 None)
+        """
+        if not self.ready:
+            return None
+        started = time.perf_counter()
+
+        # 요청 안의 재순위 대상 쌍 수집 (쌍 수 상한까지)
+        targets: List[Tuple[int, List[PairKey]]] = []
+        budget = self.max_pairs
+        for position, (query, hits) in enumerate(zip(queries, hits_list)):
+            if not self.needs_rerank(hits):
+                if hits["method"] != MEMORY_METHOD and len(hits["scores"]) >= 2:
+                    self.skipped_margin += 1
+                continue
+            rows = hits["rows"][:self.top_n]
+            if len(rows) > budget:
+                self.skipped_budget += 1
+                continue
+            budget -= len(rows)
+            key = pair_query(query)
+            targets.append((position, [(index.name, key, str(index.items[row]["item_no"])) for row in rows]))
+        self.considered += len(queries)
+
+        if targets:
+            self._apply(index, queries, hits_list, targets, min_score)
+
+        for hits in hits_list:
+            for field in ("rows", "scores", "groups"):
+                if field in hits:
+                    hits[field] = hits[field][:top_k]
+
+        if not targets:
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.requests += 1
+            self.reranked += len(targets)
+            self.request_ms.append(elapsed_ms)
+        return elapsed_ms
+
+    def _apply(self, index: CatalogIndex, queries: List[str], hits_list: List[Dict[str, Any]],
+               targets: List[Tuple[int, List[PairKey]]], min_score: float) -> None:
+        keys = [key for _, pair_keys in targets for key in pair_keys]
+        cached = self.cache.get_many(keys)
+
+        # 캐시에 없는 쌍만 한 번에 predict
+        missing = [i for i, score in enumerate(cached) if score is None]
+        if missing:
+            texts = []
+            offset = 0
+            for position, pair_keys in targets:
+                for j, _ in enumerate(pair_keys):
+                    if cached[offset + j] is None:
+                        row = hits_list[position]["rows"][j]
+                        texts.append((queries[position], index.items[row]["item_name"]))
+                offset += len(pair_keys)
+            logits = self.model.predict(texts, batch_size=BATCH_SIZE, show_progress_bar=False)
+            fresh = [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits]
+            for i, score in zip(missing, fresh):
+                cached[i] = score
+            self.cache.put_many([(keys[i], score) for i, score in zip(missing, fresh)])
+            self.pairs_scored += len(missing)
+
+        offset = 0
+        for position, pair_keys in targets:
+            hits = hits_list[position]
+            n = len(pair_keys)
+            blended = [
+                (1 - self.weight) * bi + self.weight * ce
+                for bi, ce in zip(hits["scores"][:n], cached[offset:offset + n])
+            ]
+            offset += n
+            order = sorted(range(n), key=lambda j: blended[j], reverse=True)
+            order = [j for j in order if blended[j] >= min_score]
+            if order and order[0] != 0:
+                self.top1_changed += 1
+            hits["rows"] = [hits["rows"][j] for j in order]
+            hits["scores"] = [blended[j] for j in order]
+            if "groups" in hits:
+                hits["groups"] = [hits["groups"][j] for j in order]
+            hits["method"] = RERANK_METHOD
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            request_ms = list(self.request_ms)
+        return {
+            "enabled": True,
+            "model": self.model_name,
+            "ready": self.ready,
+            "top_n": self.top_n,
+            "margin": self.margin,
+            "weight": self.weight,
+            "max_pairs": self.max_pairs,
+            "queries_considered": self.considered,
+            "queries_reranked": self.reranked,
+            "skipped_margin": self.skipped_margin,
+            "skipped_budget": self.skipped_budget,
+            "pairs_scored": self.pairs_scored,
+            "top1_changed": self.top1_changed,
+            "requests": self.requests,
+            "latency_ms_per_request": {
+                "p50": _percentile(request_ms, 0.5),
+                "p95": _percentile(request_ms, 0.95),
+                "max": round(max(request_ms), 2) if request_ms else None,
+            },
+            "cache": self.cache.stats(),
+        }
+
+
+def create_reranker() -> Optional[Reranker]:
+    """ML_RERANK_MODEL 이 있으면 재순위기 생성 (모델은 startup에서 로드)"""
+    if not RERANK_MODEL:
+        return None
+    return Reranker(RERANK_MODEL)
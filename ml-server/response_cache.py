@@ -0,0 +1,105 @@
+"""
+카탈로그 버전 기반 응답 캐시 (LRU + ETag)
+
+같은 (정규화된 요청, 카탈로그 버전) 조합은 항상 같은 응답을 만들므로
+검색 결과(hits)를 캐시하고, ETag가 일치하면 304로 응답한다.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from memory_stats import deep_sizeof
+
+
+def normalize_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """캐시 키용 요청 정규화 (공백 정리, 빈 값 통일)"""
+    normalized = dict(payload)
+    query = normalized.get("query")
+    if isinstance(query, str):
+        normalized["query"] = " ".join(query.split())
+    client_code = normalized.get("client_code")
+    if isinstance(client_code, str):
+        normalized["client_code"] = client_code.strip() or None
+    return normalized
+
+
+def make_cache_key(payload: Dict[str, Any]) -> str:
+    """정규화된 요청 → 고정 길이 해시 키"""
+    raw = json.dumps(normalize_request(payload), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def make_etag(cache_key: str, catalog_version: int, variant: Optional[str] = None) -> str:
+    """
+    요청 키 + 카탈로그 버전 → ETag (응답 계산 없이 만들 수 있음)
+    variant: 응답 표현(media type)이 다르면 ETag도 달라야 함
+    """
+    if variant:
+        cache_key = hashlib.sha1(f"{cache_key}|{variant}".encode("utf-8")).hexdigest()
+    return f'"v{catalog_version}-{cache_key[:16]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 헤더에 현재 ETag가 포함되어 있는지 확인"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # 약한 비교 (W/ 접두사 무시)
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache:
+    """(요청 키, 카탈로그 버전) → 응답 payload LRU 캐시"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cache_key: str, catalog_version: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get((cache_key, catalog_version))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((cache_key, catalog_version))
+            self.hits += 1
+            return entry
+
+    def put(self, cache_key: str, catalog_version: int, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[(cache_key, catalog_version)] = payload
+            self._entries.move_to_end((cache_key, catalog_version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def shrink(self, fraction: float) -> None:
+        """메모리 압박 시 오래된 항목부터 fraction 비율만큼 제거"""
+        with self._lock:
+            for _ in range(int(len(self._entries) * fraction)):
+                self._entries.popitem(last=False)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return deep_sizeof(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,199 @@
+"""
+섀도 평가 모드 (보조 모델 + 인덱스를 나란히 실행)
+
+ML_SHADOW_MODEL 을 지정하면 보조 모델로 데이터 타입별 인덱스를 따로 만들고,
+실제 요청 중 ML_SHADOW_SAMPLE_RATE 비율만 전용 스레드에서 다시 검색해
+주 모델 결과와의 순위 일치도 / 지연 시간을 집계한다.
+주 응답은 섀도 결과를 기다리지 않는다 (큐가 차면 샘플을 버림).
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
+
+from catalog_index import CatalogIndex, DATA_TYPES, load_index
+from db import Database
+from matcher import search_queries
+from memory_stats import MB, MemoryBudget, MemoryBudgetExceeded, model_bytes, tensor_bytes
+
+SHADOW_MODEL = os.environ.get("ML_SHADOW_MODEL", "").strip()
+SAMPLE_RATE = float(os.environ.get("ML_SHADOW_SAMPLE_RATE", "0.1"))
+# 처리 대기 중인 섀도 작업 상한 (넘으면 샘플 버림)
+MAX_PENDING = int(os.environ.get("ML_SHADOW_MAX_PENDING", "32"))
+# 지연 시간 / 불일치 사례 보관 개수
+LATENCY_WINDOW = 1000
+DISAGREEMENT_LOG = 50
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[position], 2)
+
+
+class ShadowEvaluator:
+    """보조 모델 인덱스 + 샘플 요청 비교 집계"""
+
+    def __init__(self, model_name: str, sample_rate: float = SAMPLE_RATE, max_pending: int = MAX_PENDING):
+        self.model_name = model_name
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.model = None
+        self.indexes: Dict[str, CatalogIndex] = {}
+        # 섀도 작업 전용 스레드 (기본 executor를 점유하지 않도록)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.sampled = 0
+        self.compared = 0
+        self.dropped = 0
+        self.errors = 0
+        self.top1_agree = 0
+        self.overlap_sum = 0.0
+        # 주 모델 1위가 섀도 결과에서 몇 위였는지 (없으면 top_k)
+        self.rank_shift_sum = 0
+        self.primary_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.shadow_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.disagreements: Deque[Dict[str, Any]] = deque(maxlen=DISAGREEMENT_LOG)
+        self.last_error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None and any(index.ready for index in self.indexes.values())
+
+    def load(self, db: Database, budget: MemoryBudget) -> None:
+        """보조 모델 로드 + 데이터 타입별 인덱스 구성 (섀도 스레드에서 실행)"""
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+
+            print(f"📦 [shadow] 모델 로딩: {self.model_name}")
+            self.model = SentenceTransformer(self.model_name)
+
+        new_indexes: Dict[str, CatalogIndex] = {}
+        with db.read() as conn:
+            for data_type in DATA_TYPES:
+                new_indexes[data_type] = load_index(conn, data_type)
+
+        dim = self.model.get_sentence_embedding_dimension() or 384
+        for data_type, index in new_indexes.items():
+            if not index.items:
+                continue
+            try:
+                budget.ensure_room(f"shadow:{data_type}", len(index) * dim * 4)
+                index.encode(self.model)
+            except MemoryBudgetExceeded as e:
+                print(f"❌ {e}")
+        self.indexes = new_indexes
+        print(f"✅ [shadow] 인덱스 준비 완료: {', '.join(f'{k}={len(v)}' for k, v in new_indexes.items())}")
+
+    def schedule_load(self, db: Database, budget: MemoryBudget) -> None:
+        """주 서버 시작/리로드를 막지 않도록 섀도 스레드에서 로드"""
+        def run():
+            try:
+                self.load(db, budget)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"❌ [shadow] 로드 실패: {e}")
+        self._executor.submit(run)
+
+    def mirror(self, data_type: str, queries: List[str], primary_item_nos: List[List[str]],
+               primary_ms: float, top_k: int, min_score: float, collapse: bool = False) -> bool:
+        """샘플링된 요청을 섀도 스레드로 넘김 (즉시 반환)"""
+        if not self.ready or not queries or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += 1
+        self.sampled += 1
+        self._executor.submit(self._evaluate, data_type, queries, primary_item_nos, primary_ms, top_k, min_score, collapse)
+        return True
+
+    def _evaluate(self, data_type: str, queries: List[str], primary_item_nos: List[List[str]],
+                  primary_ms: float, top_k: int, min_score: float, collapse: bool) -> None:
+        try:
+            index = self.indexes.get(data_type)
+            if index is None or not index.ready:
+                return
+            started = time.perf_counter()
+            embeddings = self.model.encode(queries, convert_to_tensor=True)
+            hits_list = search_queries(index, queries, embeddings, top_k, min_score, collapse=collapse)
+            shadow_ms = (time.perf_counter() - started) * 1000
+
+            with self._lock:
+                self.primary_ms.append(primary_ms / len(queries))
+                self.shadow_ms.append(shadow_ms / len(queries))
+                for query, primary, hits in zip(queries, primary_item_nos, hits_list):
+                    shadow = [str(index.items[row]["item_no"]) for row in hits["rows"]]
+                    self._compare(query, primary, shadow, top_k)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _compare(self, query: str, primary: List[str], shadow: List[str], top_k: int) -> None:
+        self.compared += 1
+        if primary[:1] == shadow[:1]:
+            self.top1_agree += 1
+        elif primary or shadow:
+            self.disagreements.append({"query": query, "primary": primary[:3], "shadow": shadow[:3]})
+        union = set(primary) | set(shadow)
+        self.overlap_sum += len(set(primary) & set(shadow)) / len(union) if union else 1.0
+        if primary:
+            self.rank_shift_sum += shadow.index(primary[0]) if primary[0] in shadow else top_k
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            compared = self.compared
+            primary_ms = list(self.primary_ms)
+            shadow_ms = list(self.shadow_ms)
+            return {
+                "enabled": True,
+                "model": self.model_name,
+                "ready": self.ready,
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "compared_queries": compared,
+                "dropped": self.dropped,
+                "pending": self._pending,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "agreement": {
+                    "top1": round(self.top1_agree / compared, 4) if compared else None,
+                    "overlap_at_k": round(self.overlap_sum / compared, 4) if compared else None,
+                    "mean_rank_shift": round(self.rank_shift_sum / compared, 3) if compared else None,
+                },
+                "latency_ms_per_query": {
+                    "primary_p50": _percentile(primary_ms, 0.5),
+                    "primary_p95": _percentile(primary_ms, 0.95),
+                    "shadow_p50": _percentile(shadow_ms, 0.5),
+                    "shadow_p95": _percentile(shadow_ms, 0.95),
+                },
+                "memory_mb": {
+                    "model_weights": round(model_bytes(self.model) / MB, 2),
+                    "embeddings": round(sum(tensor_bytes(i.embeddings) for i in self.indexes.values()) / MB, 3),
+                },
+                "indexes": {name: len(index) for name, index in self.indexes.items()},
+                "recent_disagreements": list(self.disagreements),
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_shadow() -> Optional[ShadowEvaluator]:
+    """ML_SHADOW_MODEL 이 있으면 섀도 평가기 생성"""
+    if not SHADOW_MODEL:
+        return None
+    return ShadowEvaluator(SHADOW_MODEL)
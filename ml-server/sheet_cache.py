@@ -0,0 +1,394 @@
+"""
+워크북 시트 Parquet 캐시 (선택: pyarrow)
+
+xlsx 파싱이 동기화에서 가장 느린 단계인데 워크북은 실행 사이에 거의 바뀌지 않는다.
+시트를 처음 읽을 때 행을 BATCH_ROWS행씩 Parquet 파트 파일로 저장하고(워크북 sha256 키), 다음 실행부터는 Parquet만 읽는다.
+- 한 열에 문자열/정수/실수/날짜가 섞일 수 있으므로 열마다 값 종류별 하위 열(c{i}.str, c{i}.int ...)로 나눠 저장
+  → 읽으면 openpyxl iter_rows(values_only=True)와 같은 값/타입으로 복원
+- read_rows: 행 튜플 제너레이터 (load_data.py / ingest_workbook.py)
+  캐시 미스면 openpyxl read-only 스트리밍 행을 넘겨주면서 파트를 하나씩 기록, 적중이면 파트를 배치 단위로 읽음
+  → 어느 쪽이든 시트 전체를 메모리에 올리지 않음
+- read_frame: pandas DataFrame, pd.read_excel(usecols=..., header=0)과 같은 dtype (import_client_excel.py의 벡터화 경로)
+캐시 디렉터리 이름에 워크북 경로 태그가 들어가므로 서로 다른 워크북의 캐시는 서로 지우지 않는다.
+pyarrow가 없거나 ML_SHEET_CACHE=0 이면 매번 openpyxl / pd.read_excel로 읽는다.
+"""
+
+import hashlib
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import openpyxl
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+CACHE_DIR = os.environ.get("ML_SHEET_CACHE_DIR") or os.path.join(os.path.dirname(__file__), "..", ".sheet_cache")
+CACHE_ENABLED = os.environ.get("ML_SHEET_CACHE", "1") != "0"
+# 저장 형식이 바뀌면 올림 (이전 캐시 파일은 키가 달라져 다시 만들어짐)
+FORMAT_VERSION = 2
+READ_CHUNK = 1024 * 1024
+# 파트 파일 하나 / 읽기 배치 하나의 행 수 (메모리 상한)
+BATCH_ROWS = int(os.environ.get("ML_SHEET_CACHE_BATCH_ROWS", "10000"))
+
+# 값 종류 → Arrow 타입 (bool은 int보다 먼저 검사)
+_KINDS: Tuple[Tuple[str, type], ...] = (("bool", bool), ("int", int), ("float", float), ("datetime", datetime), ("str", str))
+
+# (경로, 크기, mtime_ns) → sha256 (같은 프로세스에서 여러 시트를 읽을 때 한 번만 해시)
+_workbook_keys: Dict[Tuple[str, int, int], str] = {}
+
+
+class _Uncacheable(Exception):
+    """Parquet로 그대로 옮길 수 없는 셀 값 (시간/기간 등) → 캐시 없이 읽음"""
+
+
+def available() -> bool:
+    return pa is not None and CACHE_ENABLED
+
+
+def workbook_key(xlsx_path: str) -> str:
+    stat = os.stat(xlsx_path)
+    memo = (os.path.abspath(xlsx_path), stat.st_size, stat.st_mtime_ns)
+    if memo not in _workbook_keys:
+        digest = hashlib.sha256()
+        with open(xlsx_path, "rb") as f:
+            for block in iter(lambda: f.read(READ_CHUNK), b""):
+                digest.update(block)
+        _workbook_keys[memo] = digest.hexdigest()
+    return _workbook_keys[memo]
+
+
+def _cache_prefix(xlsx_path: str, sheet_name: str) -> str:
+    """시트 + 워크북 경로 태그 (같은 접두어의 다른 버전만 정리 대상)"""
+    path_tag = hashlib.sha1(os.path.abspath(xlsx_path).encode("utf-8")).hexdigest()[:8]
+    return f"{sheet_name.lower()}-{path_tag}-v{FORMAT_VERSION}-"
+
+
+def _cache_path(xlsx_path: str, sheet_name: str) -> str:
+    """캐시 디렉터리 (파트 파일 part-00000.parquet ...)"""
+    return os.path.join(CACHE_DIR, _cache_prefix(xlsx_path, sheet_name) + workbook_key(xlsx_path)[:16])
+
+
+def _kind(value: Any) -> str:
+    for kind, kind_type in _KINDS:
+        if isinstance(value, kind_type):
+            return kind
+    raise _Uncacheable(type(value).__name__)
+
+
+def _to_table(rows: List[Tuple]) -> "pa.Table":
+    """행 목록 → 열별·종류별 하위 열 테이블 (행 수/열 수는 스키마 메타데이터)"""
+    width = max((len(row) for row in rows), default=0)
+    arrays = []
+    names = []
+    for col in range(width):
+        by_kind: Dict[str, List[Any]] = {}
+        for position, row in enumerate(rows):
+            value = row[col] if col < len(row) else None
+            if value is None:
+                continue
+            kind = _kind(value)
+            if kind not in by_kind:
+                by_kind[kind] = [None] * len(rows)
+            by_kind[kind][position] = value
+        for kind, values in by_kind.items():
+            try:
+                arrays.append(pa.array(values, type=pa.timestamp("us") if kind == "datetime" else None))
+            except (pa.ArrowInvalid, OverflowError) as e:
+                raise _Uncacheable(str(e))
+            names.append(f"c{col}.{kind}")
+    metadata = {"rows": str(len(rows)), "width": str(width), "version": str(FORMAT_VERSION)}
+    return pa.Table.from_arrays(arrays, names=names, metadata=metadata)
+
+
+def _columns(table: "pa.Table") -> Dict[int, List[str]]:
+    """열 번호 → 하위 열 이름"""
+    columns: Dict[int, List[str]] = {}
+    for name in table.column_names:
+        col = int(name[1:name.index(".")])
+        columns.setdefault(col, []).append(name)
+    return columns
+
+
+def _from_table(table: "pa.Table", width: int) -> List[Tuple]:
+    """하위 열 테이블(또는 배치) → width 폭 행 튜플"""
+    n = table.num_rows
+    subcolumns = _columns(table)
+    values = []
+    for col in range(width):
+        merged: List[Any] = [None] * n
+        for name in subcolumns.get(col, []):
+            for position, value in enumerate(table.column(name).to_pylist()):
+                if value is not None:
+                    merged[position] = value
+        values.append(merged)
+    return list(zip(*values)) if values else [() for _ in range(n)]
+
+
+def _fit(row: Tuple, width: Optional[int]) -> Tuple:
+    if width is None:
+        return row
+    return tuple(row[:width]) + (None,) * (width - len(row[:width]))
+
+
+def _open_sheet(xlsx_path: str, sheet_name: str):
+    """openpyxl read-only 워크북 + 시트 (시트명 대소문자 무시, 없으면 시트 None)"""
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    name = next((name for name in wb.sheetnames if name.lower() == sheet_name.lower()), None)
+    return wb, (wb[name] if name else None)
+
+
+def _trimmed_rows(ws) -> Iterator[Tuple]:
+    """iter_rows(values_only=True) 스트리밍, 끝의 빈 행 제거 (pd.read_excel과 같음 - 빈 행은 다음 값 있는 행이 나올 때까지 보류)"""
+    pending: List[Tuple] = []
+    for row in ws.iter_rows(values_only=True):
+        row = tuple(row)
+        if all(value is None for value in row):
+            pending.append(row)
+            continue
+        if pending:
+            yield from pending
+            pending = []
+        yield row
+
+
+def _write_through(xlsx_path: str, sheet_name: str, wb, ws) -> Iterator[Tuple]:
+    """
+    캐시 미스: 워크북 행을 그대로 넘겨주면서 BATCH_ROWS행마다 파트 파일 기록
+    끝까지 읽으면 임시 디렉터리를 캐시 디렉터리로 교체, 중간에 멈추거나 옮길 수 없는 셀이 있으면 임시 파일 삭제
+    """
+    path = _cache_path(xlsx_path, sheet_name)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    caching = True
+    completed = False
+    batch: List[Tuple] = []
+    parts = 0
+
+    def flush() -> None:
+        nonlocal caching, parts
+        if not caching or not batch:
+            return
+        try:
+            table = _to_table(batch)
+        except _Uncacheable as e:
+            print(f"⚠️ [{ws.title}] Parquet로 옮길 수 없는 셀 ({e}) → 캐시 없이 읽음")
+            caching = False
+            return
+        pq.write_table(table, os.path.join(tmp_path, f"part-{parts:05d}.parquet"))
+        parts += 1
+
+    try:
+        for row in _trimmed_rows(ws):
+            batch.append(row)
+            yield row
+            if len(batch) >= BATCH_ROWS:
+                flush()
+                batch = []
+        flush()
+        completed = True
+    finally:
+        wb.close()
+        if completed and caching:
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                # 다른 프로세스가 같은 캐시를 먼저 만들었음 → 그쪽 사용
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            _remove_old_versions(xlsx_path, sheet_name, path)
+        else:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _remove_old_versions(xlsx_path: str, sheet_name: str, keep: str) -> None:
+    """같은 워크북 경로 + 시트의 이전 내용 캐시만 정리 (다른 워크북의 캐시는 유지)"""
+    prefix = _cache_prefix(xlsx_path, sheet_name)
+    # 형식 1의 단일 파일 캐시 ({sheet}-v1-{key}.parquet)는 더 이상 읽지 않음
+    legacy = f"{sheet_name.lower()}-v1-"
+    for old in os.listdir(CACHE_DIR):
+        old_path = os.path.join(CACHE_DIR, old)
+        if old.startswith(legacy) and old.endswith(".parquet"):
+            os.remove(old_path)
+        elif old.startswith(prefix) and ".tmp-" not in old and old_path != keep:
+            shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _part_files(path: str) -> List[str]:
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet"))
+
+
+def _cached_rows(path: str) -> Iterator[Tuple]:
+    """캐시 적중: 파트 파일을 BATCH_ROWS행 배치로 읽어 행 튜플로 (파트 폭은 메타데이터)"""
+    for part in _part_files(path):
+        parquet = pq.ParquetFile(part)
+        metadata = parquet.schema_arrow.metadata or {}
+        width = int(metadata.get(b"width", 0))
+        for batch in parquet.iter_batches(batch_size=BATCH_ROWS):
+            yield from _from_table(pa.Table.from_batches([batch]), width)
+
+
+def _cache_hit(xlsx_path: str, sheet_name: str) -> Optional[str]:
+    path = _cache_path(xlsx_path, sheet_name)
+    return path if os.path.isdir(path) else None
+
+
+def read_rows(xlsx_path: str, sheet_name: str, min_row: int = 1,
+              max_col: Optional[int] = None) -> Optional[Iterator[Tuple]]:
+    """
+    시트 행 제너레이터 (iter_rows(min_row, max_col, values_only=True)와 같은 값, 짧은 행은 None으로 채움)
+    시트가 없으면 None. 시트명은 대소문자 무시
+    """
+    path = _cache_hit(xlsx_path, sheet_name) if available() else None
+    if path is not None:
+        rows = _cached_rows(path)
+        source = "hit"
+    else:
+        wb, ws = _open_sheet(xlsx_path, sheet_name)
+        if ws is None:
+            wb.close()
+            return None
+        if available():
+            rows = _write_through(xlsx_path, sheet_name, wb, ws)
+            source = "miss"
+        else:
+            rows = _closing_rows(wb, _trimmed_rows(ws))
+            source = "direct"
+    return _reported(sheet_name, source, _sliced(rows, min_row, max_col))
+
+
+def _closing_rows(wb, rows: Iterator[Tuple]) -> Iterator[Tuple]:
+    try:
+        yield from rows
+    finally:
+        wb.close()
+
+
+def _sliced(rows: Iterator[Tuple], min_row: int, max_col: Optional[int]) -> Iterator[Tuple]:
+    for number, row in enumerate(rows, start=1):
+        if number >= min_row:
+            yield _fit(row, max_col)
+
+
+def _reported(sheet_name: str, source: str, rows: Iterator[Tuple]) -> Iterator[Tuple]:
+    started = time.perf_counter()
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        rows.close()
+    if source != "direct":
+        _report(sheet_name, source, count, started)
+
+
+def _load_table(xlsx_path: str, sheet_name: str) -> Tuple[Optional["pa.Table"], str]:
+    """
+    캐시 파트를 합친 테이블 (없으면 워크북을 스트리밍하며 파트 저장 후 읽음)
+    반환: (테이블, 출처 "hit" / "miss" / "uncacheable" / "missing")
+    """
+    source = "hit"
+    path = _cache_hit(xlsx_path, sheet_name)
+    if path is None:
+        wb, ws = _open_sheet(xlsx_path, sheet_name)
+        if ws is None:
+            wb.close()
+            return None, "missing"
+        for _ in _write_through(xlsx_path, sheet_name, wb, ws):
+            pass
+        path = _cache_hit(xlsx_path, sheet_name)
+        if path is None:
+            return None, "uncacheable"
+        source = "miss"
+
+    try:
+        tables = [pq.read_table(part) for part in _part_files(path)]
+    except (OSError, pa.ArrowInvalid) as e:
+        print(f"⚠️ 시트 캐시 손상 ({e}) → 캐시 없이 읽음: {path}")
+        shutil.rmtree(path, ignore_errors=True)
+        return None, "uncacheable"
+    if not tables:
+        return pa.table({}), source
+    width = max(int((t.schema.metadata or {}).get(b"width", 0)) for t in tables)
+    table = pa.concat_tables(tables, promote_options="default") if len(tables) > 1 else tables[0]
+    table = table.replace_schema_metadata({"rows": str(table.num_rows), "width": str(width)})
+    return table, source
+
+
+def read_frame(xlsx_path: str, sheet_name: str, usecols: Sequence[int]):
+    """
+    pd.read_excel(sheet_name=..., usecols=usecols, header=0)과 같은 DataFrame
+    캐시가 있으면 Arrow → pandas 열 단위 변환 (셀 단위 Python 처리 없음)
+    """
+    import numpy as np
+    import pandas as pd
+
+    started = time.perf_counter()
+    if not available():
+        return pd.read_excel(xlsx_path, sheet_name=sheet_name, usecols=list(usecols), engine="openpyxl")
+
+    table, source = _load_table(xlsx_path, sheet_name)
+    if source == "missing":
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    if table is None:
+        return pd.read_excel(xlsx_path, sheet_name=sheet_name, usecols=list(usecols), engine="openpyxl")
+
+    width = int(table.schema.metadata.get(b"width", 0)) if table.schema.metadata else 0
+    header = _from_table(table.slice(0, 1), width)
+    header = header[0] if header else ()
+    body = table.slice(1)
+    subcolumns = _columns(body)
+    # 중복 헤더는 read_excel처럼 usecols 적용 전 전체 열 기준으로 .1, .2 ...
+    all_labels: List[str] = []
+    for col in range(max(width, max(usecols, default=-1) + 1)):
+        label = str(header[col]) if col < len(header) and header[col] is not None else f"Unnamed: {col}"
+        base, suffix = label, 1
+        while label in all_labels:
+            label = f"{base}.{suffix}"
+            suffix += 1
+        all_labels.append(label)
+    labels = [all_labels[col] for col in usecols]
+    data = []
+    for col in usecols:
+        # 헤더 행에만 있던 종류(보통 str)는 제외
+        names = [name for name in subcolumns.get(col, []) if body.column(name).null_count < body.num_rows]
+        kinds = {name.split(".", 1)[1] for name in names}
+        if not names:
+            # 빈 열
+            series = pd.Series([np.nan] * body.num_rows, dtype=float)
+        elif kinds <= {"int", "float"} and len(kinds) == 2:
+            # 정수 + 실수 → float64 (read_excel과 같음)
+            series = pd.Series(np.nan, index=range(body.num_rows), dtype=float)
+            for name in names:
+                part = body.column(name).to_pandas().astype(float)
+                series = series.where(part.isna(), part)
+        elif len(names) == 1:
+            # 한 종류만 있는 열: pandas 기본 dtype (정수/불리언 + 빈칸 → float64, 날짜 → datetime64, 문자열 + NaN)
+            series = body.column(names[0]).to_pandas()
+            if kinds == {"bool"} and series.isna().any():
+                series = series.astype(float)
+            elif series.dtype == object:
+                series = series.where(series.notna(), np.nan)
+        else:
+            # 문자열/숫자/날짜가 섞인 열: object로 병합
+            series = pd.Series([np.nan] * body.num_rows, dtype=object)
+            for name in names:
+                part = pd.Series(body.column(name).to_pylist(), dtype=object)
+                series = series.where(part.isna(), part)
+        data.append(series.reset_index(drop=True))
+    frame = pd.concat(data, axis=1) if data else pd.DataFrame()
+    frame.columns = labels
+    _report(sheet_name, source, len(frame), started)
+    return frame
+
+
+def _report(sheet_name: str, source: str, rows: int, started: float) -> None:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    label = "캐시 적중" if source == "hit" else "파싱 후 캐시 저장"
+    print(f"📦 [{sheet_name}] 시트 {label}: {rows}행 ({elapsed_ms:.1f}ms)")
@@ -0,0 +1,312 @@
+"""
+단일 파일 인덱스 스냅샷 (빠른 서버 시작용)
+
+build_snapshot.py가 오프라인에서 만들고, 서버는 시작 시 mmap으로 열어 검증 후
+SQLite 조회 / 품목명 파싱 / 임베딩 인코딩 / 자모 역색인 빌드 없이 인덱스를 복원한다.
+
+파일 구조 (little-endian):
+    [헤더 64B] magic(8) | 형식 버전 u32 | 예약 u32 | manifest 위치 u64 | manifest 길이 u64 | manifest sha256(32)
+    [섹션들]   ALIGN(64B) 경계마다 원시 배열 (numpy dtype 그대로)
+    [manifest] JSON: 모델, 생성 시각, 데이터 타입별 메타, 섹션별 {offset, nbytes, dtype, shape, sha256}
+
+섹션 (데이터 타입 wine / glass / riedel 별 접두사):
+- items/<컬럼>: 품목 메타데이터 컬럼형 (문자열은 offsets + utf-8 data, 정수/실수는 값 배열 + valid 마스크)
+- embeddings: 행 정규화된 float32 임베딩 행렬
+- <jamo|romanized|hangulized>/…: 자모 분해 문자열 + gram 목록 + posting(int32)
+- clients/…: 거래처별 (행 번호, 구매 횟수), clusters/…: 중복 군집 (행 → 대표 행)
+- query_memory/…: 쿼리 메모리 (해시 키, 품목 참조, 시각, 가중치)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from catalog_index import CatalogIndex
+from ngram_index import NgramIndex
+from query_memory import QueryMemory
+
+MAGIC = b"ORDAISNP"
+FORMAT_VERSION = 1
+ALIGN = 64
+_HEADER = struct.Struct("<8sIIQQ32s")
+HEADER_SIZE = ALIGN
+
+
+class SnapshotError(Exception):
+    """스냅샷 파일이 없거나 손상/비호환"""
+
+
+def _encode_strings(values: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """문자열 목록 → (offsets int64, utf-8 data uint8, valid uint8)"""
+    encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    valid = np.fromiter((value is not None for value in values), dtype=np.uint8, count=len(values))
+    return offsets, data, valid
+
+
+def _column_kind(values: List[Any]) -> str:
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return "int"
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return "float"
+    return "str"
+
+
+class SnapshotWriter:
+    """섹션 배열을 모아 한 파일로 기록 (임시 파일 → rename)"""
+
+    def __init__(self):
+        self._sections: List[Tuple[str, np.ndarray]] = []
+        self.meta: Dict[str, Any] = {}
+
+    def add(self, name: str, array: np.ndarray) -> None:
+        self._sections.append((name, np.ascontiguousarray(array)))
+
+    def add_strings(self, name: str, values: List[Optional[str]]) -> None:
+        offsets, data, valid = _encode_strings(values)
+        self.add(f"{name}/offsets", offsets)
+        self.add(f"{name}/data", data)
+        self.add(f"{name}/valid", valid)
+
+    def add_column(self, name: str, values: List[Any]) -> str:
+        """품목 컬럼 하나 (값 타입별 저장) → 컬럼 종류"""
+        kind = _column_kind(values)
+        if kind == "str":
+            self.add_strings(name, [None if value is None else str(value) for value in values])
+            return kind
+        dtype = np.int64 if kind == "int" else np.float64
+        self.add(f"{name}/values", np.array([0 if value is None else value for value in values], dtype=dtype))
+        self.add(f"{name}/valid", np.fromiter((value is not None for value in values), dtype=np.uint8, count=len(values)))
+        return kind
+
+    def write(self, path: str) -> Dict[str, Any]:
+        sections: Dict[str, Dict[str, Any]] = {}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+            for name, array in self._sections:
+                offset = f.tell()
+                padding = -offset % ALIGN
+                f.write(b"\0" * padding)
+                offset += padding
+                content = array.tobytes()
+                f.write(content)
+                sections[name] = {
+                    "offset": offset,
+                    "nbytes": len(content),
+                    "dtype": array.dtype.str,
+                    "shape": list(array.shape),
+                    "sha256": hashlib.sha256(content).hexdigest(),
+                }
+            manifest = dict(self.meta, format_version=FORMAT_VERSION, sections=sections)
+            manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+            manifest_offset = f.tell()
+            f.write(manifest_bytes)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, manifest_offset, len(manifest_bytes),
+                                 hashlib.sha256(manifest_bytes).digest()))
+        os.replace(tmp_path, path)
+        return manifest
+
+
+class Snapshot:
+    """mmap으로 연 스냅샷 (배열은 파일 페이지를 그대로 가리키는 뷰)"""
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                # ACCESS_COPY: 쓰기 가능한 뷰(torch 경고 없음)지만 파일에는 반영되지 않고, 건드리지 않은 페이지는 공유
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"스냅샷을 열 수 없습니다: {path} ({e})")
+
+        if len(self._mm) < HEADER_SIZE:
+            raise SnapshotError("스냅샷 헤더가 잘렸습니다")
+        magic, version, _, manifest_offset, manifest_length, manifest_sha = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError("스냅샷 파일이 아닙니다 (magic 불일치)")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"스냅샷 형식 버전 {version} 은 지원하지 않습니다 (현재 {FORMAT_VERSION})")
+        manifest_bytes = self._mm[manifest_offset:manifest_offset + manifest_length]
+        if hashlib.sha256(manifest_bytes).digest() != manifest_sha:
+            raise SnapshotError("manifest 체크섬 불일치")
+        self.manifest: Dict[str, Any] = json.loads(manifest_bytes.decode("utf-8"))
+        self.sections: Dict[str, Dict[str, Any]] = self.manifest["sections"]
+
+        if verify:
+            for name, section in self.sections.items():
+                start = section["offset"]
+                if hashlib.sha256(memoryview(self._mm)[start:start + section["nbytes"]]).hexdigest() != section["sha256"]:
+                    raise SnapshotError(f"섹션 체크섬 불일치: {name}")
+
+    def has(self, name: str) -> bool:
+        return name in self.sections
+
+    def array(self, name: str) -> np.ndarray:
+        section = self.sections.get(name)
+        if section is None:
+            raise SnapshotError(f"섹션 없음: {name}")
+        dtype = np.dtype(section["dtype"])
+        count = section["nbytes"] // dtype.itemsize
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=section["offset"]).reshape(section["shape"])
+
+    def strings(self, name: str) -> List[Optional[str]]:
+        offsets = self.array(f"{name}/offsets").tolist()
+        data = self.array(f"{name}/data").tobytes()
+        valid = self.array(f"{name}/valid").tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") if valid[i] else None for i in range(len(valid))]
+
+    def column(self, name: str, kind: str) -> List[Any]:
+        if kind == "str":
+            return self.strings(name)
+        values = self.array(f"{name}/values").tolist()
+        valid = self.array(f"{name}/valid").tolist()
+        return [value if present else None for value, present in zip(values, valid)]
+
+
+# ==================== 인덱스 ↔ 섹션 ====================
+
+def write_index(writer: SnapshotWriter, index: CatalogIndex) -> Dict[str, Any]:
+    """카탈로그 인덱스 하나 → 섹션들, 반환값은 manifest의 데이터 타입 메타"""
+    import torch
+
+    prefix = index.name
+    columns: List[str] = []
+    for item in index.items:
+        for column in item:
+            if column not in columns:
+                columns.append(column)
+    kinds = {column: writer.add_column(f"{prefix}/items/{column}", [item.get(column) for item in index.items])
+             for column in columns}
+
+    dim = 0
+    if index.embeddings is not None:
+        embeddings = torch.nn.functional.normalize(index.embeddings.float(), dim=1)
+        writer.add(f"{prefix}/embeddings", embeddings.detach().cpu().numpy().astype("<f4"))
+        dim = int(embeddings.shape[1])
+
+    for field in CatalogIndex.NGRAM_FIELDS:
+        ngram: NgramIndex = getattr(index, field)
+        grams, offsets, rows = ngram.to_arrays()
+        writer.add_strings(f"{prefix}/{field}/decomposed", ngram.decomposed)
+        writer.add_strings(f"{prefix}/{field}/grams", grams)
+        writer.add(f"{prefix}/{field}/offsets", offsets)
+        writer.add(f"{prefix}/{field}/rows", rows)
+
+    clients = list(index.client_rows.keys())
+    client_offsets = np.zeros(len(clients) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(index.client_rows[c]) for c in clients), dtype=np.int64, count=len(clients)),
+              out=client_offsets[1:])
+    writer.add_strings(f"{prefix}/clients/codes", clients)
+    writer.add(f"{prefix}/clients/offsets", client_offsets)
+    writer.add(f"{prefix}/clients/rows", np.array([r for c in clients for r in index.client_rows[c]], dtype=np.int32))
+    writer.add(f"{prefix}/clients/counts", np.array([n for c in clients for n in index.client_rows[c].values()], dtype=np.int32))
+
+    writer.add(f"{prefix}/clusters/rows", np.array(list(index.cluster_of.keys()), dtype=np.int32))
+    writer.add(f"{prefix}/clusters/canonical", np.array(list(index.cluster_of.values()), dtype=np.int32))
+
+    return {"items": len(index.items), "dim": dim, "columns": kinds}
+
+
+def read_index(snapshot: Snapshot, name: str) -> CatalogIndex:
+    """
+    섹션들 → 카탈로그 인덱스 (임베딩은 mmap 뷰, 자모 인덱스는 빌드 없이 복원)
+    torch는 import하지 않음 - 임베딩 텐서와 패밀리 centroid는 모델 로드 후 첫 검색(워밍업)에서 만들어짐
+    """
+    meta = snapshot.manifest["data_types"][name]
+    prefix = name
+    columns = {column: snapshot.column(f"{prefix}/items/{column}", kind) for column, kind in meta["columns"].items()}
+    items = [
+        {column: values[row] for column, values in columns.items()}
+        for row in range(meta["items"])
+    ]
+
+    ngram_fields = {
+        field: NgramIndex.from_arrays(
+            snapshot.strings(f"{prefix}/{field}/decomposed"),
+            snapshot.strings(f"{prefix}/{field}/grams"),
+            snapshot.array(f"{prefix}/{field}/offsets"),
+            snapshot.array(f"{prefix}/{field}/rows"),
+        )
+        for field in CatalogIndex.NGRAM_FIELDS
+    }
+    index = CatalogIndex(name, items, ngram_fields=ngram_fields)
+
+    codes = snapshot.strings(f"{prefix}/clients/codes")
+    offsets = snapshot.array(f"{prefix}/clients/offsets").tolist()
+    rows = snapshot.array(f"{prefix}/clients/rows").tolist()
+    counts = snapshot.array(f"{prefix}/clients/counts").tolist()
+    index.client_rows = {
+        code: dict(zip(rows[offsets[i]:offsets[i + 1]], counts[offsets[i]:offsets[i + 1]]))
+        for i, code in enumerate(codes)
+    }
+    index.cluster_of = dict(zip(snapshot.array(f"{prefix}/clusters/rows").tolist(),
+                                snapshot.array(f"{prefix}/clusters/canonical").tolist()))
+
+    if meta["items"]:
+        index.snapshot_embeddings = snapshot.array(f"{prefix}/embeddings")
+        index.normalized = True
+    index.measure()
+    return index
+
+
+def write_query_memory(writer: SnapshotWriter, memory: QueryMemory) -> int:
+    keys, refs, updated, weights, ref_names = memory.to_arrays()
+    writer.add("query_memory/keys", np.array(keys, dtype=np.int64))
+    writer.add("query_memory/refs", np.frombuffer(refs.tobytes(), dtype=np.int32))
+    writer.add("query_memory/updated", np.frombuffer(updated.tobytes(), dtype=np.float64))
+    writer.add("query_memory/weights", np.frombuffer(weights.tobytes(), dtype=np.float32))
+    writer.add_strings("query_memory/ref_names", ref_names)
+    return len(keys)
+
+
+def read_query_memory(snapshot: Snapshot, memory: QueryMemory) -> int:
+    if not snapshot.has("query_memory/keys"):
+        return 0
+    return memory.restore(
+        snapshot.array("query_memory/keys").tolist(),
+        snapshot.array("query_memory/refs").tobytes(),
+        snapshot.array("query_memory/updated").tobytes(),
+        snapshot.array("query_memory/weights").tobytes(),
+        snapshot.strings("query_memory/ref_names"),
+    )
+
+
+def load_snapshot(path: str, model_name: str, dim: Optional[int], memory: Optional[QueryMemory] = None,
+                  verify: bool = True) -> Tuple[Dict[str, CatalogIndex], Dict[str, Any]]:
+    """스냅샷 → (데이터 타입별 인덱스, 요약). 모델/차원이 다르면 SnapshotError"""
+    started = time.perf_counter()
+    snapshot = Snapshot(path, verify=verify)
+    manifest = snapshot.manifest
+    if manifest.get("model") != model_name:
+        raise SnapshotError(f"스냅샷 모델({manifest.get('model')})이 서버 모델({model_name})과 다릅니다")
+    verified_ms = (time.perf_counter() - started) * 1000
+
+    indexes: Dict[str, CatalogIndex] = {}
+    for name, meta in manifest["data_types"].items():
+        if dim and meta["items"] and meta["dim"] != dim:
+            raise SnapshotError(f"[{name}] 임베딩 차원 {meta['dim']} ≠ 모델 차원 {dim}")
+        indexes[name] = read_index(snapshot, name)
+
+    remembered = read_query_memory(snapshot, memory) if memory is not None else 0
+    return indexes, {
+        "path": path,
+        "built_at": manifest.get("built_at"),
+        "source_db": manifest.get("source_db"),
+        "bytes": os.path.getsize(path),
+        "verified": verify,
+        "verify_ms": round(verified_ms, 1),
+        "load_ms": round((time.perf_counter() - started) * 1000, 1),
+        "query_memory": remembered,
+        "items": {name: len(index) for name, index in indexes.items()},
+    }
@@ -0,0 +1,71 @@
+"""
+서버 시작 타임라인 (단계별 소요 시간 + 목표 예산)
+
+main.py가 가장 먼저 import 하므로 PROCESS_START는 main 모듈 import 시작 시각에 가깝다.
+단계: import → http(헬스체크 응답 가능) → snapshot → torch_import → model_load → index_load → warm_up → ready
+예산(ML_STARTUP_BUDGET_MS)은 ready까지, HTTP 예산(ML_STARTUP_HTTP_BUDGET_MS)은 http까지의 목표.
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+PROCESS_START = time.perf_counter()
+
+BUDGET_MS = float(os.environ.get("ML_STARTUP_BUDGET_MS", "15000"))
+HTTP_BUDGET_MS = float(os.environ.get("ML_STARTUP_HTTP_BUDGET_MS", "1000"))
+
+
+class StartupTimeline:
+    def __init__(self, budget_ms: float = BUDGET_MS, http_budget_ms: float = HTTP_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.http_budget_ms = http_budget_ms
+        # (단계, 시작 후 누적 ms)
+        self.marks: List[Tuple[str, float]] = []
+        self.error: Optional[str] = None
+
+    def mark(self, phase: str) -> float:
+        elapsed = (time.perf_counter() - PROCESS_START) * 1000
+        self.marks.append((phase, elapsed))
+        return elapsed
+
+    def at(self, phase: str) -> Optional[float]:
+        for name, elapsed in self.marks:
+            if name == phase:
+                return elapsed
+        return None
+
+    @property
+    def ready(self) -> bool:
+        return self.at("ready") is not None
+
+    def phases(self) -> List[Dict[str, Any]]:
+        """단계별 소요 ms (직전 단계 이후) + 누적 ms"""
+        result = []
+        previous = 0.0
+        for name, elapsed in self.marks:
+            result.append({"phase": name, "ms": round(elapsed - previous, 1), "at_ms": round(elapsed, 1)})
+            previous = elapsed
+        return result
+
+    def report(self) -> None:
+        print("⏱️ 시작 타임라인")
+        for phase in self.phases():
+            print(f"   {phase['phase']:<13} +{phase['ms']:>9.1f}ms  (누적 {phase['at_ms']:.1f}ms)")
+        http_ms, ready_ms = self.at("http"), self.at("ready")
+        if http_ms is not None and http_ms > self.http_budget_ms:
+            print(f"⚠️ HTTP 준비 {http_ms:.0f}ms > 예산 {self.http_budget_ms:.0f}ms")
+        if ready_ms is not None:
+            status = "✅" if ready_ms <= self.budget_ms else "⚠️"
+            print(f"{status} 준비 완료 {ready_ms:.0f}ms (예산 {self.budget_ms:.0f}ms)")
+
+    def stats(self) -> Dict[str, Any]:
+        ready_ms = self.at("ready")
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "budget_ms": self.budget_ms,
+            "http_budget_ms": self.http_budget_ms,
+            "within_budget": ready_ms <= self.budget_ms if ready_ms is not None else None,
+            "phases": self.phases(),
+        }
@@ -0,0 +1,52 @@
+"""
+카탈로그 동기화 manifest (load_data.py --sync → ml-server 증분 재임베딩)
+
+load_data.py --sync 가 ml_items를 행 해시로 비교해 바뀐 행만 반영한 뒤,
+워크북 지문(mtime/size/sha256), 추가/수정/삭제 건수와 바뀐 item_no 목록을 JSON으로 남긴다.
+ml-server는 POST /api/reload/incremental 에서 이 파일을 읽어 바뀐 품목만 다시 인코딩한다.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+MANIFEST_PATH = os.environ.get("ML_SYNC_MANIFEST") or os.path.join(os.path.dirname(__file__), "..", "ml_sync_manifest.json")
+READ_CHUNK = 1024 * 1024
+
+
+def file_fingerprint(path: str) -> Dict[str, Any]:
+    """파일 mtime / 크기 / sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(block)
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "mtime": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(timespec="seconds"),
+        "size": stat.st_size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+def write_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    """임시 파일에 쓴 뒤 교체 (서버가 반쯤 쓴 파일을 읽지 않도록)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(path: str = MANIFEST_PATH) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def changed_item_nos(manifest: Dict[str, Any]) -> Set[str]:
+    """다시 인코딩해야 하는 품목 (추가 + 수정, 삭제된 품목은 인덱스에서 빠지기만 함)"""
+    changed = manifest.get("changed", {})
+    return set(changed.get("inserted", [])) | set(changed.get("updated", []))
@@ -0,0 +1,206 @@
+"""
+한글 ↔ 라틴 문자 전사 (외래어 와인 용어 기준의 근사 규칙)
+
+- romanize("샤블리")  → "shabli"   (영문 입력 "chablis", "sha-bli"와 편집 거리 2 이내)
+- hangulize("Chablis") → "샤블리"
+
+정확한 표기법이 아니라 교차 문자 오타 허용 검색용 발음 근사다.
+카탈로그 행은 인덱스 빌드 시 한 번만 전사한다 (요청마다 전사하지 않음).
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+from jamo import CHOSEONG, JUNGSEONG, JONGSEONG
+
+_HANGUL_BASE = 0xAC00
+_HANGUL_WORD = re.compile(r"[가-힣]+")
+_LATIN_WORD = re.compile(r"[A-Za-z]+")
+
+# ==================== 한글 → 라틴 ====================
+
+_INITIAL_ROMAN = {
+    "ㄱ": "g", "ㄲ": "k", "ㄴ": "n", "ㄷ": "d", "ㄸ": "t", "ㄹ": "r", "ㅁ": "m", "ㅂ": "b", "ㅃ": "p",
+    "ㅅ": "s", "ㅆ": "s", "ㅇ": "", "ㅈ": "j", "ㅉ": "j", "ㅊ": "ch", "ㅋ": "k", "ㅌ": "t", "ㅍ": "p", "ㅎ": "h",
+}
+_VOWEL_ROMAN = {
+    "ㅏ": "a", "ㅐ": "e", "ㅑ": "ya", "ㅒ": "ye", "ㅓ": "eo", "ㅔ": "e", "ㅕ": "yeo", "ㅖ": "ye",
+    "ㅗ": "o", "ㅘ": "wa", "ㅙ": "we", "ㅚ": "oe", "ㅛ": "yo", "ㅜ": "u", "ㅝ": "wo", "ㅞ": "we",
+    "ㅟ": "wi", "ㅠ": "yu", "ㅡ": "eu", "ㅢ": "ui", "ㅣ": "i",
+}
+_FINAL_ROMAN = {
+    "": "", "ㄱ": "k", "ㄲ": "k", "ㄳ": "k", "ㄴ": "n", "ㄵ": "n", "ㄶ": "n", "ㄷ": "t", "ㄹ": "l",
+    "ㄺ": "k", "ㄻ": "m", "ㄼ": "l", "ㄽ": "l", "ㄾ": "l", "ㄿ": "p", "ㅀ": "l", "ㅁ": "m", "ㅂ": "p",
+    "ㅄ": "p", "ㅅ": "t", "ㅆ": "t", "ㅇ": "ng", "ㅈ": "t", "ㅊ": "t", "ㅋ": "k", "ㅌ": "t", "ㅍ": "p", "ㅎ": "",
+}
+# 샤/셔/쇼/슈 → sha/sho/shu (외래어 "ch", "sh")
+_PALATAL = {"ㅅ": "sh", "ㅆ": "sh", "ㅈ": "j", "ㅉ": "j", "ㅊ": "ch"}
+
+
+def _split_syllable(ch: str) -> Tuple[str, str, str]:
+    offset = ord(ch) - _HANGUL_BASE
+    cho, rest = divmod(offset, 588)
+    jung, jong = divmod(rest, 28)
+    return CHOSEONG[cho], JUNGSEONG[jung], JONGSEONG[jong]
+
+
+def _romanize_word(word: str) -> str:
+    out = []
+    prev_final = ""
+    for ch in word:
+        initial, vowel, final = _split_syllable(ch)
+        onset = _INITIAL_ROMAN[initial]
+        nucleus = _VOWEL_ROMAN[vowel]
+
+        if initial in _PALATAL and nucleus.startswith("y"):
+            onset, nucleus = _PALATAL[initial], nucleus[1:]
+        # 외래어 받침 ㄹ + 초성 ㄹ → l 하나 (블리 → bli)
+        if initial == "ㄹ" and prev_final == "ㄹ":
+            onset = ""
+        elif initial == "ㄹ":
+            onset = "r"
+        # 자음 뒤 ㅡ는 외래어 삽입 모음 (블 → bl, 르 → r)
+        if vowel == "ㅡ" and initial != "ㅇ":
+            nucleus = ""
+
+        out.append(onset + nucleus + _FINAL_ROMAN[final])
+        prev_final = final
+    return "".join(out)
+
+
+def romanize(text: Optional[str]) -> str:
+    """한글 단어 → 라틴 발음 근사 (한글 외 문자는 버림)"""
+    if not text:
+        return ""
+    return " ".join(_romanize_word(word) for word in _HANGUL_WORD.findall(str(text)))
+
+
+# ==================== 라틴 → 한글 ====================
+
+# (철자, 자음) - 긴 철자부터 매칭
+_CONSONANTS = [
+    ("sch", "ㅅ"), ("tch", "ㅊ"), ("ch", "ㅅ"), ("sh", "ㅅ"), ("ph", "ㅍ"), ("th", "ㅌ"), ("ck", "ㅋ"),
+    ("qu", "ㅋ"), ("gn", "ㄴ"), ("ll", "ㄹ"), ("ss", "ㅅ"), ("tt", "ㅌ"), ("nn", "ㄴ"), ("mm", "ㅁ"),
+    ("rr", "R"), ("pp", "ㅍ"), ("zz", "ㅊ"),
+    ("b", "ㅂ"), ("d", "ㄷ"), ("f", "ㅍ"), ("h", ""), ("j", "ㅈ"), ("k", "ㅋ"), ("l", "ㄹ"), ("m", "ㅁ"),
+    ("n", "ㄴ"), ("p", "ㅍ"), ("q", "ㅋ"), ("r", "R"), ("s", "ㅅ"), ("t", "ㅌ"), ("v", "ㅂ"), ("w", "ㅇ"),
+    ("x", "ㅋㅅ"), ("z", "ㅈ"),
+]
+_VOWELS = [
+    ("eau", "ㅗ"), ("ou", "ㅜ"), ("au", "ㅗ"), ("ai", "ㅔ"), ("ei", "ㅔ"), ("ay", "ㅔ"), ("ey", "ㅔ"),
+    ("oi", "ㅘ"), ("ie", "ㅣ"), ("ee", "ㅣ"), ("oo", "ㅜ"), ("ea", "ㅣ"), ("ue", "ㅜ"),
+    ("a", "ㅏ"), ("e", "ㅔ"), ("i", "ㅣ"), ("o", "ㅗ"), ("u", "ㅜ"), ("y", "ㅣ"),
+]
+# r 은 모음 앞이 아니면 받침 대신 "르" (카베르네, 누아르), l 은 받침 ㄹ (리델)
+_R = "R"
+_IOTIZED = {"ㅏ": "ㅑ", "ㅗ": "ㅛ", "ㅜ": "ㅠ", "ㅔ": "ㅖ", "ㅓ": "ㅕ"}
+_VOWEL_LETTERS = set("aeiouy")
+# 받침으로 남길 수 있는 자음 (나머지는 "ㅡ"를 붙여 독립 음절)
+_CODA_OK = {"ㄴ", "ㅁ", "ㅇ"}
+
+
+def _phonemes(word: str) -> List[Tuple[str, str]]:
+    """라틴 단어 → [(C|V, 자모)] (프랑스어식 묵음 어미 처리 포함)"""
+    word = word.lower()
+    # 어말 묵음: chablis, merlot, bordeaux, blanc
+    if len(word) > 3 and word[-1] in "stx" and word[-2] in _VOWEL_LETTERS:
+        word = word[:-1]
+    if len(word) > 3 and word.endswith("nc"):
+        word = word[:-1]
+
+    phonemes: List[Tuple[str, str]] = []
+    i = 0
+    while i < len(word):
+        ch = word[i]
+        if ch == "c" and not word.startswith(("ch", "ck"), i):
+            soft = i + 1 < len(word) and word[i + 1] in "eiy"
+            phonemes.append(("C", "ㅅ" if soft else "ㅋ"))
+            i += 1
+            continue
+        if ch == "g" and not word.startswith("gn", i):
+            soft = i + 1 < len(word) and word[i + 1] in "ei"
+            phonemes.append(("C", "ㅈ" if soft else "ㄱ"))
+            i += 1
+            continue
+        for spelling, vowel in _VOWELS:
+            if word.startswith(spelling, i):
+                phonemes.append(("V", vowel))
+                i += len(spelling)
+                break
+        else:
+            for spelling, consonant in _CONSONANTS:
+                if word.startswith(spelling, i):
+                    for jamo in ([consonant] if consonant == _R else consonant):
+                        phonemes.append(("C", jamo))
+                    # gn → 뇽, ch/sh → 샤 (뒤 모음을 이중모음으로)
+                    if spelling in ("gn", "ch", "sh", "sch"):
+                        phonemes.append(("Y", ""))
+                    i += len(spelling)
+                    break
+            else:
+                i += 1  # 알파벳 외 문자
+    return [p for p in phonemes if p[0] == "Y" or p[1]]
+
+
+def _compose(initial: str, vowel: str, final: str = "") -> str:
+    return chr(_HANGUL_BASE + CHOSEONG.index(initial) * 588 + JUNGSEONG.index(vowel) * 28 + JONGSEONG.index(final))
+
+
+def _hangulize_word(word: str) -> str:
+    phonemes = _phonemes(word)
+    syllables: List[List[str]] = []  # [초성, 중성, 종성]
+    i = 0
+    while i < len(phonemes):
+        kind, jamo = phonemes[i]
+        is_r = jamo == _R
+        if is_r:
+            jamo = "ㄹ"
+        if kind == "V":
+            syllables.append(["ㅇ", jamo, ""])
+            i += 1
+            continue
+        if kind == "Y":
+            i += 1
+            continue
+
+        # 자음: 뒤에 모음이 오면 초성
+        iotize = i + 1 < len(phonemes) and phonemes[i + 1][0] == "Y"
+        nxt = i + 2 if iotize else i + 1
+        if nxt < len(phonemes) and phonemes[nxt][0] == "V":
+            vowel = phonemes[nxt][1]
+            if iotize:
+                vowel = _IOTIZED.get(vowel, vowel)
+            syllables.append([jamo, vowel, ""])
+            i = nxt + 1
+            continue
+
+        # 뒤에 모음이 없으면: 받침 가능하면 앞 음절 받침, 아니면 "ㅡ" 음절
+        prev = syllables[-1] if syllables else None
+        if prev and not prev[2] and (jamo in _CODA_OK or (jamo == "ㄹ" and not is_r)):
+            # 프랑스어 비음 어미 (-on, -an, -en) → ㅇ 받침 (소비뇽, 블랑)
+            if jamo == "ㄴ" and nxt >= len(phonemes) and prev[1] in ("ㅗ", "ㅏ", "ㅛ", "ㅑ"):
+                jamo = "ㅇ"
+            prev[2] = jamo
+        else:
+            syllable = [jamo, "ㅣ" if jamo in ("ㅈ", "ㅊ") else "ㅡ", ""]
+            # 자음 + l + 모음 → "블랑", "샤블리" 처럼 ㄹ 받침을 덧붙임
+            if (not is_r and nxt + 1 < len(phonemes) and phonemes[nxt][1] == "ㄹ"
+                    and phonemes[nxt + 1][0] == "V"):
+                syllable[2] = "ㄹ"
+            syllables.append(syllable)
+        i = nxt
+    return "".join(_compose(*syllable) for syllable in syllables)
+
+
+def hangulize(text: Optional[str]) -> str:
+    """라틴 단어 → 한글 발음 근사 (라틴 외 문자는 버림)"""
+    if not text:
+        return ""
+    return " ".join(filter(None, (_hangulize_word(word) for word in _LATIN_WORD.findall(str(text)))))
+
+
+def split_scripts(text: Optional[str]) -> Tuple[str, str]:
+    """문자열 → (한글 단어들, 라틴 단어들)"""
+    if not text:
+        return "", ""
+    return " ".join(_HANGUL_WORD.findall(text)), " ".join(_LATIN_WORD.findall(text))
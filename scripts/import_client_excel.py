@@ -1,87 +1,216 @@
-import sqlite3
-import pandas as pd
-from pathlib import Path
-
-BASE = Path(__file__).resolve().parents[1]  # 프로젝트 루트
-EXCEL_PATH = BASE / "order-ai.xlsx"         # 파일명이 다르면 여기만 수정
-DB_PATH = BASE / "data.sqlite3"
-SHEET_NAME = "Client"
-
-# E=4, F=5, G=6, M=12, N=13, Q=16 (0-index)
-USECOLS = [4, 5, 6, 12, 13, 16]
-NEWCOLS = ["client_name", "client_code", "ship_date", "item_no", "item_name", "unit_price"]
-
-def main():
-    if not EXCEL_PATH.exists():
-        raise FileNotFoundError(f"엑셀 파일을 못 찾음: {EXCEL_PATH}")
-
-    df = pd.read_excel(EXCEL_PATH, sheet_name=SHEET_NAME, usecols=USECOLS, engine="openpyxl")
-    df.columns = NEWCOLS
-
-    df = df.dropna(subset=["client_name", "client_code", "item_no", "item_name"])
-    df["client_name"] = df["client_name"].astype(str).str.strip()
-    df["client_code"] = df["client_code"].astype(str).str.strip()
-    df["item_no"] = df["item_no"].astype(str).str.strip()
-    df["item_name"] = df["item_name"].astype(str).str.strip()
-    df["ship_date"] = df["ship_date"].astype(str).str.strip()
-    df["unit_price"] = pd.to_numeric(df["unit_price"], errors="coerce")
-
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-
-    # ✅ 스키마 파일 실행 (없으면 바로 에러나게)
-    init_sql_path = BASE / "scripts" / "init_db.sql"
-    if not init_sql_path.exists():
-        raise FileNotFoundError(f"init_db.sql 없음: {init_sql_path}")
-
-    cur.executescript(init_sql_path.read_text(encoding="utf-8"))
-
-    # ✅ shipments 적재
-    df.to_sql("shipments", con, if_exists="append", index=False)
-    # ✅ client_alias 적재 (거래처명/코드)
-    # 기존 데이터 비우고(중복 방지) 다시 채움
-    cur.execute("DELETE FROM client_alias;")
-
-    # df에서 거래처명/코드만 유니크로 뽑아서 넣기
-    df_clients = (
-        df[["client_code", "client_name"]]
-        .dropna()
-        .drop_duplicates()
-        .copy()
-    )
-    df_clients.rename(columns={"client_name": "alias"}, inplace=True)
-    df_clients["weight"] = 1
-
-    df_clients.to_sql("client_alias", con, if_exists="append", index=False)
-
-    # ✅ stats 테이블이 있는지 확인 (없으면 여기서 멈춤)
-    chk = cur.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='client_item_stats';"
-    ).fetchone()
-    if not chk:
-        raise RuntimeError("client_item_stats 테이블이 스키마에 생성되지 않았습니다. init_db.sql을 확인하세요.")
-
-    # ✅ stats 재생성(데이터 반영 위해 한번 비우고 다시 채움)
-    cur.execute("DELETE FROM client_item_stats;")
-
-    cur.execute("""
-    INSERT INTO client_item_stats (client_code, item_no, item_name, last_ship_date, buy_count, avg_price)
-    SELECT
-      client_code,
-      item_no,
-      MAX(item_name) as item_name,
-      MAX(ship_date) as last_ship_date,
-      COUNT(*) as buy_count,
-      AVG(unit_price) as avg_price
-    FROM shipments
-    GROUP BY client_code, item_no;
-    """)
-
-    con.commit()
-    con.close()
-
-    print("✅ DB 생성 완료:", DB_PATH)
-    print("✅ shipments rows:", len(df))
-
-if __name__ == "__main__":
-    main()
+import argparse
+import sqlite3
+import sys
+import time
+import pandas as pd
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]  # 프로젝트 루트
+
+# 시트 Parquet 캐시 (ml-server/sheet_cache.py, pyarrow 없으면 매번 read_excel)
+sys.path.insert(0, str(BASE / "ml-server"))
+try:
+    import sheet_cache
+except ImportError:
+    sheet_cache = None
+EXCEL_PATH = BASE / "order-ai.xlsx"         # 파일명이 다르면 여기만 수정 (또는 --xlsx)
+DB_PATH = BASE / "data.sqlite3"
+SHEET_NAME = "Client"
+
+# E=4, F=5, G=6, M=12, N=13, Q=16 (0-index)
+USECOLS = [4, 5, 6, 12, 13, 16]
+NEWCOLS = ["client_name", "client_code", "ship_date", "item_no", "item_name", "unit_price"]
+
+def read_client_sheet(excel_path: Path) -> pd.DataFrame:
+    """
+    Client 시트 → NEWCOLS DataFrame (pandas dtype 그대로 문자열화: 빈칸 있는 숫자 열은 '12022.0')
+    ml-server/ingest_workbook.py도 이 함수를 써서 --incremental 자연 키가 같게 만들어진다
+    """
+    if sheet_cache is not None:
+        df = sheet_cache.read_frame(str(excel_path), SHEET_NAME, USECOLS)
+    else:
+        df = pd.read_excel(excel_path, sheet_name=SHEET_NAME, usecols=USECOLS, engine="openpyxl")
+    df.columns = NEWCOLS
+
+    total = len(df)
+    df = df.dropna(subset=["client_name", "client_code", "item_no", "item_name"])
+    df.attrs["skipped"] = total - len(df)
+    df["client_name"] = df["client_name"].astype(str).str.strip()
+    df["client_code"] = df["client_code"].astype(str).str.strip()
+    df["item_no"] = df["item_no"].astype(str).str.strip()
+    df["item_name"] = df["item_name"].astype(str).str.strip()
+    df["ship_date"] = df["ship_date"].astype(str).str.strip()
+    df["unit_price"] = pd.to_numeric(df["unit_price"], errors="coerce")
+    return df
+
+def full_import(con: sqlite3.Connection, df: pd.DataFrame) -> None:
+    """init_db.sql로 테이블을 다시 만들고 시트 전체 적재"""
+    cur = con.cursor()
+
+    # ✅ 스키마 파일 실행 (없으면 바로 에러나게)
+    init_sql_path = BASE / "scripts" / "init_db.sql"
+    if not init_sql_path.exists():
+        raise FileNotFoundError(f"init_db.sql 없음: {init_sql_path}")
+
+    cur.executescript(init_sql_path.read_text(encoding="utf-8"))
+
+    # ✅ shipments 적재
+    df.to_sql("shipments", con, if_exists="append", index=False)
+    # ✅ client_alias 적재 (거래처명/코드)
+    # 기존 데이터 비우고(중복 방지) 다시 채움
+    cur.execute("DELETE FROM client_alias;")
+
+    # df에서 거래처명/코드만 유니크로 뽑아서 넣기
+    df_clients = (
+        df[["client_code", "client_name"]]
+        .dropna()
+        .drop_duplicates()
+        .copy()
+    )
+    df_clients.rename(columns={"client_name": "alias"}, inplace=True)
+    df_clients["weight"] = 1
+
+    df_clients.to_sql("client_alias", con, if_exists="append", index=False)
+
+    # ✅ stats 테이블이 있는지 확인 (없으면 여기서 멈춤)
+    chk = cur.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='client_item_stats';"
+    ).fetchone()
+    if not chk:
+        raise RuntimeError("client_item_stats 테이블이 스키마에 생성되지 않았습니다. init_db.sql을 확인하세요.")
+
+    # ✅ stats 재생성(데이터 반영 위해 한번 비우고 다시 채움)
+    cur.execute("DELETE FROM client_item_stats;")
+
+    cur.execute("""
+    INSERT INTO client_item_stats (client_code, item_no, item_name, last_ship_date, buy_count, avg_price)
+    SELECT
+      client_code,
+      item_no,
+      MAX(item_name) as item_name,
+      MAX(ship_date) as last_ship_date,
+      COUNT(*) as buy_count,
+      AVG(unit_price) as avg_price
+    FROM shipments
+    GROUP BY client_code, item_no;
+    """)
+
+    con.commit()
+    print("✅ shipments rows:", len(df))
+
+def incremental_import(con: sqlite3.Connection, df: pd.DataFrame) -> None:
+    """
+    자연 키 (client_code, item_no, ship_date, unit_price)로 시트와 shipments를 비교해 새 행만 추가하고,
+    새 행이 생긴 (client_code, item_no)의 client_item_stats만 다시 계산 (기존 행은 건드리지 않음)
+    - 같은 키가 시트에 k번, DB에 m번 있으면 뒤쪽 k-m개만 새 행 (같은 날 같은 단가로 두 번 출고된 것도 전체 적재와 같은 건수)
+    - 시트에서 사라진 행은 지우지 않음 (출고 이력은 추가만 된다고 가정, 정정이 있으면 전체 적재)
+    """
+    cur = con.cursor()
+    tables = {row[0] for row in cur.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if not {"shipments", "client_alias", "client_item_stats"} <= tables:
+        print("⚠️ 기존 테이블이 없어 전체 적재로 진행")
+        full_import(con, df)
+        return
+
+    # 자연 키 인덱스 (init_db.sql 이전 버전으로 만든 DB에는 처음 한 번 생성)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_shipments_natural_key
+    ON shipments(client_code, item_no, ship_date, unit_price)
+    """)
+
+    cur.execute("""
+    CREATE TEMP TABLE incoming (
+      client_name TEXT, client_code TEXT, ship_date TEXT, item_no TEXT, item_name TEXT, unit_price REAL
+    )
+    """)
+    cur.executemany("INSERT INTO temp.incoming VALUES (?, ?, ?, ?, ?, ?)", df[NEWCOLS].itertuples(index=False, name=None))
+
+    # 키별 순번 > DB의 같은 키 건수 → 새 행 (단가 NULL도 같은 키로 보도록 IS 비교)
+    cur.execute("""
+    CREATE TEMP TABLE new_rows AS
+    SELECT pos, client_name, client_code, ship_date, item_no, item_name, unit_price
+    FROM (
+      SELECT rowid AS pos, *,
+             ROW_NUMBER() OVER (PARTITION BY client_code, item_no, ship_date, unit_price ORDER BY rowid) AS nth
+      FROM temp.incoming
+    ) i
+    WHERE nth > (
+      SELECT COUNT(*) FROM shipments s
+      WHERE s.client_code = i.client_code AND s.item_no = i.item_no
+        AND s.ship_date IS i.ship_date AND s.unit_price IS i.unit_price
+    )
+    """)
+    new_count = cur.execute("SELECT COUNT(*) FROM temp.new_rows").fetchone()[0]
+
+    # ✅ shipments: 새 행만 (시트 순서대로)
+    cur.execute("""
+    INSERT INTO shipments (client_name, client_code, ship_date, item_no, item_name, unit_price)
+    SELECT client_name, client_code, ship_date, item_no, item_name, unit_price
+    FROM temp.new_rows ORDER BY pos
+    """)
+
+    # ✅ client_alias: 새 행의 거래처명만 (기존 별칭의 weight는 유지)
+    cur.execute("""
+    INSERT INTO client_alias (alias, client_code, weight)
+    SELECT DISTINCT client_name, client_code, 1 FROM temp.new_rows WHERE true
+    ON CONFLICT(alias) DO UPDATE SET client_code = excluded.client_code, updated_at = datetime('now')
+    """)
+
+    # ✅ client_item_stats: 새 행이 생긴 (거래처, 품목)만 재계산 후 upsert
+    cur.execute("CREATE TEMP TABLE affected AS SELECT DISTINCT client_code, item_no FROM temp.new_rows")
+    cur.execute("""
+    INSERT INTO client_item_stats (client_code, item_no, item_name, last_ship_date, buy_count, avg_price)
+    SELECT
+      s.client_code,
+      s.item_no,
+      MAX(s.item_name) as item_name,
+      MAX(s.ship_date) as last_ship_date,
+      COUNT(*) as buy_count,
+      AVG(s.unit_price) as avg_price
+    FROM temp.affected a
+    JOIN shipments s ON s.client_code = a.client_code AND s.item_no = a.item_no
+    GROUP BY s.client_code, s.item_no
+    ON CONFLICT(client_code, item_no) DO UPDATE SET
+      item_name = excluded.item_name,
+      last_ship_date = excluded.last_ship_date,
+      buy_count = excluded.buy_count,
+      avg_price = excluded.avg_price
+    """)
+    affected_count = cur.execute("SELECT COUNT(*) FROM temp.affected").fetchone()[0]
+
+    con.commit()
+    for table in ("incoming", "new_rows", "affected"):
+        cur.execute(f"DROP TABLE temp.{table}")
+    print(f"✅ 시트 {len(df)}행 중 신규 shipments {new_count}행, client_item_stats {affected_count}행 갱신")
+
+def main():
+    parser = argparse.ArgumentParser(description="Client 시트 → shipments / client_alias / client_item_stats")
+    parser.add_argument("--xlsx", type=Path, default=EXCEL_PATH)
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--incremental", action="store_true",
+                        help="테이블을 다시 만들지 않고 새 출고 행만 추가 + 영향받은 stats만 갱신")
+    args = parser.parse_args()
+
+    if not args.xlsx.exists():
+        raise FileNotFoundError(f"엑셀 파일을 못 찾음: {args.xlsx}")
+
+    started = time.perf_counter()
+    df = read_client_sheet(args.xlsx)
+
+    con = sqlite3.connect(args.db)
+    try:
+        if args.incremental:
+            incremental_import(con, df)
+        else:
+            full_import(con, df)
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+
+    print("✅ DB 생성 완료:", args.db)
+    print(f"⏱️ {time.perf_counter() - started:.2f}초")
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ PRAGMA journal_mode=WAL;
 DROP TABLE IF EXISTS shipments;
 DROP TABLE IF EXISTS client_alias;
 DROP TABLE IF EXISTS client_item_stats;
+DROP TABLE IF EXISTS client_item_stats_fts;
 
 CREATE TABLE shipments (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -18,6 +19,8 @@ CREATE INDEX idx_shipments_client_code ON shipments(client_code);
 CREATE INDEX idx_shipments_client_name ON shipments(client_name);
 CREATE INDEX idx_shipments_item_no ON shipments(item_no);
 CREATE INDEX idx_shipments_ship_date ON shipments(ship_date);
+-- 증분 적재(import_client_excel.py --incremental)의 자연 키
+CREATE INDEX idx_shipments_natural_key ON shipments(client_code, item_no, ship_date, unit_price);
 
 CREATE TABLE client_alias (
   alias TEXT PRIMARY KEY,
@@ -39,3 +42,18 @@ CREATE TABLE client_item_stats (
 );
 
 CREATE INDEX idx_client_item_stats_code ON client_item_stats(client_code);
+
+-- 품목명 trigram 전문 검색 (migrations/0004_fts5_item_names.sql과 같은 정의, ml-server/fts.py로 조회)
+CREATE VIRTUAL TABLE client_item_stats_fts USING fts5(item_name, tokenize = 'trigram');
+
+CREATE TRIGGER client_item_stats_fts_ai AFTER INSERT ON client_item_stats BEGIN
+  DELETE FROM client_item_stats_fts WHERE rowid = new.rowid;
+  INSERT INTO client_item_stats_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;
+CREATE TRIGGER client_item_stats_fts_ad AFTER DELETE ON client_item_stats BEGIN
+  DELETE FROM client_item_stats_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER client_item_stats_fts_au AFTER UPDATE OF item_name ON client_item_stats BEGIN
+  DELETE FROM client_item_stats_fts WHERE rowid = old.rowid;
+  INSERT INTO client_item_stats_fts (rowid, item_name) VALUES (new.rowid, new.item_name);
+END;